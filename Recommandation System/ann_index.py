@@ -0,0 +1,255 @@
+import os
+import logging
+import threading
+
+import numpy as np
+
+from embedding_store import normalize_rows, dot
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (surchargées par ANN_MIN_CANDIDATES / ANN_TOP_K / ANN_NPROBE / ANN_MIN_TRAIN_SIZE)
+DEFAULT_ANN_MIN_CANDIDATES = 20000   # en dessous : score exact de tous les candidats
+DEFAULT_ANN_TOP_K = 500              # voisins sémantiques retenus avant le scoring complet
+DEFAULT_ANN_NPROBE = 16              # listes inversées parcourues par partition
+DEFAULT_ANN_MIN_TRAIN_SIZE = 2048    # en dessous : partition parcourue entièrement
+
+KMEANS_ITERATIONS = 10
+# Points d'entraînement par liste (échantillon du k-means)
+KMEANS_POINTS_PER_LIST = 256
+MAX_LISTS = 4096
+# Lignes par bloc lors de l'affectation aux centroïdes (borne la mémoire temporaire)
+ASSIGN_CHUNK_SIZE = 16384
+
+# Partition des candidats sans département
+NO_DEPARTMENT = -1
+
+
+def spherical_kmeans(vectors, n_lists, iterations=KMEANS_ITERATIONS, seed=0):
+    """Centroïdes normalisés (similarité cosinus) de vecteurs normalisés"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+
+        # Liste vide : réamorcée sur un point tiré au hasard
+        empty = np.flatnonzero(np.bincount(assignment, minlength=n_lists) == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty))]
+        centroids = normalize_rows(sums)
+
+    return centroids
+
+
+def assign(vectors, centroids):
+    """Centroïde le plus proche de chaque vecteur"""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_CHUNK_SIZE):
+        block = vectors[start:start + ASSIGN_CHUNK_SIZE]
+        assignment[start:start + ASSIGN_CHUNK_SIZE] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+class IVFPartition:
+    """
+    Index IVF d'une partition : centroïdes k-means et listes inversées identifiant -> ligne du store.
+    Chaque liste sondée garde une copie contiguë de ses vecteurs dans la précision du store
+    (parcours sans accès aléatoire au store).
+    """
+
+    def __init__(self):
+        self.centroids = None     # None : liste unique parcourue entièrement
+        self.lists = [{}]         # liste -> {identifiant: ligne du store}
+        self.list_of = {}         # identifiant -> liste
+        self.trained_size = 0
+        self._arrays = {}         # liste -> (identifiants, codes, échelles), invalidé à chaque écriture
+
+    def __len__(self):
+        return len(self.list_of)
+
+    def add(self, ids, rows, vectors):
+        lists = np.zeros(len(ids), dtype=np.int64) if self.centroids is None else assign(vectors, self.centroids)
+        for stagiaire_id, row, list_no in zip(ids, rows, lists.tolist()):
+            self.remove(stagiaire_id)
+            self.lists[list_no][stagiaire_id] = row
+            self.list_of[stagiaire_id] = list_no
+            self._arrays.pop(list_no, None)
+
+    def remove(self, stagiaire_id):
+        list_no = self.list_of.pop(stagiaire_id, None)
+        if list_no is not None:
+            del self.lists[list_no][stagiaire_id]
+            self._arrays.pop(list_no, None)
+
+    def train(self, store, seed=0):
+        """k-means sur un échantillon des vecteurs, puis réaffectation de tous les membres"""
+        ids = np.fromiter(self.list_of, dtype=np.int64, count=len(self.list_of))
+        rows = np.array([self.lists[self.list_of[i]][i] for i in ids.tolist()], dtype=np.int64)
+
+        n_lists = int(np.clip(np.sqrt(len(ids)), 1, MAX_LISTS))
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(len(ids), min(len(ids), n_lists * KMEANS_POINTS_PER_LIST), replace=False)
+        centroids = spherical_kmeans(store.vectors(np.sort(rows[sample])), n_lists, seed=seed)
+
+        self.centroids = centroids
+        self.lists = [{} for _ in range(n_lists)]
+        self.list_of = {}
+        self._arrays = {}
+        self.trained_size = len(ids)
+        self.add(ids.tolist(), rows.tolist(), store.vectors(rows))
+
+    def search(self, query, nprobe, store):
+        """Identifiants et similarités exactes des membres des listes les plus proches de la requête"""
+        if self.centroids is None or nprobe >= len(self.lists):
+            probes = range(len(self.lists))
+        else:
+            scores = self.centroids @ query
+            probes = np.argpartition(-scores, nprobe - 1)[:nprobe].tolist()
+
+        ids, similarities = [], []
+        for list_no in probes:
+            arrays = self._arrays.get(list_no)
+            if arrays is None:
+                members = self.lists[list_no]
+                rows = np.fromiter(members.values(), dtype=np.int64, count=len(members))
+                arrays = (np.fromiter(members.keys(), dtype=np.int64, count=len(members)),) + store.codes(rows)
+                self._arrays[list_no] = arrays
+            ids.append(arrays[0])
+            similarities.append(dot(arrays[1], arrays[2], query))
+        return np.concatenate(ids), np.concatenate(similarities)
+
+
+class SemanticAnnIndex:
+    """
+    Recherche approchée des plus proches voisins sémantiques (IVF, NumPy, CPU).
+
+    Une partition IVF par DepartmentId au-dessus des vecteurs de EmbeddingStore : les listes
+    inversées ne contiennent que des lignes du store. Les listes sondées sont scorées avec les
+    vecteurs complets du store : les similarités sont celles du scan exhaustif, seul le rappel est approché.
+    """
+
+    def __init__(self, store, top_k=DEFAULT_ANN_TOP_K, nprobe=DEFAULT_ANN_NPROBE,
+                 min_candidates=DEFAULT_ANN_MIN_CANDIDATES, min_train_size=DEFAULT_ANN_MIN_TRAIN_SIZE, seed=0):
+        self.store = store
+        self.top_k = max(1, int(top_k))
+        self.nprobe = max(1, int(nprobe))
+        self.min_candidates = int(min_candidates)
+        self.min_train_size = max(1, int(min_train_size))
+        self.seed = seed
+
+        self._partitions = {}     # département -> IVFPartition
+        self._members = {}        # identifiant -> (département, empreinte du texte)
+        self._lock = threading.Lock()
+        self._searches = 0
+        self._scanned = 0
+        self._trainings = 0
+
+    @classmethod
+    def from_env(cls, store):
+        return cls(
+            store,
+            top_k=int(os.getenv('ANN_TOP_K', DEFAULT_ANN_TOP_K)),
+            nprobe=int(os.getenv('ANN_NPROBE', DEFAULT_ANN_NPROBE)),
+            min_candidates=int(os.getenv('ANN_MIN_CANDIDATES', DEFAULT_ANN_MIN_CANDIDATES)),
+            min_train_size=int(os.getenv('ANN_MIN_TRAIN_SIZE', DEFAULT_ANN_MIN_TRAIN_SIZE))
+        )
+
+    def __len__(self):
+        return len(self._members)
+
+    def sync(self, ids, rows, departments, texts):
+        """
+        Aligne l'index sur la liste courante des candidats : insère les nouveaux, réaffecte ceux dont
+        le texte ou le département a changé, retire les absents.
+        """
+        ids = [int(i) for i in ids]
+        with self._lock:
+            for stagiaire_id in set(self._members) - set(ids):
+                department, _ = self._members.pop(stagiaire_id)
+                self._partitions[department].remove(stagiaire_id)
+            self._upsert(ids, rows, departments, texts)
+
+    def upsert(self, ids, rows, departments, texts):
+        """Insertion incrémentale (nouveau CV analysé, profil modifié)"""
+        with self._lock:
+            self._upsert([int(i) for i in ids], rows, departments, texts)
+
+    def search(self, query, k=None, departments=None):
+        """
+        k plus proches voisins (identifiants, similarités exactes, ordre décroissant),
+        dans les partitions demandées (toutes si None).
+        """
+        k = self.top_k if k is None else k
+        query = normalize_rows(query)[0]
+
+        with self._lock:
+            keys = self._partitions.keys() if departments is None else [_department_key(d) for d in departments]
+            found = [
+                self._partitions[key].search(query, self.nprobe, self.store)
+                for key in keys if key in self._partitions
+            ]
+            self._searches += 1
+            self._scanned += sum(len(ids) for ids, _ in found)
+
+        if not found:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # Similarités exactes (vecteurs complets) des membres des listes sondées ; k meilleurs
+        ids = np.concatenate([ids for ids, _ in found])
+        similarities = np.concatenate([similarities for _, similarities in found])
+        if len(ids) > k:
+            best = np.argpartition(-similarities, k - 1)[:k]
+            ids, similarities = ids[best], similarities[best]
+        order = np.argsort(-similarities, kind='stable')
+        return ids[order], similarities[order]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'candidates': len(self._members),
+                'partitions': len(self._partitions),
+                'trained_partitions': sum(1 for p in self._partitions.values() if p.centroids is not None),
+                'lists': sum(len(p.lists) for p in self._partitions.values()),
+                'top_k': self.top_k,
+                'nprobe': self.nprobe,
+                'min_candidates': self.min_candidates,
+                'searches': self._searches,
+                'avg_scanned': round(self._scanned / self._searches, 1) if self._searches else 0.0,
+                'trainings': self._trainings
+            }
+
+    def _upsert(self, ids, rows, departments, texts):
+        changed = {}
+        for stagiaire_id, row, department, text in zip(ids, rows, departments, texts):
+            member = (_department_key(department), hash(text))
+            previous = self._members.get(stagiaire_id)
+            if previous == member:
+                continue
+            if previous is not None:
+                self._partitions[previous[0]].remove(stagiaire_id)
+            self._members[stagiaire_id] = member
+            changed.setdefault(member[0], []).append((stagiaire_id, int(row)))
+
+        for department, entries in changed.items():
+            partition = self._partitions.setdefault(department, IVFPartition())
+            entry_ids = [stagiaire_id for stagiaire_id, _ in entries]
+            entry_rows = np.array([row for _, row in entries], dtype=np.int64)
+            vectors = None if partition.centroids is None else self.store.vectors(entry_rows)
+            partition.add(entry_ids, entry_rows.tolist(), vectors)
+
+            # Entraînement à la taille minimale, puis à chaque doublement de la partition
+            if len(partition) >= max(self.min_train_size, 2 * partition.trained_size):
+                partition.train(self.store, self.seed)
+                self._trainings += 1
+                logger.info(f"Index ANN: partition {department} entraînée "
+                            f"({len(partition)} candidats, {len(partition.lists)} listes)")
+
+
+def _department_key(department):
+    try:
+        return int(department)
+    except (TypeError, ValueError):
+        return NO_DEPARTMENT
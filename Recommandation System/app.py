@@ -1,7 +1,6 @@
 import pandas as pd
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import pyodbc
 from flask import Flask, request, jsonify
 from flask_cors import CORS
@@ -11,13 +10,17 @@ import logging
 import json
 import traceback
 import re
-import requests
-from urllib.parse import urlparse
 import tempfile
+import threading
+import time
 import os
 
-# 🧬 SIMILARITÉ SÉMANTIQUE - Nouveaux imports
-from sentence_transformers import SentenceTransformer
+from db_pool import ConnectionPool
+from skill_matcher import SkillMatcher
+from embedding_store import EmbeddingStore
+from ann_index import SemanticAnnIndex
+from embedding_workers import EmbeddingWorkerPool, EmbeddingPoolTimeoutError, DEFAULT_EMBEDDING_WORKERS
+from cv_fetcher import CVFetcher, normalize_cv_url
 
 # Imports optionnels pour l'analyse des CVs (installation requise)
 try:
@@ -48,6 +51,27 @@ logger = logging.getLogger(__name__)
 # Charger les variables d'environnement
 load_dotenv()
 
+# Modèle de similarité sémantique (ses vecteurs sont persistés par EmbeddingStore)
+SEMANTIC_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+# États du modèle sémantique, chargé en arrière-plan après le démarrage du serveur
+MODEL_STATUS_PENDING = 'pending'
+MODEL_STATUS_LOADING = 'loading'
+MODEL_STATUS_READY = 'ready'
+MODEL_STATUS_UNAVAILABLE = 'unavailable'
+# Taille des lots passés au modèle (surchargée par EMBEDDING_BATCH_SIZE, voir benchmark_embeddings.py)
+DEFAULT_EMBEDDING_BATCH_SIZE = 64
+# Événements acceptés par /api/events (envoyés par le backend .NET)
+EVENT_TYPES = ('rating_submitted', 'skills_changed', 'cv_uploaded')
+
+# Compétences techniques communes reconnues dans les CVs
+TECH_SKILLS = [
+    'python', 'java', 'javascript', 'typescript', 'react', 'angular', 'vue',
+    'node', 'express', 'django', 'flask', 'spring', 'laravel', 'php',
+    'sql', 'mysql', 'postgresql', 'mongodb', 'redis', 'html', 'css',
+    'docker', 'kubernetes', 'aws', 'azure', 'git', 'linux', 'windows',
+    'figma', 'photoshop', 'illustrator', 'sketch', 'xd'
+]
+
 class CVAnalysisEngine:
     """🤖 MOTEUR D'ANALYSE ML DES CVs"""
     
@@ -73,6 +97,12 @@ class CVAnalysisEngine:
             r'(?:github|git|portfolio)'
         ]
         
+        # Compétences techniques communes, compilées une fois en automate
+        self.tech_skills_matcher = SkillMatcher({skill: skill for skill in TECH_SKILLS})
+        
+        # Téléchargements : session HTTP partagée, parallélisme borné (CV_FETCH_WORKERS, CV_FETCH_PER_HOST)
+        self.cv_fetcher = CVFetcher.from_env()
+        
     def download_cv_from_url(self, cv_url):
         """Télécharge un CV depuis une URL"""
         try:
@@ -81,46 +111,47 @@ class CVAnalysisEngine:
                 
             logger.info(f"📥 Téléchargement CV: {cv_url}")
             
-            # Vérification de l'URL
-            parsed_url = urlparse(cv_url)
-            if not parsed_url.scheme:
-                cv_url = 'http://' + cv_url
-            
-            # Téléchargement
-            response = requests.get(cv_url, timeout=30, allow_redirects=True)
-            response.raise_for_status()
-            
-            # Détection du type de fichier
-            content_type = response.headers.get('content-type', '').lower()
-            file_extension = None
-            
-            if 'pdf' in content_type:
-                file_extension = '.pdf'
-            elif 'word' in content_type or 'document' in content_type:
-                file_extension = '.docx'
-            else:
-                # Essayer de deviner depuis l'URL
-                url_lower = cv_url.lower()
-                for ext in self.supported_formats:
-                    if ext in url_lower:
-                        file_extension = ext
-                        break
-                
-                if not file_extension:
-                    file_extension = '.pdf'  # Par défaut
-            
-            # Sauvegarde temporaire
-            with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
-                tmp_file.write(response.content)
-                tmp_file_path = tmp_file.name
+            # Téléchargement (session partagée, nouvelles tentatives sur erreur transitoire)
+            download = self.cv_fetcher.fetch(cv_url)
+            if not download.ok:
+                logger.error(f"❌ Erreur téléchargement CV {cv_url}: {download.error}")
+                return None
             
-            logger.info(f"✅ CV téléchargé: {tmp_file_path} ({len(response.content)} bytes)")
-            return tmp_file_path
+            return self._save_downloaded_cv(download)
             
         except Exception as e:
             logger.error(f"❌ Erreur téléchargement CV {cv_url}: {e}")
             return None
     
+    def _save_downloaded_cv(self, download):
+        """Écrit le CV téléchargé dans un fichier temporaire (extension selon le type de contenu ou l'URL)"""
+        # Détection du type de fichier
+        content_type = download.content_type
+        file_extension = None
+        
+        if 'pdf' in content_type:
+            file_extension = '.pdf'
+        elif 'word' in content_type or 'document' in content_type:
+            file_extension = '.docx'
+        else:
+            # Essayer de deviner depuis l'URL
+            url_lower = download.url.lower()
+            for ext in self.supported_formats:
+                if ext in url_lower:
+                    file_extension = ext
+                    break
+            
+            if not file_extension:
+                file_extension = '.pdf'  # Par défaut
+        
+        # Sauvegarde temporaire
+        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
+            tmp_file.write(download.content)
+            tmp_file_path = tmp_file.name
+        
+        logger.info(f"✅ CV téléchargé: {tmp_file_path} ({len(download.content)} bytes)")
+        return tmp_file_path
+    
     def extract_text_from_pdf(self, file_path):
         """Extrait le texte d'un PDF"""
         try:
@@ -330,22 +361,11 @@ class CVAnalysisEngine:
         """Extraction basique des compétences techniques"""
         if not text:
             return []
-            
-        # Liste des compétences techniques communes
-        tech_skills = [
-            'python', 'java', 'javascript', 'typescript', 'react', 'angular', 'vue',
-            'node', 'express', 'django', 'flask', 'spring', 'laravel', 'php',
-            'sql', 'mysql', 'postgresql', 'mongodb', 'redis', 'html', 'css',
-            'docker', 'kubernetes', 'aws', 'azure', 'git', 'linux', 'windows',
-            'figma', 'photoshop', 'illustrator', 'sketch', 'xd'
-        ]
         
         text_lower = text.lower()
-        found_skills = []
         
-        for skill in tech_skills:
-            if skill in text_lower:
-                found_skills.append(skill)
+        # Compétences techniques présentes dans le texte (un seul parcours de l'automate)
+        found_skills = list(self.tech_skills_matcher.find_all(text_lower))
         
         # Recherche par patterns supplémentaires
         separators = r'[,;|\n\r\t\-•·/\\()[\]{}+=<>"\']+'
@@ -356,7 +376,7 @@ class CVAnalysisEngine:
             if (len(word) >= 2 and 
                 word not in ['et', 'de', 'la', 'le', 'du', 'des', 'avec', 'pour'] and
                 not word.isdigit()):
-                if any(tech in word for tech in tech_skills):
+                if self.tech_skills_matcher.contains_any(word):
                     found_skills.append(word)
         
         return list(set(found_skills))
@@ -426,85 +446,89 @@ class CVAnalysisEngine:
             
             if not cv_url or pd.isna(cv_url) or cv_url.strip() == '':
                 logger.warning("❌ Pas d'URL de CV fournie")
-                return {
-                    'success': False,
-                    'error': 'Pas de CV fourni',
-                    'cv_analysis': {
-                        'text_content': '',
-                        'key_skills': [],
-                        'experience_years': 0,
-                        'education_level': 'Inconnu',
-                        'projects_count': 0,
-                        'quality_score': 0.1,
-                        'analysis_success': False
-                    }
-                }
+                return self._failed_cv_analysis('Pas de CV fourni', 'Inconnu')
             
             # 1️⃣ Téléchargement du CV
             cv_file_path = self.download_cv_from_url(cv_url)
             if not cv_file_path:
-                return {
-                    'success': False,
-                    'error': 'Impossible de télécharger le CV',
-                    'cv_analysis': {
-                        'text_content': '',
-                        'key_skills': [],
-                        'experience_years': 0,
-                        'education_level': 'Erreur téléchargement',
-                        'projects_count': 0,
-                        'quality_score': 0.1,
-                        'analysis_success': False
-                    }
-                }
-            
-            # 2️⃣ Extraction du texte
-            cv_text = self.extract_text_from_file(cv_file_path)
-            if not cv_text or len(cv_text.strip()) < 20:
-                logger.warning(f"⚠️ Texte du CV trop court ou vide: {len(cv_text)} caractères")
-                return {
-                    'success': False,
-                    'error': 'CV illisible ou vide',
-                    'cv_analysis': {
-                        'text_content': '',
-                        'key_skills': [],
-                        'experience_years': 0,
-                        'education_level': 'CV illisible',
-                        'projects_count': 0,
-                        'quality_score': 0.1,
-                        'analysis_success': False
-                    }
-                }
-            
-            # 3️⃣ Analyse ML du contenu
-            cv_analysis = self.analyze_cv_content(cv_text)
+                return self._failed_cv_analysis('Impossible de télécharger le CV', 'Erreur téléchargement')
             
-            logger.info(f"✅ CV analysé avec succès!")
-            logger.info(f"   📝 Contenu: {len(cv_analysis['text_content'])} caractères")
-            logger.info(f"   🎯 Compétences: {len(cv_analysis['key_skills'])} trouvées")
-            logger.info(f"   📊 Expérience: {cv_analysis['experience_years']} ans")
-            logger.info(f"   🎓 Formation: {cv_analysis['education_level']}")
-            logger.info(f"   🏆 Qualité: {cv_analysis['quality_score']:.2f}")
-            
-            return {
-                'success': True,
-                'cv_analysis': cv_analysis
-            }
+            # 2️⃣ Extraction du texte et 3️⃣ analyse ML du contenu
+            return self._analyze_cv_file(cv_file_path)
             
         except Exception as e:
             logger.error(f"❌ Erreur globale analyse CV: {e}")
-            return {
-                'success': False,
-                'error': str(e),
-                'cv_analysis': {
-                    'text_content': '',
-                    'key_skills': [],
-                    'experience_years': 0,
-                    'education_level': 'Erreur',
-                    'projects_count': 0,
-                    'quality_score': 0.1,
-                    'analysis_success': False
-                }
+            return self._failed_cv_analysis(str(e), 'Erreur')
+    
+    def analyze_stagiaire_cvs(self, cv_urls):
+        """
+        Analyse de plusieurs CVs : (URL, résultat au format de analyze_stagiaire_cv) rendus dans l'ordre
+        d'arrivée des téléchargements ; un CV est analysé pendant que les suivants se téléchargent.
+        """
+        urls = {}   # URL normalisée -> URLs demandées
+        for cv_url in cv_urls:
+            if not cv_url or pd.isna(cv_url) or str(cv_url).strip() == '':
+                yield cv_url, self._failed_cv_analysis('Pas de CV fourni', 'Inconnu')
+            else:
+                urls.setdefault(normalize_cv_url(cv_url), []).append(cv_url)
+        
+        for download in self.cv_fetcher.fetch_many(urls):
+            if not download.ok:
+                result = self._failed_cv_analysis('Impossible de télécharger le CV', 'Erreur téléchargement')
+            else:
+                try:
+                    result = self._analyze_cv_file(self._save_downloaded_cv(download))
+                except Exception as e:
+                    logger.error(f"❌ Erreur analyse CV {download.url}: {e}")
+                    result = self._failed_cv_analysis(str(e), 'Erreur')
+            
+            for cv_url in urls[download.url]:
+                yield cv_url, result
+    
+    def _analyze_cv_file(self, cv_file_path):
+        """Extraction du texte et analyse ML d'un CV téléchargé (fichier temporaire supprimé ensuite)"""
+        try:
+            cv_text = self.extract_text_from_file(cv_file_path)
+        finally:
+            try:
+                os.remove(cv_file_path)
+            except OSError:
+                pass
+        
+        if not cv_text or len(cv_text.strip()) < 20:
+            logger.warning(f"⚠️ Texte du CV trop court ou vide: {len(cv_text or '')} caractères")
+            return self._failed_cv_analysis('CV illisible ou vide', 'CV illisible')
+        
+        cv_analysis = self.analyze_cv_content(cv_text)
+        
+        logger.info(f"✅ CV analysé avec succès!")
+        logger.info(f"   📝 Contenu: {len(cv_analysis['text_content'])} caractères")
+        logger.info(f"   🎯 Compétences: {len(cv_analysis['key_skills'])} trouvées")
+        logger.info(f"   📊 Expérience: {cv_analysis['experience_years']} ans")
+        logger.info(f"   🎓 Formation: {cv_analysis['education_level']}")
+        logger.info(f"   🏆 Qualité: {cv_analysis['quality_score']:.2f}")
+        
+        return {
+            'success': True,
+            'cv_analysis': cv_analysis
+        }
+    
+    @staticmethod
+    def _failed_cv_analysis(error, education_level):
+        """Résultat d'une analyse impossible (CV absent, non téléchargé ou illisible)"""
+        return {
+            'success': False,
+            'error': error,
+            'cv_analysis': {
+                'text_content': '',
+                'key_skills': [],
+                'experience_years': 0,
+                'education_level': education_level,
+                'projects_count': 0,
+                'quality_score': 0.1,
+                'analysis_success': False
             }
+        }
 # ========================================
 # 🧠 CLASSE PRINCIPALE DE RECOMMANDATION
 # ========================================
@@ -519,6 +543,7 @@ class ImprovedRecommendationSystem:
         self.db_server = os.getenv('DB_SERVER', 'DESKTOP-913R9GN')
         self.db_name = os.getenv('DB_NAME', 'PFEDb')
         self.connection_string = f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={self.db_server};DATABASE={self.db_name};Trusted_Connection=yes;'
+        self.db_pool = ConnectionPool.from_env(self.connection_string)
         
         # Initialisation de l'analyseur CV
         self.cv_analyzer = CVAnalysisEngine()
@@ -526,20 +551,79 @@ class ImprovedRecommendationSystem:
         # Initialisation TF-IDF pour le fallback
         self.tfidf_vectorizer = TfidfVectorizer(stop_words='english')
         
-        # Modèle sémantique (optionnel)
+        # Modèle sémantique (optionnel) : chargé par start_model_warmup() sur un thread d'arrière-plan,
+        # les requêtes reçues avant la fin du chargement utilisent la similarité lexicale
         self.semantic_model = None
-        try:
-            from sentence_transformers import SentenceTransformer
-            self.semantic_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-            logger.info("✅ Modèle sémantique chargé")
-        except Exception as e:
-            logger.warning(f"⚠️ Modèle sémantique non disponible: {e}")
+        self.model_status = MODEL_STATUS_PENDING
+        self.model_error = None
+        self.model_load_seconds = None
+        self._warmup_thread = None
+        self._warmup_lock = threading.Lock()
+        
+        self.embedding_batch_size = max(1, int(os.getenv('EMBEDDING_BATCH_SIZE', DEFAULT_EMBEDDING_BATCH_SIZE)))
+        # > 0 : inférence dans des processus dédiés (EmbeddingWorkerPool) au lieu des threads Flask
+        self.embedding_workers = int(os.getenv('EMBEDDING_WORKERS', DEFAULT_EMBEDDING_WORKERS))
+        
+        # Vecteurs des candidats persistés sur disque (réencodés seulement si leur texte change)
+        self.embedding_store = None
+        # Voisins sémantiques approchés, utilisés au-delà de ANN_MIN_CANDIDATES candidats
+        self.ann_index = None
         
         # Cache pour optimiser les performances
         self.cache = {}
         
         logger.info("✅ Système de recommandation initialisé")
     
+    def start_model_warmup(self):
+        """Lance le chargement du modèle sémantique en arrière-plan (une seule fois)"""
+        with self._warmup_lock:
+            if self._warmup_thread is None:
+                self._warmup_thread = threading.Thread(
+                    target=self._load_semantic_model, name='semantic-model-warmup', daemon=True
+                )
+                self._warmup_thread.start()
+        return self._warmup_thread
+    
+    def is_model_settled(self):
+        """Vrai quand le chargement du modèle est terminé (chargé ou définitivement indisponible)"""
+        return self.model_status in (MODEL_STATUS_READY, MODEL_STATUS_UNAVAILABLE)
+    
+    def _load_semantic_model(self):
+        """
+        Import de sentence_transformers (torch), chargement et premier encodage hors requête.
+        Avec EMBEDDING_WORKERS > 0, le modèle est chargé dans les workers et le pool tient lieu de modèle.
+        """
+        self.model_status = MODEL_STATUS_LOADING
+        start = time.perf_counter()
+        logger.info(f"⏳ Chargement du modèle sémantique {SEMANTIC_MODEL_NAME} en arrière-plan...")
+        
+        try:
+            if self.embedding_workers > 0:
+                model = EmbeddingWorkerPool.from_env(
+                    SEMANTIC_MODEL_NAME, self.embedding_workers, self.embedding_batch_size
+                ).start()
+            else:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(SEMANTIC_MODEL_NAME)
+            model.encode(['warm-up'], show_progress_bar=False)
+        except Exception as e:
+            self.model_error = str(e)
+            self.model_status = MODEL_STATUS_UNAVAILABLE
+            logger.warning(f"⚠️ Modèle sémantique non disponible, similarité lexicale conservée: {e}")
+            return
+        
+        try:
+            self.embedding_store = EmbeddingStore.from_env(SEMANTIC_MODEL_NAME)
+            self.ann_index = SemanticAnnIndex.from_env(self.embedding_store)
+        except Exception as e:
+            logger.warning(f"⚠️ Store d'embeddings non disponible: {e}")
+        
+        # Publié en dernier : les requêtes basculent sur le chemin sémantique d'un bloc
+        self.semantic_model = model
+        self.model_load_seconds = round(time.perf_counter() - start, 1)
+        self.model_status = MODEL_STATUS_READY
+        logger.info(f"✅ Modèle sémantique chargé en {self.model_load_seconds}s")
+    
     def get_recommendations(self, job_offer, top_n=10):
         """Génère des recommandations intelligentes pour une offre d'emploi"""
         try:
@@ -555,10 +639,15 @@ class ImprovedRecommendationSystem:
             # 2️⃣ Calcul des scores de correspondance
             recommendations = []
             
-            for _, stagiaire in stagiaires_df.iterrows():
+            # Similarités sémantiques : un produit matrice-vecteur, ou plus proches voisins
+            # approchés au-delà de ANN_MIN_CANDIDATES (seuls ceux-ci sont rescorés ensuite)
+            total_candidates = len(stagiaires_df)
+            stagiaires_df, semantic_scores = self._calculate_semantic_scores(job_offer, stagiaires_df)
+            
+            for position, (_, stagiaire) in enumerate(stagiaires_df.iterrows()):
                 try:
                     # Calcul du score principal
-                    match_score = self._calculate_match_score(job_offer, stagiaire)
+                    match_score = self._calculate_match_score(job_offer, stagiaire, semantic_scores[position])
                     
                     # Calcul du score de compétences
                     skill_score = self.calculate_enhanced_skill_similarity(
@@ -613,7 +702,7 @@ class ImprovedRecommendationSystem:
             
             return {
                 'recommendations': top_recommendations,
-                'total_candidates': len(stagiaires_df),
+                'total_candidates': total_candidates,
                 'processed_candidates': len(recommendations),
                 'top_n': len(top_recommendations)
             }
@@ -626,26 +715,145 @@ class ImprovedRecommendationSystem:
                 'error': str(e)
             }
     
-    def _calculate_match_score(self, job_offer, stagiaire):
+    def _calculate_match_score(self, job_offer, stagiaire, semantic_score=None):
         """Calcule le score de correspondance textuelle (sans bonus)"""
         try:
             # Score basé uniquement sur le titre et la description
-            text_score = self._calculate_text_similarity(job_offer, stagiaire)
+            text_score = self._calculate_text_similarity(job_offer, stagiaire, semantic_score)
             return text_score
             
         except Exception as e:
             logger.warning(f"Erreur calcul match score: {e}")
             return 0.0
     
-    def _calculate_text_similarity(self, job_offer, stagiaire):
+    def _calculate_semantic_scores(self, job_offer, stagiaires_df):
+        """
+        Candidats à scorer et leurs similarités sémantiques avec l'offre (None si non calculée).
+        Offre encodée une fois par requête, vecteurs candidats lus dans le store (ou encodés par lots) :
+        un seul produit matrice-vecteur, ou recherche approchée quand l'index ANN s'applique.
+        """
+        semantic_scores = [None] * len(stagiaires_df)
+        if not self.semantic_model:
+            return stagiaires_df, semantic_scores
+        
+        try:
+            job_text = self._job_text(job_offer)
+            if not job_text.strip():
+                return stagiaires_df, semantic_scores
+            
+            positions, ids, texts = [], [], []
+            for position, (_, stagiaire) in enumerate(stagiaires_df.iterrows()):
+                stagiaire_text = self._stagiaire_text(stagiaire)
+                if stagiaire_text.strip():
+                    positions.append(position)
+                    ids.append(stagiaire.get('Id', 0))
+                    texts.append(stagiaire_text)
+            
+            if not positions:
+                return stagiaires_df, semantic_scores
+            
+            query = self._encode([job_text])[0]
+            if self.embedding_store is not None:
+                rows = self.embedding_store.ensure(ids, texts, self._encode)
+                if self.ann_index is not None and len(ids) >= self.ann_index.min_candidates:
+                    return self._nearest_candidates(job_offer, stagiaires_df, query, positions, ids, rows, texts)
+                similarities = self.embedding_store.similarities(rows, query)
+            else:
+                similarities = self._encode(texts) @ query
+            
+            for position, similarity in zip(positions, similarities):
+                semantic_scores[position] = max(0.0, float(similarity))
+        except EmbeddingPoolTimeoutError as e:
+            # Pool d'encodage saturé ou worker arrêté : similarité lexicale pour cette requête plutôt qu'une attente
+            logger.warning(f"⏱️ {e} - similarité lexicale utilisée")
+            for position, stagiaire_text in zip(positions, texts):
+                semantic_scores[position] = self._calculate_basic_similarity(job_text, stagiaire_text)
+        except Exception as e:
+            logger.warning(f"Erreur similarités sémantiques groupées, calcul par candidat: {e}")
+        
+        return stagiaires_df, semantic_scores
+    
+    def _nearest_candidates(self, job_offer, stagiaires_df, query, positions, ids, rows, texts):
+        """Plus proches voisins sémantiques (tous départements + département de l'offre), similarités exactes"""
+        departments = [stagiaires_df.iloc[position].get('DepartmentId') for position in positions]
+        self.ann_index.sync(ids, rows, departments, texts)
+        
+        searches = [None]
+        if job_offer.get('departmentId') is not None:
+            searches.append([job_offer.get('departmentId')])
+        
+        neighbours = {}
+        for search_departments in searches:
+            found_ids, similarities = self.ann_index.search(query, departments=search_departments)
+            neighbours.update(zip(found_ids.tolist(), similarities.tolist()))
+        
+        selected, semantic_scores = [], []
+        for position, stagiaire_id in zip(positions, ids):
+            similarity = neighbours.get(int(stagiaire_id))
+            if similarity is not None:
+                selected.append(position)
+                semantic_scores.append(max(0.0, float(similarity)))
+        
+        logger.info(f"🔎 Index ANN: {len(selected)} voisins sémantiques retenus sur {len(ids)} candidats")
+        return stagiaires_df.iloc[selected], semantic_scores
+    
+    def apply_event(self, event_type, stagiaire_id):
+        """
+        Événement du backend .NET (rating soumis, compétences modifiées, CV déposé) : vecteur sémantique
+        du stagiaire réencodé dans le store et son entrée de l'index ANN mise à jour, hors requête.
+        Les autres données sont relues à chaque demande.
+        """
+        if self.embedding_store is None or not self.semantic_model:
+            return {'applied': False, 'reason': f"Modèle sémantique non prêt ({self.model_status})"}
+        
+        stagiaire_df = self.get_stagiaires_data(stagiaire_id=stagiaire_id)
+        if stagiaire_df.empty:
+            return {'applied': False, 'reason': f"Stagiaire {stagiaire_id} introuvable"}
+        
+        stagiaire = stagiaire_df.iloc[0]
+        stagiaire_text = self._stagiaire_text(stagiaire)
+        if not stagiaire_text.strip():
+            return {'applied': False, 'reason': 'Profil sans texte à encoder'}
+        
+        # Réencodé seulement si le texte a changé (clé du store = empreinte du texte)
+        rows = self.embedding_store.ensure([int(stagiaire_id)], [stagiaire_text], self._encode)
+        if self.ann_index is not None:
+            self.ann_index.upsert([int(stagiaire_id)], rows, [stagiaire.get('DepartmentId')], [stagiaire_text])
+        
+        logger.info(f"Événement {event_type}: vecteur du stagiaire {stagiaire_id} à jour")
+        return {'applied': True, 'stagiaireId': int(stagiaire_id)}
+    
+    def _encode(self, texts):
+        """Vecteurs normalisés des textes, encodés par lots de `embedding_batch_size`"""
+        return self.semantic_model.encode(
+            texts,
+            batch_size=self.embedding_batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+    
+    def _job_text(self, job_offer):
+        """Texte de l'offre comparé aux profils (titre + description)"""
+        return f"{job_offer.get('title', '')} {job_offer.get('description', '')}"
+    
+    def _stagiaire_text(self, stagiaire):
+        """Texte du profil stagiaire (compétences déclarées + extraites du CV)"""
+        return f"{stagiaire.get('Skills', '')} {stagiaire.get('CV_ExtractedSkills', '')}"
+    
+    def _calculate_text_similarity(self, job_offer, stagiaire, semantic_score=None):
         """Calcule la similarité textuelle entre l'offre et le profil stagiaire"""
         try:
-            job_text = f"{job_offer.get('title', '')} {job_offer.get('description', '')}"
-            stagiaire_text = f"{stagiaire.get('Skills', '')} {stagiaire.get('CV_ExtractedSkills', '')}"
+            job_text = self._job_text(job_offer)
+            stagiaire_text = self._stagiaire_text(stagiaire)
             
             if not job_text.strip() or not stagiaire_text.strip():
                 return 0.0
             
+            # Similarité déjà calculée pour toute la liste
+            if semantic_score is not None:
+                return semantic_score
+            
             # Utilisation du modèle sémantique si disponible
             if self.semantic_model:
                 return self._calculate_semantic_similarity(job_text, stagiaire_text)
@@ -659,10 +867,9 @@ class ImprovedRecommendationSystem:
     def _calculate_semantic_similarity(self, text1, text2):
         """Calcule la similarité sémantique avec sentence transformers"""
         try:
-            embeddings1 = self.semantic_model.encode([text1])
-            embeddings2 = self.semantic_model.encode([text2])
-            similarity = cosine_similarity(embeddings1, embeddings2)[0][0]
-            return max(0.0, float(similarity))
+            # Un seul appel au modèle ; vecteurs normalisés : le produit scalaire est le cosinus
+            embeddings = self._encode([text1, text2])
+            return max(0.0, float(embeddings[0] @ embeddings[1]))
         except:
             return self._calculate_basic_similarity(text1, text2)
     
@@ -870,11 +1077,11 @@ class ImprovedRecommendationSystem:
         """Récupère les données des stagiaires via CVAnalysisEngine"""
         return self.get_stagiaires_data()
     
-    def get_stagiaires_data(self):
-        """Récupère les données des stagiaires avec ratings améliorés"""
+    def get_stagiaires_data(self, stagiaire_id=None):
+        """Récupère les données des stagiaires avec ratings améliorés (tous, ou un seul stagiaire)"""
         try:
             logger.info(f"Connexion à: {os.getenv('DB_SERVER', 'DESKTOP-913R9GN')}")
-            conn = pyodbc.connect(self.connection_string)
+            conn = self.db_pool.acquire()
             
             # Requête de base pour les stagiaires (selon modèle C#)
             base_query = """
@@ -885,9 +1092,13 @@ class ImprovedRecommendationSystem:
             FROM Users 
             WHERE Role = 3
             """
+            params = None
+            if stagiaire_id is not None:
+                base_query += "AND Id = ?\n"
+                params = [int(stagiaire_id)]
             
             logger.info("Récupération des stagiaires...")
-            df = pd.read_sql(base_query, conn)
+            df = pd.read_sql(base_query, conn, params=params)
             logger.info(f"{len(df)} stagiaires trouvés")
             
             if df.empty:
@@ -962,18 +1173,26 @@ def health_check():
     """Vérification de l'état du système"""
     try:
         # Test de connexion à la base
-        conn = pyodbc.connect(recommendation_system.connection_string)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM Users WHERE Role = 3")
-        stagiaires_count = cursor.fetchone()[0]
-        conn.close()
+        with recommendation_system.db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM Users WHERE Role = 3")
+            stagiaires_count = cursor.fetchone()[0]
         
         return jsonify({
             'status': 'healthy',
             'database_connection': 'OK',
             'stagiaires_count': stagiaires_count,
             'semantic_model': 'Available' if recommendation_system.semantic_model else 'Not available',
+            'semantic_model_status': recommendation_system.model_status,
             'cv_analysis_engine': 'Available',
+            'cv_fetcher': recommendation_system.cv_analyzer.cv_fetcher.stats(),
+            'cv_cache': recommendation_system.cv_analyzer.cv_fetcher.cache.stats()
+                if recommendation_system.cv_analyzer.cv_fetcher.cache else None,
+            'database_pool': recommendation_system.db_pool.stats(),
+            'embedding_store': recommendation_system.embedding_store.stats() if recommendation_system.embedding_store else None,
+            'ann_index': recommendation_system.ann_index.stats() if recommendation_system.ann_index else None,
+            'embedding_workers': recommendation_system.semantic_model.stats()
+                if isinstance(recommendation_system.semantic_model, EmbeddingWorkerPool) else None,
             'timestamp': datetime.now().isoformat()
         })
         
@@ -984,6 +1203,76 @@ def health_check():
         }), 500
 
 
+@app.route('/api/live', methods=['GET'])
+def liveness_check():
+    """Liveness : le processus répond (aucune dépendance vérifiée)"""
+    return jsonify({
+        'status': 'alive',
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness : chargement du modèle sémantique terminé et base joignable (503 sinon)"""
+    payload = {
+        'semantic_model': recommendation_system.model_status,
+        'model_load_seconds': recommendation_system.model_load_seconds,
+        'text_similarity': 'semantic' if recommendation_system.semantic_model else 'lexical',
+        'timestamp': datetime.now().isoformat()
+    }
+    if recommendation_system.model_error:
+        payload['model_error'] = recommendation_system.model_error
+    
+    try:
+        conn = recommendation_system.db_pool.acquire()
+        conn.close()
+    except Exception as e:
+        payload.update({'status': 'not_ready', 'error': str(e)})
+        return jsonify(payload), 503
+    
+    if not recommendation_system.is_model_settled():
+        payload['status'] = 'warming_up'
+        return jsonify(payload), 503
+    
+    payload['status'] = 'ready'
+    return jsonify(payload)
+
+
+# 📨 ÉVÉNEMENTS DU BACKEND (MISE À JOUR PONCTUELLE D'UN STAGIAIRE)
+@app.route('/api/events', methods=['POST'])
+def post_event():
+    """Événement du backend .NET (body: { type: rating_submitted | skills_changed | cv_uploaded, stagiaireId })"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        event_type = data.get('type')
+        if event_type not in EVENT_TYPES:
+            return jsonify({
+                'success': False,
+                'error': f"Type d'événement inconnu: {event_type} (attendu: {', '.join(EVENT_TYPES)})"
+            }), 400
+        
+        try:
+            stagiaire_id = int(data.get('stagiaireId'))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Champ stagiaireId obligatoire'}), 400
+        
+        result = recommendation_system.apply_event(event_type, stagiaire_id)
+        
+        return jsonify({
+            'success': True,
+            'event': event_type,
+            **result
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur traitement événement: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 # 📄 ENDPOINT TEST ANALYSE ML DES CVs
 @app.route('/api/test-cv-analysis', methods=['POST'])
 def test_cv_analysis():
@@ -996,7 +1285,7 @@ def test_cv_analysis():
             return jsonify({'error': 'URL CV manquante'}), 400
         
         # Test de l'analyse CV
-        cv_result = recommendation_system.cv_analysis_engine.analyze_stagiaire_cv(cv_url)
+        cv_result = recommendation_system.cv_analyzer.analyze_stagiaire_cv(cv_url)
         
         return jsonify({
             'success': True,
@@ -1011,48 +1300,99 @@ def test_cv_analysis():
         }), 500
 
 
+# 📚 ANALYSE DES CVs D'UN DÉPARTEMENT (TÉLÉCHARGEMENTS PARALLÈLES)
+@app.route('/api/cv-analysis/batch', methods=['POST'])
+def cv_analysis_batch():
+    """Analyse ML des CVs des stagiaires (body: { departmentId } ou { stagiaireIds: [...] })"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        stagiaires_df = recommendation_system.get_stagiaires_data()
+        if 'stagiaireIds' in data:
+            stagiaires_df = stagiaires_df[stagiaires_df['Id'].isin([int(i) for i in data['stagiaireIds']])]
+        elif data.get('departmentId'):
+            stagiaires_df = stagiaires_df[stagiaires_df['DepartmentId'] == int(data['departmentId'])]
+        else:
+            return jsonify({'success': False, 'error': 'Champ departmentId ou stagiaireIds obligatoire'}), 400
+        
+        started = time.monotonic()
+        stagiaires_by_url = {}
+        for stagiaire_id, cv_url in zip(stagiaires_df['Id'], stagiaires_df['CvUrl']):
+            stagiaires_by_url.setdefault(None if pd.isna(cv_url) else cv_url, []).append(int(stagiaire_id))
+        
+        # Résultats dans l'ordre d'arrivée des téléchargements
+        results = []
+        for cv_url, cv_result in recommendation_system.cv_analyzer.analyze_stagiaire_cvs(list(stagiaires_by_url)):
+            cv_analysis = cv_result['cv_analysis']
+            for stagiaire_id in stagiaires_by_url[cv_url]:
+                results.append({
+                    'stagiaireId': stagiaire_id,
+                    'cvUrl': cv_url,
+                    'success': cv_result['success'],
+                    'error': cv_result.get('error'),
+                    'keySkills': cv_analysis['key_skills'],
+                    'experienceYears': cv_analysis['experience_years'],
+                    'educationLevel': cv_analysis['education_level'],
+                    'qualityScore': cv_analysis['quality_score']
+                })
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'totalAnalyzed': len(results),
+            'totalSucceeded': sum(1 for result in results if result['success']),
+            'durationSeconds': round(time.monotonic() - started, 2),
+            'cv_fetcher': recommendation_system.cv_analyzer.cv_fetcher.stats(),
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans cv_analysis_batch: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 # 📝 PROFIL TEXTUEL
 def test_enum_types():
     """Test des types ENUM corrigés dans la table Ratings"""
     try:
-        conn = pyodbc.connect(recommendation_system.connection_string)
+        with recommendation_system.db_pool.connection() as conn:
         
-        logger.info("🧪 === TEST DES TYPES ENUM DANS RATINGS ===")
+            logger.info("🧪 === TEST DES TYPES ENUM DANS RATINGS ===")
         
-        # Test 1: Vérification des types string
-        test_query_string = """
-        SELECT Type, COUNT(*) as count, AVG(CAST(Score as FLOAT)) as avg_score
-        FROM Ratings 
-        WHERE Type IN ('TuteurToStagiaire', 'RHToStagiaire')
-        GROUP BY Type
-        """
+            # Test 1: Vérification des types string
+            test_query_string = """
+            SELECT Type, COUNT(*) as count, AVG(CAST(Score as FLOAT)) as avg_score
+            FROM Ratings 
+            WHERE Type IN ('TuteurToStagiaire', 'RHToStagiaire')
+            GROUP BY Type
+            """
         
-        try:
-            string_results = pd.read_sql(test_query_string, conn)
-            logger.info("✅ Types ENUM STRING - SUCCÈS:")
-            for _, row in string_results.iterrows():
-                logger.info(f"   - {row['Type']}: {row['count']} ratings, moyenne {row['avg_score']:.2f}")
-            
-            total_string = string_results['count'].sum() if len(string_results) > 0 else 0
-            logger.info(f"   📊 Total avec types string: {total_string}")
-            
-            conn.close()
-            
-            return jsonify({
-                'success': True,
-                'enum_types_working': True,
-                'message': 'Types ENUM string validés avec succès',
-                'total_ratings': int(total_string),
-                'ratings_by_type': string_results.to_dict('records') if len(string_results) > 0 else []
-            })
+            try:
+                string_results = pd.read_sql(test_query_string, conn)
+                logger.info("✅ Types ENUM STRING - SUCCÈS:")
+                for _, row in string_results.iterrows():
+                    logger.info(f"   - {row['Type']}: {row['count']} ratings, moyenne {row['avg_score']:.2f}")
+            
+                total_string = string_results['count'].sum() if len(string_results) > 0 else 0
+                logger.info(f"   📊 Total avec types string: {total_string}")
+            
+                return jsonify({
+                    'success': True,
+                    'enum_types_working': True,
+                    'message': 'Types ENUM string validés avec succès',
+                    'total_ratings': int(total_string),
+                    'ratings_by_type': string_results.to_dict('records') if len(string_results) > 0 else []
+                })
             
-        except Exception as e:
-            logger.error(f"❌ Types ENUM STRING échoués: {e}")
-            conn.close()
-            return jsonify({
-                'success': False,
-                'error': f'Types ENUM string échoués: {str(e)}'
-            })
+            except Exception as e:
+                logger.error(f"❌ Types ENUM STRING échoués: {e}")
+                return jsonify({
+                    'success': False,
+                    'error': f'Types ENUM string échoués: {str(e)}'
+                })
             
     except Exception as e:
         logger.error(f"❌ Erreur test enum types: {e}")
@@ -1109,44 +1449,43 @@ def debug_recommendation_process():
         data = request.get_json()
         department_id = data.get('departmentId', 1)
         
-        conn = pyodbc.connect(recommendation_system.connection_string)
+        with recommendation_system.db_pool.connection() as conn:
         
-        # Étape 1: Récupérer tous les stagiaires
-        all_stagiaires_query = """
-        SELECT Id, FirstName, LastName, DepartmentId, StartDate, EndDate, Skills
-        FROM Users 
-        WHERE Role = 3
-        """
-        all_stagiaires = pd.read_sql(all_stagiaires_query, conn)
-        
-        # Étape 2: Filtrer par département
-        dept_filtered = all_stagiaires[all_stagiaires['DepartmentId'] == int(department_id)]
-        
-        # Étape 3: Vérifier les stages terminés
-        completed_stages = []
-        for _, stagiaire in dept_filtered.iterrows():
-            if recommendation_system.is_stage_completed(stagiaire):
-                completed_stages.append({
-                    'id': stagiaire['Id'],
-                    'name': f"{stagiaire['FirstName']} {stagiaire['LastName']}",
-                    'end_date': str(stagiaire['EndDate']),
-                    'skills': stagiaire.get('Skills', '')
-                })
+            # Étape 1: Récupérer tous les stagiaires
+            all_stagiaires_query = """
+            SELECT Id, FirstName, LastName, DepartmentId, StartDate, EndDate, Skills
+            FROM Users 
+            WHERE Role = 3
+            """
+            all_stagiaires = pd.read_sql(all_stagiaires_query, conn)
         
-        conn.close()
+            # Étape 2: Filtrer par département
+            dept_filtered = all_stagiaires[all_stagiaires['DepartmentId'] == int(department_id)]
+        
+            # Étape 3: Vérifier les stages terminés
+            completed_stages = []
+            for _, stagiaire in dept_filtered.iterrows():
+                if recommendation_system.is_stage_completed(stagiaire):
+                    completed_stages.append({
+                        'id': stagiaire['Id'],
+                        'name': f"{stagiaire['FirstName']} {stagiaire['LastName']}",
+                        'end_date': str(stagiaire['EndDate']),
+                        'skills': stagiaire.get('Skills', '')
+                    })
         
-        return jsonify({
-            'success': True,
-            'debug_info': {
-                'total_stagiaires': len(all_stagiaires),
-                'department_filtered': len(dept_filtered),
-                'completed_stages': len(completed_stages),
-                'department_id_requested': department_id
-            },
-            'all_stagiaires_sample': all_stagiaires.head(3).to_dict('records'),
-            'dept_filtered_sample': dept_filtered.head(3).to_dict('records'),
-            'completed_stages_list': completed_stages
-        })
+        
+            return jsonify({
+                'success': True,
+                'debug_info': {
+                    'total_stagiaires': len(all_stagiaires),
+                    'department_filtered': len(dept_filtered),
+                    'completed_stages': len(completed_stages),
+                    'department_id_requested': department_id
+                },
+                'all_stagiaires_sample': all_stagiaires.head(3).to_dict('records'),
+                'dept_filtered_sample': dept_filtered.head(3).to_dict('records'),
+                'completed_stages_list': completed_stages
+            })
         
     except Exception as e:
         logger.error(f"Erreur debug process: {e}")
@@ -1156,30 +1495,29 @@ def debug_recommendation_process():
 @app.route('/api/debug-departments', methods=['GET'])
 def debug_departments():
     try:
-        conn = pyodbc.connect(recommendation_system.connection_string)
-        
-        # Départements
-        dept_query = "SELECT Id, DepartmentName FROM Departments"
-        dept_df = pd.read_sql(dept_query, conn)
-        
-        # Stagiaires avec leurs départements  
-        stagiaire_query = """
-        SELECT u.Id, u.FirstName, u.LastName, u.DepartmentId, d.DepartmentName,
-               u.EndDate, u.Role
-        FROM Users u
-        LEFT JOIN Departments d ON u.DepartmentId = d.Id
-        WHERE u.Role = 3
-        """
-        stagiaire_df = pd.read_sql(stagiaire_query, conn)
+        with recommendation_system.db_pool.connection() as conn:
+        
+            # Départements
+            dept_query = "SELECT Id, DepartmentName FROM Departments"
+            dept_df = pd.read_sql(dept_query, conn)
+        
+            # Stagiaires avec leurs départements  
+            stagiaire_query = """
+            SELECT u.Id, u.FirstName, u.LastName, u.DepartmentId, d.DepartmentName,
+                   u.EndDate, u.Role
+            FROM Users u
+            LEFT JOIN Departments d ON u.DepartmentId = d.Id
+            WHERE u.Role = 3
+            """
+            stagiaire_df = pd.read_sql(stagiaire_query, conn)
         
-        conn.close()
         
-        return jsonify({
-            'success': True,
-            'departments': dept_df.to_dict('records'),
-            'stagiaires': stagiaire_df.to_dict('records'),
-            'stagiaires_count': len(stagiaire_df)
-        })
+            return jsonify({
+                'success': True,
+                'departments': dept_df.to_dict('records'),
+                'stagiaires': stagiaire_df.to_dict('records'),
+                'stagiaires_count': len(stagiaire_df)
+            })
         
     except Exception as e:
         logger.error(f"Erreur debug départements: {e}")
@@ -1189,36 +1527,35 @@ def debug_departments():
 @app.route('/api/debug-users-structure', methods=['GET'])
 def debug_users_structure():
     try:
-        conn = pyodbc.connect(recommendation_system.connection_string)
-        
-        # Structure de la table Users
-        structure_query = """
-        SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_DEFAULT
-        FROM INFORMATION_SCHEMA.COLUMNS 
-        WHERE TABLE_NAME = 'Users'
-        ORDER BY ORDINAL_POSITION
-        """
+        with recommendation_system.db_pool.connection() as conn:
+        
+            # Structure de la table Users
+            structure_query = """
+            SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_DEFAULT
+            FROM INFORMATION_SCHEMA.COLUMNS 
+            WHERE TABLE_NAME = 'Users'
+            ORDER BY ORDINAL_POSITION
+            """
         
-        structure_df = pd.read_sql(structure_query, conn)
+            structure_df = pd.read_sql(structure_query, conn)
         
-        # Échantillon de données Users avec Role = 3
-        sample_query = """
-        SELECT TOP 5 Id, FirstName, LastName, Email, Role, DepartmentId, 
-               StartDate, EndDate, Skills, stage, etudiant, statuts
-        FROM Users 
-        WHERE Role = 3
-        """
+            # Échantillon de données Users avec Role = 3
+            sample_query = """
+            SELECT TOP 5 Id, FirstName, LastName, Email, Role, DepartmentId, 
+                   StartDate, EndDate, Skills, stage, etudiant, statuts
+            FROM Users 
+            WHERE Role = 3
+            """
         
-        sample_df = pd.read_sql(sample_query, conn)
+            sample_df = pd.read_sql(sample_query, conn)
         
-        conn.close()
         
-        return jsonify({
-            'success': True,
-            'table_structure': structure_df.to_dict('records'),
-            'sample_users': sample_df.to_dict('records'),
-            'users_count': len(sample_df)
-        })
+            return jsonify({
+                'success': True,
+                'table_structure': structure_df.to_dict('records'),
+                'sample_users': sample_df.to_dict('records'),
+                'users_count': len(sample_df)
+            })
         
     except Exception as e:
         logger.error(f"Erreur debug users: {e}")
@@ -1252,24 +1589,23 @@ def debug_stagiaires_data():
 @app.route('/api/debug-table-names', methods=['GET'])
 def debug_table_names():
     try:
-        conn = pyodbc.connect(recommendation_system.connection_string)
-        
-        # Récupérer la liste des tables
-        tables_query = """
-        SELECT TABLE_NAME 
-        FROM INFORMATION_SCHEMA.TABLES 
-        WHERE TABLE_TYPE = 'BASE TABLE'
-        ORDER BY TABLE_NAME
-        """
+        with recommendation_system.db_pool.connection() as conn:
+        
+            # Récupérer la liste des tables
+            tables_query = """
+            SELECT TABLE_NAME 
+            FROM INFORMATION_SCHEMA.TABLES 
+            WHERE TABLE_TYPE = 'BASE TABLE'
+            ORDER BY TABLE_NAME
+            """
         
-        tables_df = pd.read_sql(tables_query, conn)
-        conn.close()
+            tables_df = pd.read_sql(tables_query, conn)
         
-        return jsonify({
-            'success': True,
-            'tables': tables_df['TABLE_NAME'].tolist(),
-            'table_count': len(tables_df)
-        })
+            return jsonify({
+                'success': True,
+                'tables': tables_df['TABLE_NAME'].tolist(),
+                'table_count': len(tables_df)
+            })
         
     except Exception as e:
         logger.error(f"Erreur debug tables: {e}")
@@ -1279,51 +1615,50 @@ def debug_table_names():
 @app.route('/api/debug-base-query', methods=['GET'])
 def debug_base_query():
     try:
-        conn = pyodbc.connect(recommendation_system.connection_string)
+        with recommendation_system.db_pool.connection() as conn:
         
-        # Test de la requête de base simple
-        simple_query = """
-        SELECT Id, FirstName, LastName, Email, Role
-        FROM Users 
-        WHERE Role = 3
-        """
+            # Test de la requête de base simple
+            simple_query = """
+            SELECT Id, FirstName, LastName, Email, Role
+            FROM Users 
+            WHERE Role = 3
+            """
         
-        simple_df = pd.read_sql(simple_query, conn)
+            simple_df = pd.read_sql(simple_query, conn)
         
-        # Test de la requête complète
-        full_query = """
-        SELECT 
-            Id, FirstName, LastName, Email, Skills, CvUrl,
-            StartDate, EndDate, DepartmentId, Role, statuts,
-            stage, etudiant, UniversityId
-        FROM Users 
-        WHERE Role = 3
-        """
+            # Test de la requête complète
+            full_query = """
+            SELECT 
+                Id, FirstName, LastName, Email, Skills, CvUrl,
+                StartDate, EndDate, DepartmentId, Role, statuts,
+                stage, etudiant, UniversityId
+            FROM Users 
+            WHERE Role = 3
+            """
         
-        try:
-            full_df = pd.read_sql(full_query, conn)
-            full_success = True
-            full_error = None
-        except Exception as e:
-            full_df = pd.DataFrame()
-            full_success = False
-            full_error = str(e)
+            try:
+                full_df = pd.read_sql(full_query, conn)
+                full_success = True
+                full_error = None
+            except Exception as e:
+                full_df = pd.DataFrame()
+                full_success = False
+                full_error = str(e)
         
-        conn.close()
         
-        return jsonify({
-            'success': True,
-            'simple_query': {
-                'count': len(simple_df),
-                'sample': simple_df.head(3).to_dict('records') if not simple_df.empty else []
-            },
-            'full_query': {
-                'success': full_success,
-                'count': len(full_df),
-                'error': full_error,
-                'sample': full_df.head(3).to_dict('records') if not full_df.empty else []
-            }
-        })
+            return jsonify({
+                'success': True,
+                'simple_query': {
+                    'count': len(simple_df),
+                    'sample': simple_df.head(3).to_dict('records') if not simple_df.empty else []
+                },
+                'full_query': {
+                    'success': full_success,
+                    'count': len(full_df),
+                    'error': full_error,
+                    'sample': full_df.head(3).to_dict('records') if not full_df.empty else []
+                }
+            })
         
     except Exception as e:
         logger.error(f"Erreur debug base query: {e}")
@@ -1531,6 +1866,10 @@ if __name__ == '__main__':
     print("\n📊 Endpoints disponibles pour Angular:")
     print("   POST /api/recommendations - Recommandations IA avec sémantique")
     print("   GET  /api/health - Vérification de santé")
+    print("   GET  /api/live - Liveness (processus actif)")
+    print("   GET  /api/ready - Readiness (503 pendant le chargement du modèle)")
+    print("   POST /api/events - Événements du backend (rating, compétences, CV)")
+    print("   POST /api/cv-analysis/batch - Analyse des CVs d'un département (téléchargements parallèles)")
     print("   POST /api/test-semantic-similarity - Test similarité sémantique")
     print("   GET  /api/demo-semantic-improvements - Démo améliorations sémantiques")
     print("   GET  /api/test-enum-types - Test types ENUM corrigés")
@@ -1555,5 +1894,9 @@ if __name__ == '__main__':
     global recommendation_system
     recommendation_system = ImprovedRecommendationSystem()
     print("✅ Système de recommandation initialisé")
+    
+    # Modèle chargé pendant que le serveur démarre ; similarité lexicale en attendant
+    recommendation_system.start_model_warmup()
+    print("⏳ Modèle sémantique en cours de chargement (voir /api/ready)")
 
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
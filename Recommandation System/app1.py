@@ -11,6 +11,27 @@ from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 import logging
+import threading
+import hashlib
+
+from data_layer import (
+    fetch_stagiaires, filter_eligible_stagiaires, load_rating_aggregates,
+    attach_rating_columns, calculate_rating_quality
+)
+from db_pool import ConnectionPool, connection_string_from_env
+from candidate_snapshot import CandidateSnapshot
+from tfidf_index import CandidateTfidfIndex
+from skill_cache import SkillExtractionCache
+from skill_matcher import SkillMatcher, MATCHER_VERSION
+from skill_families import SkillFamilyIndex
+from skill_index import CandidateSkillIndex, EMPTY_SKILLS_VALUES
+from job_offer_index import JobOfferIndex
+from recommendation_cache import RecommendationCache, offer_key
+from recommendation_writer import RecommendationWriter
+from recommendation_jobs import RecommendationJobManager, JobCancelledError, JobQueueFullError
+from scoring_engine import (
+    score_candidates, score_candidate_matrix, rank_candidates, MIN_SKILL_SIMILARITY, MIN_COMPOSITE_SCORE
+)
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +40,15 @@ logger = logging.getLogger(__name__)
 # Charger les variables d'environnement
 load_dotenv()
 
+# Nombre maximum d'offres par appel à /api/recommendations/batch
+BATCH_MAX_OFFERS = int(os.getenv('RECOMMENDATION_BATCH_MAX_OFFERS', 500))
+
+# Événements acceptés par /api/events (envoyés par le backend .NET)
+EVENT_TYPES = ('rating_submitted', 'skills_changed', 'cv_uploaded')
+
+# Lignes remplacées (part du snapshot) au-delà desquelles un index candidats est reconstruit plutôt que complété
+INDEX_PATCH_MAX_FRACTION = 0.2
+
 class ImprovedRecommendationSystem:
     def __init__(self):
         self.tfidf_vectorizer = TfidfVectorizer(
@@ -28,6 +58,16 @@ class ImprovedRecommendationSystem:
             lowercase=True
         )
         self.connection_string = self._get_connection_string()
+        self.db_pool = self._create_db_pool()
+        self.candidate_snapshot = self._create_candidate_snapshot()
+        
+        # Index TF-IDF des profils candidats (reconstruit quand le snapshot change)
+        self.tfidf_index = None
+        self._tfidf_index_lock = threading.Lock()
+        
+        # Matrice candidats x compétences (reconstruite quand le snapshot change)
+        self.skill_index = None
+        self._skill_index_lock = threading.Lock()
         
         # DICTIONNAIRE DE SYNONYMES ÉTENDU
         self.synonyms_dict = {
@@ -78,16 +118,46 @@ class ImprovedRecommendationSystem:
             'tensorflow': 'ai', 'pytorch': 'ai', 'pandas': 'data', 'numpy': 'data'
         }
         
+        # Synonymes compilés une fois en automate (correspondance la plus longue)
+        self.skill_matcher = SkillMatcher(self.synonyms_dict)
+        
+        # Masques de familles de compétences (calculés une fois par compétence)
+        self.skill_families = SkillFamilyIndex()
+        
+        # Offres ouvertes (JobOffers) pour la recherche inverse stagiaire -> offres
+        self.job_offer_index = JobOfferIndex(
+            self.db_pool, self.extract_skills_dynamically, self.skill_families, self.preprocess_text
+        )
+        
+        # Cache des compétences extraites (SKILL_CACHE_MAX_SIZE, SKILL_CACHE_PATH), invalidé si les règles changent
+        synonyms_fingerprint = hashlib.blake2b(
+            json.dumps([MATCHER_VERSION, self.synonyms_dict], sort_keys=True).encode('utf-8'), digest_size=8
+        ).hexdigest()
+        self.skill_cache = SkillExtractionCache.from_env(namespace=synonyms_fingerprint)
+        
+        # Résultats de /api/recommendations par offre normalisée et version du snapshot
+        # (RECOMMENDATION_CACHE_MAX_SIZE, RECOMMENDATION_CACHE_TTL)
+        self.recommendation_cache = RecommendationCache.from_env()
+        
+        # Enregistrement des listes classées dans JobOfferRecommendations (RECOMMENDATION_WRITE_BATCH_SIZE)
+        self.recommendation_writer = RecommendationWriter.from_env(self.db_pool)
+        
+        # Recommandations en arrière-plan (RECOMMENDATION_JOB_WORKERS, RECOMMENDATION_JOB_QUEUE_SIZE, RECOMMENDATION_JOB_TTL)
+        self.recommendation_jobs = RecommendationJobManager.from_env()
+        
     def _get_connection_string(self):
         """Configuration de la connexion à SQL Server"""
-        return (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={os.getenv('DB_SERVER', 'DESKTOP-913R9GN')};"
-            f"DATABASE={os.getenv('DB_NAME', 'PFEDb')};"
-            f"Trusted_Connection=yes;"
-            f"MultipleActiveResultSets=yes;"
-            f"Encrypt=no;"
-        )
+        return connection_string_from_env()
+    
+    def _create_db_pool(self):
+        """Pool de connexions (DB_POOL_MAX_SIZE, DB_POOL_IDLE_TIMEOUT, DB_POOL_TIMEOUT)"""
+        return ConnectionPool.from_env(self.connection_string)
+    
+    def _create_candidate_snapshot(self):
+        """Snapshot des candidats rafraîchi par watermark (désactivable: CANDIDATE_SNAPSHOT_ENABLED=false)"""
+        if os.getenv('CANDIDATE_SNAPSHOT_ENABLED', 'true').lower() in ('0', 'false', 'no'):
+            return None
+        return CandidateSnapshot(self.db_pool, self.get_stagiaires_data)
     
     def normalize_skill(self, skill):
         """Normalise une compétence en gérant les synonymes"""
@@ -96,17 +166,18 @@ class ImprovedRecommendationSystem:
         if skill in self.synonyms_dict:
             return self.synonyms_dict[skill]
         
-        for synonym, normalized in self.synonyms_dict.items():
-            if synonym in skill or skill in synonym:
-                return normalized
-                
-        return skill
+        # Synonyme le plus long contenu dans la compétence, sinon le plus court qui la contient
+        return self.skill_matcher.normalize(skill)
     
     def extract_skills_dynamically(self, text):
-        """Extraction dynamique des compétences avec nettoyage amélioré"""
+        """Extraction dynamique des compétences, mémoïsée par empreinte du texte brut"""
         if not text or pd.isna(text):
             return []
         
+        return self.skill_cache.get_or_compute(str(text), self._extract_skills_uncached)
+    
+    def _extract_skills_uncached(self, text):
+        """Extraction dynamique des compétences avec nettoyage amélioré"""
         text = str(text).lower()
         
         # Mots vides étendus
@@ -165,21 +236,17 @@ class ImprovedRecommendationSystem:
         # Correspondances exactes
         exact_matches = job_set.intersection(candidate_set)
         
-        # Correspondances partielles
-        partial_matches = set()
-        for job_skill in job_skills_list:
-            for candidate_skill in candidate_skills_list:
-                if self._are_skills_related(job_skill, candidate_skill):
-                    partial_matches.add((job_skill, candidate_skill))
+        # Correspondances partielles (paires liées, via les masques de familles précalculés)
+        partial_count = self.skill_families.count_related_pairs(job_skills_list, candidate_skills_list)
         
         # Calcul du score
         exact_score = len(exact_matches) / len(job_set) if job_set else 0
-        partial_score = len(partial_matches) / len(job_set) if job_set else 0
+        partial_score = partial_count / len(job_set) if job_set else 0
         
         final_score = (exact_score * 0.8) + (partial_score * 0.2)
         
         # Bonus de couverture
-        total_matches = len(exact_matches) + len(partial_matches)
+        total_matches = len(exact_matches) + partial_count
         coverage_ratio = total_matches / len(job_set) if job_set else 0
         
         if coverage_ratio >= 1.0:
@@ -192,32 +259,14 @@ class ImprovedRecommendationSystem:
             final_score += 0.1
         
         logger.info(f"Exact matches: {exact_matches}")
-        logger.info(f"Partial matches: {len(partial_matches)}")
+        logger.info(f"Partial matches: {partial_count}")
         logger.info(f"Final score: {final_score:.2f}")
         
         return min(final_score, 1.0)
     
     def _are_skills_related(self, skill1, skill2):
         """Détecte les compétences similaires"""
-        if skill1 in skill2 or skill2 in skill1:
-            return True
-        
-        skill_families = {
-            'frontend': ['react', 'angular', 'vue', 'javascript', 'typescript', 'html', 'css'],
-            'backend': ['node', 'python', 'java', 'csharp', 'php', 'dotnet'],
-            'database': ['sql', 'nosql', 'mysql', 'mongodb', 'postgresql'],
-            'mobile': ['ios', 'android', 'react native', 'flutter', 'swift', 'kotlin'],
-            'data': ['data', 'analytics', 'ai', 'ml'],
-            'design': ['design', 'ui', 'ux', 'photoshop', 'figma'],
-            'cloud': ['aws', 'azure', 'cloud', 'devops']
-        }
-        
-        for family, skills in skill_families.items():
-            if (any(s in skill1 for s in skills) and 
-                any(s in skill2 for s in skills)):
-                return True
-        
-        return False
+        return self.skill_families.are_related(skill1, skill2)
     
     def is_stage_completed(self, stagiaire):
         """Vérifie si le stage est terminé - Version corrigée"""
@@ -270,34 +319,12 @@ class ImprovedRecommendationSystem:
         try:
             logger.info(f"Calcul rating pour stagiaire ID: {stagiaire_id}")
             
-            # 🎯 REQUÊTE PRINCIPALE - TYPES ENUM STRING CORRIGÉS + SANS FILTRE STATUS
-            rating_query = """
-            SELECT 
-                r.Id,
-                r.EvaluatorId,
-                r.EvaluatedUserId,
-                r.Score,
-                r.Type,
-                r.Status,
-                r.Comment,
-                r.DetailedScores,
-                r.CreatedAt,
-                r.SubmittedAt,
-                r.ApprovedAt,
-                e.FirstName + ' ' + e.LastName as EvaluatorName,
-                e.Role as EvaluatorRole
-            FROM Ratings r
-            LEFT JOIN Users e ON r.EvaluatorId = e.Id
-            WHERE r.EvaluatedUserId = ?
-            AND r.Type IN ('TuteurToStagiaire', 'RHToStagiaire')  -- Types ENUM STRING
-            ORDER BY r.CreatedAt DESC
-            """
-            
-            ratings_df = pd.read_sql(rating_query, conn, params=[stagiaire_id])
+            # 🎯 Même agrégation que le chargement groupé (scores détaillés inclus)
+            rating_data = load_rating_aggregates(
+                conn, [stagiaire_id], with_detailed_scores=True
+            ).get(int(stagiaire_id))
             
-            logger.info(f"Total ratings trouvés: {len(ratings_df)}")
-            
-            if len(ratings_df) == 0:
+            if rating_data is None:
                 logger.warning(f"Aucun rating trouvé pour stagiaire {stagiaire_id}")
                 return {
                     'average_rating': 3.0,  # Score neutre par défaut
@@ -307,85 +334,9 @@ class ImprovedRecommendationSystem:
                     'rating_details': []
                 }
             
-            # 📊 ANALYSE DÉTAILLÉE DES RATINGS
-            rating_details = []
-            detailed_scores_sum = {}
-            detailed_scores_count = {}
-            total_score_sum = 0
-            valid_ratings_count = 0
-            
-            for _, rating in ratings_df.iterrows():
-                try:
-                    score = float(rating['Score'])
-                    total_score_sum += score
-                    valid_ratings_count += 1
-                    
-                    # Type d'évaluateur (corriger selon les types ENUM string)
-                    evaluator_type = "Tuteur" if rating['Type'] == 'TuteurToStagiaire' else "RH"
-                    
-                    # Détail du rating
-                    rating_detail = {
-                        'id': rating['Id'],
-                        'score': score,
-                        'evaluator_name': rating['EvaluatorName'],
-                        'evaluator_type': evaluator_type,
-                        'comment': rating['Comment'] or '',
-                        'created_at': rating['CreatedAt'].strftime('%Y-%m-%d') if rating['CreatedAt'] else '',
-                        'status': rating['Status']
-                    }
-                    
-                    # Analyse des scores détaillés (JSON)
-                    if rating['DetailedScores']:
-                        try:
-                            detailed_json = json.loads(rating['DetailedScores'])
-                            rating_detail['detailed_scores'] = detailed_json
-                            
-                            # Accumulation pour moyenne
-                            for criterion, value in detailed_json.items():
-                                if isinstance(value, (int, float)):
-                                    if criterion not in detailed_scores_sum:
-                                        detailed_scores_sum[criterion] = 0
-                                        detailed_scores_count[criterion] = 0
-                                    detailed_scores_sum[criterion] += float(value)
-                                    detailed_scores_count[criterion] += 1
-                                    
-                        except json.JSONDecodeError:
-                            logger.warning(f"Erreur parsing JSON pour rating {rating['Id']}")
-                    
-                    rating_details.append(rating_detail)
-                    
-                    logger.info(f"  - Rating {rating['Id']}: {score}/5 par {evaluator_type} ({rating['EvaluatorName']})")
-                    
-                except Exception as e:
-                    logger.error(f"Erreur traitement rating {rating['Id']}: {e}")
-                    continue
-            
-            # 🧮 CALCUL DES MOYENNES
-            if valid_ratings_count == 0:
-                logger.warning(f"Aucun rating valide pour stagiaire {stagiaire_id}")
-                average_rating = 3.0
-            else:
-                average_rating = total_score_sum / valid_ratings_count
-                
-            # Moyennes des critères détaillés
-            detailed_averages = {}
-            for criterion, total in detailed_scores_sum.items():
-                count = detailed_scores_count[criterion]
-                detailed_averages[criterion] = total / count if count > 0 else 0
-            
-            # 🎯 RÉSULTAT FINAL
-            result = {
-                'average_rating': round(average_rating, 2),
-                'rating_count': valid_ratings_count,
-                'detailed_scores': detailed_averages,
-                'has_ratings': valid_ratings_count > 0,
-                'rating_details': rating_details,
-                'quality_score': self._calculate_rating_quality(valid_ratings_count, average_rating)
-            }
+            logger.info(f"✅ Rating final pour stagiaire {stagiaire_id}: {rating_data['average_rating']:.2f}/5 ({rating_data['rating_count']} évaluations)")
             
-            logger.info(f"✅ Rating final pour stagiaire {stagiaire_id}: {average_rating:.2f}/5 ({valid_ratings_count} évaluations)")
-            
-            return result
+            return rating_data
             
         except Exception as e:
             logger.error(f"Erreur calcul rating pour stagiaire {stagiaire_id}: {e}")
@@ -400,100 +351,39 @@ class ImprovedRecommendationSystem:
     
     def _calculate_rating_quality(self, rating_count, average_rating):
         """Calcule un score de qualité basé sur le nombre et la valeur des ratings"""
-        if rating_count == 0:
-            return 0.3  # Pénalité pour absence de ratings
-        
-        # Score basé sur le nombre d'évaluations
-        count_score = min(rating_count / 3, 1.0)  # Optimal à 3+ évaluations
-        
-        # Score basé sur la note moyenne
-        rating_score = average_rating / 5.0
-        
-        # Combinaison pondérée
-        quality_score = (count_score * 0.3) + (rating_score * 0.7)
-        
-        return round(quality_score, 3)
+        return calculate_rating_quality(rating_count, average_rating)
     
-    def get_stagiaires_data(self):
-        """Récupère les données des stagiaires avec ratings améliorés"""
+    def get_stagiaires_data(self, stagiaire_ids=None, department_id=None, completed_only=False):
+        """Récupère les données des stagiaires avec ratings améliorés (tous, ou filtrés par IDs / département / stage terminé)"""
         try:
             logger.info(f"Connexion à: {os.getenv('DB_SERVER', 'DESKTOP-913R9GN')}")
-            conn = pyodbc.connect(self.connection_string)
-            
-            # Requête de base pour les stagiaires (selon modèle C#)
-            base_query = """
-            SELECT 
-                Id, FirstName, LastName, Email, Skills, CvUrl,
-                StartDate, EndDate, DepartmentId, Role, statuts,
-                stage, etudiant, UniversityId
-            FROM Users 
-            WHERE Role = 3
-            """
+            conn = self.db_pool.acquire()
             
+            # Stagiaires + départements + universités (filtres d'éligibilité appliqués côté SQL)
             logger.info("Récupération des stagiaires...")
-            df = pd.read_sql(base_query, conn)
+            df = fetch_stagiaires(conn, stagiaire_ids, department_id, completed_only)
             logger.info(f"{len(df)} stagiaires trouvés")
             
             if df.empty:
                 conn.close()
                 return df
             
-            # Enrichissement avec départements
-            try:
-                dept_query = "SELECT Id, DepartmentName FROM Departments"
-                dept_df = pd.read_sql(dept_query, conn)
-                df = df.merge(dept_df, left_on='DepartmentId', right_on='Id', how='left', suffixes=('', '_dept'))
-                df = df.drop('Id_dept', axis=1, errors='ignore')
-            except Exception as e:
-                logger.warning(f"Erreur départements: {e}")
-                df['DepartmentName'] = 'Département inconnu'
-            
-            # Enrichissement avec universités
+            # 🎯 CALCUL DES RATINGS AMÉLIORÉS (une seule requête pour tous les stagiaires)
+            logger.info("Calcul des ratings détaillés...")
             try:
-                if 'UniversityId' in df.columns:
-                    uni_query = "SELECT Id, Universityname FROM Universities"
-                    uni_df = pd.read_sql(uni_query, conn)
-                    df = df.merge(uni_df, left_on='UniversityId', right_on='Id', how='left', suffixes=('', '_uni'))
-                    df = df.drop('Id_uni', axis=1, errors='ignore')
-                else:
-                    df['Universityname'] = 'Université inconnue'
+                # Ratings des seuls stagiaires retournés dès qu'un filtre est appliqué
+                filtered = stagiaire_ids is not None or department_id is not None or completed_only
+                rating_ids = df['Id'].tolist() if filtered else None
+                rating_aggregates = load_rating_aggregates(conn, rating_ids, with_detailed_scores=True)
+                logger.info(f"Ratings agrégés pour {len(rating_aggregates)} stagiaires")
             except Exception as e:
-                logger.warning(f"Erreur universités: {e}")
-                df['Universityname'] = 'Université inconnue'
+                logger.error(f"❌ Erreur chargement groupé des ratings: {e}")
+                rating_aggregates = {}
             
-            # 🎯 CALCUL DES RATINGS AMÉLIORÉS
-            logger.info("Calcul des ratings détaillés...")
-            for idx, row in df.iterrows():
-                logger.info(f"Traitement: {row['FirstName']} {row['LastName']} (ID: {row['Id']})")
-                
-                try:
-                    rating_data = self.get_stagiaire_comprehensive_rating(row['Id'], conn)
-                    
-                    # Assignation des données de rating
-                    df.at[idx, 'AverageRating'] = rating_data['average_rating']
-                    df.at[idx, 'RatingCount'] = rating_data['rating_count']
-                    df.at[idx, 'HasRatings'] = rating_data['has_ratings']
-                    df.at[idx, 'RatingQuality'] = rating_data['quality_score']
-                    df.at[idx, 'DetailedScores'] = json.dumps(rating_data['detailed_scores'])
-                    df.at[idx, 'RatingDetails'] = json.dumps(rating_data['rating_details'])
-                except Exception as e:
-                    logger.error(f"❌ Erreur calcul rating pour {row['FirstName']} {row['LastName']}: {e}")
-                    # Valeurs par défaut en cas d'erreur
-                    df.at[idx, 'AverageRating'] = 3.0
-                    df.at[idx, 'RatingCount'] = 0
-                    df.at[idx, 'HasRatings'] = False
-                    df.at[idx, 'RatingQuality'] = 0.5
-                    df.at[idx, 'DetailedScores'] = '{}'
-                    df.at[idx, 'RatingDetails'] = '[]'
+            df = attach_rating_columns(df, rating_aggregates)
             
             conn.close()
             
-            # Nettoyage final
-            if 'DepartmentName' not in df.columns:
-                df['DepartmentName'] = 'Département inconnu'
-            if 'Universityname' not in df.columns:
-                df['Universityname'] = 'Université inconnue'
-            
             logger.info(f"Données finales: {len(df)} stagiaires avec ratings complets")
             
             # Échantillon avec ratings
@@ -568,188 +458,94 @@ class ImprovedRecommendationSystem:
             logger.error(f"Erreur calcul rating score: {e}")
             return 0.4
     
-    def get_recommendations(self, job_offer, top_n=10):
-        """🎯 SYSTÈME DE RECOMMANDATIONS INTELLIGENT ET STRICT"""
+    def get_eligible_stagiaires(self, department_id):
+        """Stagiaires du département dont le stage est terminé (snapshot mémoire ou requête filtrée)"""
+        if self.candidate_snapshot is None:
+            return self.get_stagiaires_data(department_id=department_id, completed_only=True)
+        
+        # Filtre appliqué au snapshot de base puis aux seules lignes remplacées par des événements
+        return self.candidate_snapshot.view().filtered(lambda df: filter_eligible_stagiaires(df, department_id))
+    
+    def get_recommendations(self, job_offer, top_n=10, progress=None):
+        """
+        🎯 SYSTÈME DE RECOMMANDATIONS INTELLIGENT ET STRICT
+        progress(étape) est appelé au début de chaque étape (fetch, rating, skills, text, rank) :
+        une tâche asynchrone y suit l'avancement et y interrompt le calcul annulé.
+        """
+        if progress is None:
+            progress = lambda stage: None
+        
         try:
             logger.info(f"\n🔍 === DÉMARRAGE RECOMMANDATIONS STRICTES ===")
             logger.info(f"📋 Poste: {job_offer.get('title', '')}")
             logger.info(f"🎯 Compétences requises: {job_offer.get('requiredSkills', '')}")
             logger.info(f"🏢 Département ID: {job_offer.get('departmentId')}")
             
-            # 1️⃣ RÉCUPÉRATION DES DONNÉES
-            stagiaires_df = self.get_stagiaires_data()
-            if stagiaires_df.empty:
-                logger.warning("❌ Aucun stagiaire trouvé dans la base")
-                return []
-            
-            logger.info(f"📊 Total stagiaires en base: {len(stagiaires_df)}")
-            
-            # 2️⃣ FILTRE STRICT DÉPARTEMENT (OBLIGATOIRE)
+            # 1️⃣ FILTRE STRICT DÉPARTEMENT (OBLIGATOIRE)
             required_dept_id = job_offer.get('departmentId')
             if not required_dept_id:
                 logger.error("❌ Département obligatoire manquant")
                 return []
-                
-            dept_mask = stagiaires_df['DepartmentId'] == int(required_dept_id)
-            dept_filtered = stagiaires_df[dept_mask].copy()
-            
-            logger.info(f"🔒 Après filtre département {required_dept_id}: {len(dept_filtered)} stagiaires")
             
-            if dept_filtered.empty:
-                logger.warning(f"❌ Aucun stagiaire dans le département {required_dept_id}")
-                return []
+            # 2️⃣ STAGIAIRES ÉLIGIBLES (département + stage terminé)
+            progress('fetch')
+            eligible_df = self.get_eligible_stagiaires(required_dept_id)
             
-            # 3️⃣ FILTRE STRICT STAGES TERMINÉS
-            logger.info(f"\n🎓 === VÉRIFICATION STRICTE DES STAGES ===")
-            eligible_stagiaires = []
-            current_date = datetime.now()
+            logger.info(f"✅ Stagiaires éligibles (département {required_dept_id}, stages terminés): {len(eligible_df)}")
             
-            for idx, stagiaire in dept_filtered.iterrows():
-                end_date_str = stagiaire.get('EndDate')
-                stagiaire_name = f"{stagiaire['FirstName']} {stagiaire['LastName']}"
-                
-                if not end_date_str or pd.isna(end_date_str):
-                    logger.warning(f"⚠️ {stagiaire_name}: Pas de date de fin")
-                    continue
-                
-                try:
-                    end_date = pd.to_datetime(end_date_str)
-                    if hasattr(end_date, 'iloc'):
-                        end_date = end_date.iloc[0] if len(end_date) > 0 else end_date
-                    
-                    if end_date <= current_date:
-                        eligible_stagiaires.append(stagiaire)
-                        logger.info(f"✅ {stagiaire_name}: Stage terminé le {end_date.strftime('%Y-%m-%d')}")
-                    else:
-                        logger.info(f"❌ {stagiaire_name}: Stage en cours (fin: {end_date.strftime('%Y-%m-%d')})")
-                        
-                except Exception as e:
-                    logger.warning(f"⚠️ {stagiaire_name}: Erreur date - {e}")
-                    continue
-            
-            logger.info(f"✅ Stagiaires éligibles (stages terminés): {len(eligible_stagiaires)}")
-            
-            if not eligible_stagiaires:
-                logger.warning("❌ Aucun stagiaire avec stage terminé")
+            if eligible_df.empty:
+                logger.warning(f"❌ Aucun stagiaire éligible dans le département {required_dept_id}")
                 return []
             
-            # 4️⃣ CALCUL INTELLIGENT DES SCORES
+            # 3️⃣ CALCUL INTELLIGENT DES SCORES (colonnes NumPy, une passe sur tous les candidats)
             logger.info(f"\n🧮 === CALCUL INTELLIGENT DES SCORES ===")
-            recommendations = []
             job_skills_required = job_offer.get('requiredSkills', '')
-            
-            for stagiaire in eligible_stagiaires:
-                stagiaire_name = f"{stagiaire['FirstName']} {stagiaire['LastName']}"
-                logger.info(f"\n👤 Analyse: {stagiaire_name}")
-                
-                # A. Score de Rating (60% du score total)
-                avg_rating = float(stagiaire.get('AverageRating', 3.0))
-                rating_count = int(stagiaire.get('RatingCount', 0))
-                has_ratings = bool(stagiaire.get('HasRatings', False))
-                
-                if has_ratings and rating_count > 0:
-                    # Score basé sur la note (0 à 1)
-                    rating_score = avg_rating / 5.0
-                    # Bonus pour nombre d'évaluations
-                    if rating_count >= 3:
-                        rating_score *= 1.1  # Bonus 10%
-                    elif rating_count >= 2:
-                        rating_score *= 1.05  # Bonus 5%
-                else:
-                    rating_score = 0.4  # Pénalité forte sans ratings
-                
-                logger.info(f"   ⭐ Rating: {avg_rating:.1f}/5 ({rating_count} évals) → Score: {rating_score:.3f}")
-                
-                # B. Score de Compétences (30% du score total)
-                stagiaire_skills = str(stagiaire.get('Skills', ''))
-                
-                if not stagiaire_skills or stagiaire_skills.lower() in ['none', 'null', '']:
-                    skill_similarity = 0.1  # Pénalité forte
-                    logger.info(f"   🎯 Compétences: AUCUNE → Score: {skill_similarity:.3f}")
-                else:
-                    skill_similarity = self.calculate_skill_similarity_improved(
-                        job_skills_required, stagiaire_skills
-                    )
-                    logger.info(f"   🎯 Compétences: '{stagiaire_skills[:50]}...' → Score: {skill_similarity:.3f}")
-                
-                # C. Score Textuel (10% du score total)
-                job_text = f"{job_offer.get('title', '')} {job_offer.get('description', '')}"
-                stagiaire_text = f"{stagiaire_skills} {stagiaire.get('DepartmentName', '')}"
-                
-                try:
-                    if job_text.strip() and stagiaire_text.strip():
-                        job_clean = self.preprocess_text(job_text)
-                        stagiaire_clean = self.preprocess_text(stagiaire_text)
-                        
-                        if job_clean and stagiaire_clean:
-                            tfidf_matrix = self.tfidf_vectorizer.fit_transform([job_clean, stagiaire_clean])
-                            text_similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-                        else:
-                            text_similarity = 0.1
-                    else:
-                        text_similarity = 0.1
-                except Exception as e:
-                    logger.warning(f"   ⚠️ Erreur TF-IDF: {e}")
-                    text_similarity = 0.1
-                
-                logger.info(f"   📝 Similarité textuelle: {text_similarity:.3f}")
-                
-                # D. SCORE COMPOSITE FINAL
-                composite_score = (rating_score * 0.6) + (skill_similarity * 0.3) + (text_similarity * 0.1)
-                
-                # E. BONUS POUR EXCELLENCE
-                if avg_rating >= 4.0 and skill_similarity > 0.5:
-                    excellence_bonus = 0.15
-                    composite_score += excellence_bonus
-                    logger.info(f"   🏆 Bonus excellence: +{excellence_bonus}")
-                
-                # F. FILTRAGE PAR SEUIL MINIMUM
-                min_skill_threshold = 0.2  # Minimum 20% de match compétences
-                min_composite_threshold = 0.3  # Minimum 30% score total
-                
-                if skill_similarity < min_skill_threshold:
-                    logger.info(f"   ❌ Éliminé: Compétences insuffisantes ({skill_similarity:.3f} < {min_skill_threshold})")
-                    continue
-                
-                if composite_score < min_composite_threshold:
-                    logger.info(f"   ❌ Éliminé: Score global insuffisant ({composite_score:.3f} < {min_composite_threshold})")
-                    continue
-                
-                composite_score = min(composite_score, 1.0)  # Limitation à 1.0
-                
-                logger.info(f"   🎯 SCORE FINAL: {composite_score:.3f} ✅ QUALIFIÉ")
-                
-                # G. CONSTRUCTION DE LA RECOMMANDATION
-                recommendation = {
-                    'stagiaireId': int(stagiaire['Id']),
-                    'name': stagiaire_name,
-                    'email': str(stagiaire.get('Email', '')),
-                    'skills': stagiaire_skills if stagiaire_skills not in ['None', 'null', ''] else 'Compétences non renseignées',
-                    'department': str(stagiaire.get('DepartmentName', '')),
-                    'university': str(stagiaire.get('Universityname', '')),
-                    'stagePeriod': f"{stagiaire.get('StartDate', '')} → {stagiaire.get('EndDate', '')}",
-                    'rating': avg_rating,
-                    'ratingCount': rating_count,
-                    'hasRatings': has_ratings,
-                    'ratingQuality': float(stagiaire.get('RatingQuality', 0.5)),
-                    'compositeScore': float(composite_score),
-                    'textSimilarity': float(text_similarity),
-                    'skillSimilarity': float(skill_similarity),
-                    'ratingScore': float(rating_score),
-                    'departmentMatch': True,
-                    'stageCompleted': True,
-                    'matchReasons': self._generate_intelligent_match_reasons(
-                        skill_similarity, rating_score, avg_rating, rating_count, composite_score
-                    ),
-                    'detailedScores': json.loads(stagiaire.get('DetailedScores', '{}')),
-                    'ratingDetails': json.loads(stagiaire.get('RatingDetails', '[]'))
-                }
-                
-                recommendations.append(recommendation)
-            
-            # 5️⃣ TRI ET FINALISATION
-            recommendations.sort(key=lambda x: x['compositeScore'], reverse=True)
-            final_recommendations = recommendations[:top_n]
+            job_text = f"{job_offer.get('title', '')} {job_offer.get('description', '')}"
+            
+            # A. Colonnes de rating (jointes au snapshot des candidats)
+            progress('rating')
+            average_ratings = eligible_df['AverageRating'].to_numpy(dtype=float)
+            rating_counts = eligible_df['RatingCount'].to_numpy(dtype=float).astype(np.int64)
+            has_ratings = eligible_df['HasRatings'].to_numpy(dtype=bool)
+            
+            # B. Score de Compétences (30% du score total) : produits creux sur la matrice candidats x compétences
+            progress('skills')
+            skill_similarities = self._get_skill_index(eligible_df).similarities(
+                self.extract_skills_dynamically(job_skills_required), eligible_df['Id'].tolist()
+            )
+            
+            # C. Score Textuel (10% du score total) : offre transformée une fois, une seule mat-vec creuse
+            progress('text')
+            text_similarities = self._get_tfidf_index(eligible_df).similarities(
+                self.preprocess_text(job_text), eligible_df['Id'].tolist()
+            )
+            
+            # D. Score de Rating (60%), composite, bonus excellence et seuils minimum
+            progress('rank')
+            scores = score_candidates(
+                average_ratings,
+                rating_counts,
+                has_ratings,
+                skill_similarities,
+                text_similarities
+            )
+            
+            logger.info(f"   ❌ Éliminés (compétences < {MIN_SKILL_SIMILARITY}): {scores['rejected_skills']}")
+            logger.info(f"   ❌ Éliminés (score global < {MIN_COMPOSITE_SCORE}): {scores['rejected_composite']}")
+            logger.info(f"   ✅ Qualifiés: {len(scores['indices'])}")
+            
+            # 4️⃣ SÉLECTION DU TOP N ET FINALISATION (recommandations construites pour ces candidats uniquement)
+            final_recommendations = []
+            for position in rank_candidates(scores['composite_scores'], top_n):
+                stagiaire = eligible_df.iloc[scores['indices'][position]]
+                final_recommendations.append(self._build_recommendation(
+                    stagiaire,
+                    str(stagiaire['Skills']),
+                    float(scores['composite_scores'][position]),
+                    float(scores['rating_scores'][position]),
+                    float(scores['skill_similarities'][position]),
+                    float(scores['text_similarities'][position])
+                ))
             
             logger.info(f"\n🏆 === RÉSULTATS FINAUX ===")
             logger.info(f"📊 Candidats qualifiés: {len(final_recommendations)}")
@@ -761,12 +557,339 @@ class ImprovedRecommendationSystem:
             
             return final_recommendations
             
+        except JobCancelledError:
+            raise
         except Exception as e:
             logger.error(f"❌ ERREUR CRITIQUE dans get_recommendations: {e}")
             import traceback
             logger.error(traceback.format_exc())
             return []
     
+    def get_cached_recommendations(self, job_offer, top_n=10, progress=None):
+        """
+        get_recommendations servi depuis le cache quand la même offre (normalisée) a déjà été demandée
+        sur la même version du snapshot. Retourne (recommandations, informations de cache).
+        """
+        if self.candidate_snapshot is None or not self.recommendation_cache.enabled:
+            # Sans snapshot, aucune version ne signale un changement de ratings ou de stagiaires
+            return self.get_recommendations(job_offer, top_n, progress), {'enabled': False, 'hit': False, 'age_seconds': None}
+        
+        try:
+            # Watermark revérifié avant la lecture : un changement de ratings/stagiaires change la version
+            self.candidate_snapshot.view()
+        except Exception as e:
+            logger.error(f"Snapshot indisponible, cache de recommandations ignoré: {e}")
+            return self.get_recommendations(job_offer, top_n, progress), {'enabled': False, 'hit': False, 'age_seconds': None}
+        
+        version = self.candidate_snapshot.version
+        key = offer_key(job_offer, top_n)
+        
+        recommendations, age = self.recommendation_cache.get(key, version)
+        if recommendations is not None:
+            return recommendations, {'enabled': True, 'hit': True, 'age_seconds': round(age, 1), 'snapshot_version': version}
+        
+        recommendations = self.get_recommendations(job_offer, top_n, progress)
+        # Liste vide non conservée : get_recommendations retourne aussi [] en cas d'erreur
+        if recommendations:
+            self.recommendation_cache.put(key, version, recommendations)
+        return recommendations, {'enabled': True, 'hit': False, 'age_seconds': 0.0, 'snapshot_version': version}
+    
+    def submit_recommendation_job(self, job_offer, top_n=10, persist_job_offer_id=None):
+        """
+        get_cached_recommendations exécuté en arrière-plan (file bornée, JobQueueFullError si pleine).
+        Retourne la tâche : étapes, résultat et annulation via self.recommendation_jobs.
+        """
+        def work(job):
+            recommendations, cache_info = self.get_cached_recommendations(job_offer, top_n, job.enter_stage)
+            persisted = None
+            if persist_job_offer_id is not None and recommendations:
+                persisted = self.recommendation_writer.save(persist_job_offer_id, recommendations)
+            return {
+                'recommendations': recommendations,
+                'totalFound': len(recommendations),
+                'persisted': persisted,
+                'cache': cache_info
+            }
+        
+        return self.recommendation_jobs.submit(work)
+    
+    def get_recommendations_batch(self, job_offers, top_n=10):
+        """
+        Recommandations pour plusieurs offres (même format que get_recommendations, une liste par offre).
+        Offres regroupées par département : candidats chargés une fois, scores en matrices offres x candidats.
+        """
+        results = [[] for _ in job_offers]
+        
+        offers_by_department = {}
+        for position, job_offer in enumerate(job_offers):
+            department_id = job_offer.get('departmentId')
+            if not department_id:
+                continue
+            try:
+                # "3" et 3 : même département, candidats chargés et scorés une seule fois
+                department_id = int(department_id)
+            except (TypeError, ValueError):
+                logger.warning(f"departmentId invalide ignoré: {department_id!r}")
+                continue
+            offers_by_department.setdefault(department_id, []).append(position)
+        
+        for department_id, positions in offers_by_department.items():
+            try:
+                eligible_df = self.get_eligible_stagiaires(department_id)
+                if eligible_df.empty:
+                    continue
+                
+                offers = [job_offers[position] for position in positions]
+                stagiaire_ids = eligible_df['Id'].tolist()
+                
+                # Compétences et texte : une ligne par offre, un produit creux par composante
+                skill_matrix = self._get_skill_index(eligible_df).similarity_matrix(
+                    [self.extract_skills_dynamically(offer.get('requiredSkills', '')) for offer in offers],
+                    stagiaire_ids
+                )
+                text_matrix = self._get_tfidf_index(eligible_df).similarity_matrix(
+                    [self.preprocess_text(f"{offer.get('title', '')} {offer.get('description', '')}") for offer in offers],
+                    stagiaire_ids
+                )
+                
+                # Rating calculé une fois pour le département, composite pour toutes les offres
+                scores = score_candidate_matrix(
+                    eligible_df['AverageRating'].to_numpy(dtype=float),
+                    eligible_df['RatingCount'].to_numpy(dtype=float).astype(np.int64),
+                    eligible_df['HasRatings'].to_numpy(dtype=bool),
+                    skill_matrix,
+                    text_matrix
+                )
+                
+                for row, position in enumerate(positions):
+                    indices = np.flatnonzero(scores['qualified'][row])
+                    composite_scores = scores['composite_scores'][row, indices]
+                    
+                    for ranked in rank_candidates(composite_scores, top_n):
+                        index = indices[ranked]
+                        stagiaire = eligible_df.iloc[index]
+                        results[position].append(self._build_recommendation(
+                            stagiaire,
+                            str(stagiaire['Skills']),
+                            float(composite_scores[ranked]),
+                            float(scores['rating_scores'][index]),
+                            float(skill_matrix[row, index]),
+                            float(text_matrix[row, index])
+                        ))
+                
+            except Exception as e:
+                logger.error(f"Erreur recommandations groupées (département {department_id}): {e}")
+        
+        return results
+    
+    def get_matching_offers(self, stagiaire_id, top_n=10):
+        """
+        Offres ouvertes les plus adaptées à un stagiaire (recherche inverse de get_recommendations).
+        Mêmes composantes et filtres stricts ; retourne None si le stagiaire est inconnu.
+        """
+        stagiaire_id = int(stagiaire_id)
+        if self.candidate_snapshot is not None:
+            stagiaire = self.candidate_snapshot.view().row(stagiaire_id)
+        else:
+            stagiaire_df = self.get_stagiaires_data(stagiaire_ids=[stagiaire_id])
+            stagiaire = None if stagiaire_df.empty else stagiaire_df.iloc[0]
+        
+        if stagiaire is None:
+            return None
+        
+        department_id = stagiaire.get('DepartmentId')
+        if pd.isna(department_id):
+            return []
+        
+        # Un stagiaire n'est recommandé que dans son département et une fois son stage terminé
+        eligible_df = self.get_eligible_stagiaires(int(department_id))
+        if eligible_df.empty or not (eligible_df['Id'] == stagiaire_id).any():
+            return []
+        stagiaire = eligible_df[eligible_df['Id'] == stagiaire_id].iloc[0]
+        
+        skills_text = str(stagiaire['Skills'])
+        candidate_skills = (
+            [] if skills_text.lower() in EMPTY_SKILLS_VALUES else self.extract_skills_dynamically(skills_text)
+        )
+        
+        # Un produit creux candidat x offres par composante (compétences, texte)
+        offers, skill_similarities, text_similarities = self.job_offer_index.match_stagiaire(
+            stagiaire_id, candidate_skills, department_id, self._get_tfidf_index(eligible_df)
+        )
+        if offers.empty:
+            return []
+        
+        # Matrices offres x 1 candidat : même composite, bonus et seuils que get_recommendations
+        scores = score_candidate_matrix(
+            [float(stagiaire['AverageRating'])],
+            [int(stagiaire['RatingCount'])],
+            [bool(stagiaire['HasRatings'])],
+            skill_similarities[:, None],
+            text_similarities[:, None]
+        )
+        indices = np.flatnonzero(scores['qualified'][:, 0])
+        composite_scores = scores['composite_scores'][indices, 0]
+        
+        matching_offers = []
+        for ranked in rank_candidates(composite_scores, top_n):
+            offer = offers.iloc[indices[ranked]]
+            matching_offers.append({
+                'jobOfferId': int(offer['Id']),
+                'title': str(offer['Title']),
+                'departmentId': int(offer['DepartmentId']),
+                'publishedAt': str(offer.get('PublishedAt', '')),
+                'compositeScore': float(composite_scores[ranked]),
+                'ratingScore': float(scores['rating_scores'][0]),
+                'skillSimilarity': float(skill_similarities[indices[ranked]]),
+                'textSimilarity': float(text_similarities[indices[ranked]])
+            })
+        
+        return matching_offers
+    
+    def apply_event(self, event_type, stagiaire_id):
+        """
+        Événement du backend .NET (rating soumis, compétences modifiées, CV déposé) : seul ce stagiaire est
+        rechargé dans le snapshot, ses lignes des index compétences / TF-IDF sont remplacées et les
+        résultats en cache de son département (ancien et nouveau) invalidés.
+        """
+        if self.candidate_snapshot is None:
+            return {'applied': False, 'reason': 'Snapshot des candidats désactivé (données relues à chaque demande)'}
+        
+        update = self.candidate_snapshot.apply_update(stagiaire_id)
+        if update is None:
+            return {'applied': False, 'reason': 'Snapshot pas encore chargé (stagiaire lu au premier chargement)'}
+        previous, current = update
+        version = self.candidate_snapshot.version
+        
+        # Index déjà construits complétés tout de suite ; sinon construits à la prochaine demande
+        if self.skill_index is not None:
+            self._get_skill_index(None)
+        if self.tfidf_index is not None:
+            self._get_tfidf_index(None)
+        
+        departments = sorted({
+            int(row['DepartmentId']) for row in (previous, current)
+            if row is not None and pd.notna(row.get('DepartmentId'))
+        })
+        self.recommendation_cache.invalidate_departments(departments, version)
+        
+        logger.info(f"Événement {event_type}: stagiaire {stagiaire_id} mis à jour (départements {departments})")
+        return {
+            'applied': True,
+            'stagiaireId': int(stagiaire_id),
+            'removed': current is None,
+            'departments': departments,
+            'snapshotVersion': version
+        }
+    
+    def _get_tfidf_index(self, eligible_df):
+        """Index TF-IDF du corpus candidats, reconstruit à chaque nouvelle version du snapshot"""
+        if self.candidate_snapshot is None:
+            # Sans snapshot : vocabulaire ajusté une fois par demande sur les candidats éligibles
+            return self._build_tfidf_index(eligible_df, version=None)
+        
+        view = self.candidate_snapshot.view()
+        version = view.version
+        
+        with self._tfidf_index_lock:
+            if self.tfidf_index is None or self.tfidf_index.version != version:
+                # Stagiaires modifiés depuis la version de l'index : lignes remplacées, sinon reconstruction
+                changed_df = self._changed_candidates(self.tfidf_index, view)
+                updated = None if changed_df is None else self.tfidf_index.updated(
+                    changed_df['Id'].tolist(), self._tfidf_texts(changed_df), self.preprocess_text, version
+                )
+                self.tfidf_index = updated if updated is not None else self._build_tfidf_index(view.frame, version)
+            return self.tfidf_index
+    
+    def _build_tfidf_index(self, candidates_df, version):
+        return CandidateTfidfIndex.build(
+            self.tfidf_vectorizer, candidates_df['Id'].tolist(), self._tfidf_texts(candidates_df),
+            self.preprocess_text, version
+        )
+    
+    def _tfidf_texts(self, candidates_df):
+        return [
+            f"{str(skills)} {department_name}"
+            for skills, department_name in zip(candidates_df['Skills'].tolist(), candidates_df['DepartmentName'].tolist())
+        ]
+    
+    def _get_skill_index(self, eligible_df):
+        """Index des compétences candidats, reconstruit à chaque nouvelle version du snapshot"""
+        if self.candidate_snapshot is None:
+            return self._build_skill_index(eligible_df, version=None)
+        
+        view = self.candidate_snapshot.view()
+        version = view.version
+        
+        with self._skill_index_lock:
+            if self.skill_index is None or self.skill_index.version != version:
+                changed_df = self._changed_candidates(self.skill_index, view)
+                if changed_df is None:
+                    self.skill_index = self._build_skill_index(view.frame, version)
+                else:
+                    self.skill_index = self.skill_index.updated(
+                        changed_df['Id'].tolist(),
+                        [str(skills) for skills in changed_df['Skills'].tolist()],
+                        self.extract_skills_dynamically,
+                        version
+                    )
+            return self.skill_index
+    
+    def _changed_candidates(self, index, view):
+        """
+        Lignes de la vue du snapshot modifiées depuis la version d'un index, ou None s'il faut le reconstruire
+        (index absent, rechargement complet entre-temps, trop de lignes déjà remplacées).
+        """
+        if index is None:
+            return None
+        
+        changed = self.candidate_snapshot.changes_since(index.version, view.version)
+        if changed is None or index.appended_rows + len(changed) > INDEX_PATCH_MAX_FRACTION * view.size:
+            return None
+        
+        return view.rows(changed)
+    
+    def _build_skill_index(self, candidates_df, version):
+        return CandidateSkillIndex.build(
+            candidates_df['Id'].tolist(),
+            [str(skills) for skills in candidates_df['Skills'].tolist()],
+            self.extract_skills_dynamically,
+            self.skill_families,
+            version
+        )
+    
+    def _build_recommendation(self, stagiaire, stagiaire_skills, composite_score, rating_score,
+                              skill_similarity, text_similarity):
+        """Construit la recommandation (format attendu par Angular/.NET) d'un candidat retenu"""
+        avg_rating = float(stagiaire.get('AverageRating', 3.0))
+        rating_count = int(stagiaire.get('RatingCount', 0))
+        has_ratings = bool(stagiaire.get('HasRatings', False))
+        
+        return {
+            'stagiaireId': int(stagiaire['Id']),
+            'name': f"{stagiaire['FirstName']} {stagiaire['LastName']}",
+            'email': str(stagiaire.get('Email', '')),
+            'skills': stagiaire_skills if stagiaire_skills not in ['None', 'null', ''] else 'Compétences non renseignées',
+            'department': str(stagiaire.get('DepartmentName', '')),
+            'university': str(stagiaire.get('Universityname', '')),
+            'stagePeriod': f"{stagiaire.get('StartDate', '')} → {stagiaire.get('EndDate', '')}",
+            'rating': avg_rating,
+            'ratingCount': rating_count,
+            'hasRatings': has_ratings,
+            'ratingQuality': float(stagiaire.get('RatingQuality', 0.5)),
+            'compositeScore': composite_score,
+            'textSimilarity': text_similarity,
+            'skillSimilarity': skill_similarity,
+            'ratingScore': rating_score,
+            'departmentMatch': True,
+            'stageCompleted': True,
+            'matchReasons': self._generate_intelligent_match_reasons(
+                skill_similarity, rating_score, avg_rating, rating_count, composite_score
+            ),
+            'detailedScores': json.loads(stagiaire.get('DetailedScores', '{}')),
+            'ratingDetails': json.loads(stagiaire.get('RatingDetails', '[]'))
+        }
+    
     def _generate_match_reasons_enhanced(self, text_sim, skill_sim, rating_score, rating_data):
         """Génère les raisons du match avec focus sur les ratings"""
         reasons = []
@@ -897,7 +1020,7 @@ class ImprovedRecommendationSystem:
     def test_comprehensive_ratings(self):
         """Test complet du système de rating"""
         try:
-            conn = pyodbc.connect(self.connection_string)
+            conn = self.db_pool.acquire()
             
             # Test 1: Structure de la table Ratings
             structure_query = """
@@ -1007,12 +1130,28 @@ def get_recommendations():
         
         top_n = data.get('topN', 10)
         
+        # Enregistrement optionnel de la liste dans JobOfferRecommendations (remplace les lignes actives de l'offre)
+        persist = bool(data.get('persist', False))
+        if persist:
+            try:
+                job_offer_id = int(data.get('jobOfferId'))
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'error': 'Champ jobOfferId obligatoire pour enregistrer les recommandations'
+                }), 400
+        
         logger.info(f"\n🔍 === NOUVELLE DEMANDE DE RECOMMANDATIONS ===")
         logger.info(f"📋 Poste: {job_offer['title']}")
         logger.info(f"🎯 Compétences: {job_offer['requiredSkills']}")
         logger.info(f"🏢 Département: {job_offer['departmentId']}")
         
-        recommendations = recommendation_system.get_recommendations(job_offer, top_n)
+        recommendations, cache_info = recommendation_system.get_cached_recommendations(job_offer, top_n)
+        
+        # Liste vide (aucun candidat ou erreur de calcul) : les recommandations actives sont conservées
+        persisted = None
+        if persist and recommendations:
+            persisted = recommendation_system.recommendation_writer.save(job_offer_id, recommendations)
         
         logger.info(f"✅ Retour de {len(recommendations)} recommandations")
         
@@ -1020,6 +1159,7 @@ def get_recommendations():
             'success': True,
             'recommendations': recommendations,
             'totalFound': len(recommendations),
+            'persisted': persisted,
             'algorithm_info': {
                 'version': '2.0 - Rating Priority',
                 'weights': {
@@ -1031,7 +1171,8 @@ def get_recommendations():
                     'department_required': job_offer['departmentId'],
                     'stage_completed': True,
                     'rating_source': 'Tous les ratings (sans filtre status)'
-                }
+                },
+                'cache': cache_info
             }
         })
         
@@ -1042,6 +1183,215 @@ def get_recommendations():
             'error': str(e)
         }), 500
 
+@app.route('/api/recommendations/batch', methods=['POST'])
+def get_recommendations_batch():
+    """Recommandations pour plusieurs offres en un appel (body: { offers: [...], topN })"""
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('offers'), list) or not data['offers']:
+            return jsonify({'success': False, 'error': 'Liste offers manquante ou vide'}), 400
+        
+        if len(data['offers']) > BATCH_MAX_OFFERS:
+            return jsonify({
+                'success': False,
+                'error': f"Trop d'offres ({len(data['offers'])}), maximum {BATCH_MAX_OFFERS} par appel"
+            }), 400
+        
+        job_offers = [
+            {
+                'jobOfferId': offer.get('jobOfferId'),
+                'title': offer.get('title', ''),
+                'description': offer.get('description', ''),
+                'requiredSkills': offer.get('requiredSkills', ''),
+                'departmentId': offer.get('departmentId')
+            }
+            for offer in data['offers']
+        ]
+        
+        # Validation: Département obligatoire pour chaque offre
+        missing_department = [position for position, offer in enumerate(job_offers) if not offer['departmentId']]
+        if missing_department:
+            return jsonify({
+                'success': False,
+                'error': f"Le département est obligatoire pour chaque offre (positions {missing_department})"
+            }), 400
+        
+        top_n = data.get('topN', 10)
+        
+        logger.info(f"\n📦 === DEMANDE GROUPÉE: {len(job_offers)} offres, "
+                    f"{len({offer['departmentId'] for offer in job_offers})} départements ===")
+        
+        recommendations_per_offer = recommendation_system.get_recommendations_batch(job_offers, top_n)
+        
+        return jsonify({
+            'success': True,
+            'results': [
+                {
+                    'jobOfferId': offer['jobOfferId'],
+                    'departmentId': offer['departmentId'],
+                    'recommendations': recommendations,
+                    'totalFound': len(recommendations)
+                }
+                for offer, recommendations in zip(job_offers, recommendations_per_offer)
+            ],
+            'totalOffers': len(job_offers),
+            'algorithm_info': {
+                'version': '2.0 - Rating Priority',
+                'weights': {
+                    'ratings': '60%',
+                    'skills': '25%', 
+                    'text_similarity': '15%'
+                },
+                'filters_applied': {
+                    'department_required': True,
+                    'stage_completed': True,
+                    'rating_source': 'Tous les ratings (sans filtre status)'
+                }
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans get_recommendations_batch: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'results': []
+        }), 500
+
+@app.route('/api/recommendations/jobs', methods=['POST'])
+def submit_recommendation_job():
+    """Même body que /api/recommendations ; retourne immédiatement l'identifiant de la tâche (202)"""
+    try:
+        data = request.get_json(silent=True)
+        
+        if not data:
+            return jsonify({'success': False, 'error': 'Données JSON manquantes'}), 400
+        
+        job_offer = {
+            'title': data.get('title', ''),
+            'description': data.get('description', ''),
+            'requiredSkills': data.get('requiredSkills', ''),
+            'departmentId': data.get('departmentId')
+        }
+        
+        # Validation: Département obligatoire
+        if not job_offer['departmentId']:
+            return jsonify({
+                'success': False,
+                'error': 'Le département est obligatoire pour les recommandations'
+            }), 400
+        
+        top_n = data.get('topN', 10)
+        
+        persist_job_offer_id = None
+        if data.get('persist', False):
+            try:
+                persist_job_offer_id = int(data.get('jobOfferId'))
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'error': 'Champ jobOfferId obligatoire pour enregistrer les recommandations'
+                }), 400
+        
+        try:
+            job = recommendation_system.submit_recommendation_job(job_offer, top_n, persist_job_offer_id)
+        except JobQueueFullError as e:
+            return jsonify({'success': False, 'error': str(e)}), 429
+        
+        logger.info(f"Tâche de recommandations {job.id} en file - Poste: {job_offer['title']}, "
+                    f"Département: {job_offer['departmentId']}")
+        
+        return jsonify({
+            'success': True,
+            'jobId': job.id,
+            'status': job.status,
+            'statusUrl': f'/api/recommendations/jobs/{job.id}'
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Erreur dans submit_recommendation_job: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/recommendations/jobs/<job_id>', methods=['GET'])
+def get_recommendation_job(job_id):
+    """Avancement par étape (fetch, rating, skills, text, rank) et résultat une fois la tâche terminée"""
+    try:
+        job = recommendation_system.recommendation_jobs.get(job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': f'Tâche {job_id} introuvable ou expirée'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            **job.to_dict()
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans get_recommendation_job ({job_id}): {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/recommendations/jobs/<job_id>', methods=['DELETE'])
+def cancel_recommendation_job(job_id):
+    """Annule la tâche : immédiatement si elle attend, à la fin de l'étape en cours sinon"""
+    try:
+        job = recommendation_system.recommendation_jobs.cancel(job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': f'Tâche {job_id} introuvable ou expirée'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            **job.to_dict()
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans cancel_recommendation_job ({job_id}): {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/stagiaires/<int:stagiaire_id>/matching-offers', methods=['GET'])
+def get_matching_offers(stagiaire_id):
+    """Offres ouvertes les plus adaptées à un stagiaire (?topN=10)"""
+    try:
+        top_n = request.args.get('topN', 10, type=int)
+        
+        matching_offers = recommendation_system.get_matching_offers(stagiaire_id, top_n)
+        
+        if matching_offers is None:
+            return jsonify({
+                'success': False,
+                'error': f'Stagiaire {stagiaire_id} introuvable',
+                'offers': []
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'stagiaireId': stagiaire_id,
+            'offers': matching_offers,
+            'totalFound': len(matching_offers)
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans get_matching_offers (stagiaire {stagiaire_id}): {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'offers': []
+        }), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Vérification de santé améliorée"""
@@ -1049,6 +1399,16 @@ def health_check():
         'status': 'healthy', 
         'timestamp': datetime.now().isoformat(),
         'service': 'Système de Recommandation IA v2.0 - CORRIGÉ POUR ANGULAR',
+        'database_pool': recommendation_system.db_pool.stats(),
+        'candidate_snapshot': recommendation_system.candidate_snapshot.stats() if recommendation_system.candidate_snapshot else None,
+        'tfidf_index': recommendation_system.tfidf_index.stats() if recommendation_system.tfidf_index else None,
+        'skill_index': recommendation_system.skill_index.stats() if recommendation_system.skill_index else None,
+        'job_offer_index': recommendation_system.job_offer_index.stats(),
+        'skill_cache': recommendation_system.skill_cache.stats(),
+        'recommendation_cache': recommendation_system.recommendation_cache.stats(),
+        'recommendation_writer': recommendation_system.recommendation_writer.stats(),
+        'recommendation_jobs': recommendation_system.recommendation_jobs.stats(),
+        'skill_families': recommendation_system.skill_families.stats(),
         'features': [
             'Types ENUM string corrigés (TuteurToStagiaire, RHToStagiaire)',
             'Suppression filtre Status (tous status inclus)',
@@ -1072,6 +1432,64 @@ def health_check():
         ]
     })
 
+@app.route('/api/candidates/refresh', methods=['POST'])
+def refresh_candidates():
+    """Force le rafraîchissement du snapshot des candidats (body optionnel: { full: true })"""
+    try:
+        if recommendation_system.candidate_snapshot is None:
+            return jsonify({
+                'success': False,
+                'error': 'Snapshot des candidats désactivé (CANDIDATE_SNAPSHOT_ENABLED=false)'
+            }), 409
+        
+        data = request.get_json(silent=True) or {}
+        snapshot_stats = recommendation_system.candidate_snapshot.refresh(full=bool(data.get('full', False)))
+        
+        return jsonify({
+            'success': True,
+            'snapshot': snapshot_stats
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur rafraîchissement snapshot: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/events', methods=['POST'])
+def post_event():
+    """Événement du backend .NET (body: { type: rating_submitted | skills_changed | cv_uploaded, stagiaireId })"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        event_type = data.get('type')
+        if event_type not in EVENT_TYPES:
+            return jsonify({
+                'success': False,
+                'error': f"Type d'événement inconnu: {event_type} (attendu: {', '.join(EVENT_TYPES)})"
+            }), 400
+        
+        try:
+            stagiaire_id = int(data.get('stagiaireId'))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Champ stagiaireId obligatoire'}), 400
+        
+        result = recommendation_system.apply_event(event_type, stagiaire_id)
+        
+        return jsonify({
+            'success': True,
+            'event': event_type,
+            **result
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur traitement événement: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/test-ratings-comprehensive', methods=['GET'])
 def test_ratings_comprehensive():
     """Test complet du système de ratings"""
@@ -1089,9 +1507,8 @@ def test_ratings_comprehensive():
 def test_stagiaire_rating(stagiaire_id):
     """Test du calcul de rating pour un stagiaire spécifique"""
     try:
-        conn = pyodbc.connect(recommendation_system.connection_string)
-        rating_result = recommendation_system.get_stagiaire_comprehensive_rating(stagiaire_id, conn)
-        conn.close()
+        with recommendation_system.db_pool.connection() as conn:
+            rating_result = recommendation_system.get_stagiaire_comprehensive_rating(stagiaire_id, conn)
         
         return jsonify({
             'success': True,
@@ -1162,44 +1579,41 @@ def get_stagiaires_with_ratings():
 def test_enum_types():
     """Test des types ENUM corrigés dans la table Ratings"""
     try:
-        conn = pyodbc.connect(recommendation_system.connection_string)
+        with recommendation_system.db_pool.connection() as conn:
         
-        logger.info("🧪 === TEST DES TYPES ENUM DANS RATINGS ===")
+            logger.info("🧪 === TEST DES TYPES ENUM DANS RATINGS ===")
         
-        # Test 1: Vérification des types string
-        test_query_string = """
-        SELECT Type, COUNT(*) as count, AVG(CAST(Score as FLOAT)) as avg_score
-        FROM Ratings 
-        WHERE Type IN ('TuteurToStagiaire', 'RHToStagiaire')
-        GROUP BY Type
-        """
+            # Test 1: Vérification des types string
+            test_query_string = """
+            SELECT Type, COUNT(*) as count, AVG(CAST(Score as FLOAT)) as avg_score
+            FROM Ratings 
+            WHERE Type IN ('TuteurToStagiaire', 'RHToStagiaire')
+            GROUP BY Type
+            """
         
-        try:
-            string_results = pd.read_sql(test_query_string, conn)
-            logger.info("✅ Types ENUM STRING - SUCCÈS:")
-            for _, row in string_results.iterrows():
-                logger.info(f"   - {row['Type']}: {row['count']} ratings, moyenne {row['avg_score']:.2f}")
-            
-            total_string = string_results['count'].sum() if len(string_results) > 0 else 0
-            logger.info(f"   📊 Total avec types string: {total_string}")
-            
-            conn.close()
-            
-            return jsonify({
-                'success': True,
-                'enum_types_working': True,
-                'message': 'Types ENUM string validés avec succès',
-                'total_ratings': int(total_string),
-                'ratings_by_type': string_results.to_dict('records') if len(string_results) > 0 else []
-            })
+            try:
+                string_results = pd.read_sql(test_query_string, conn)
+                logger.info("✅ Types ENUM STRING - SUCCÈS:")
+                for _, row in string_results.iterrows():
+                    logger.info(f"   - {row['Type']}: {row['count']} ratings, moyenne {row['avg_score']:.2f}")
+            
+                total_string = string_results['count'].sum() if len(string_results) > 0 else 0
+                logger.info(f"   📊 Total avec types string: {total_string}")
+            
+                return jsonify({
+                    'success': True,
+                    'enum_types_working': True,
+                    'message': 'Types ENUM string validés avec succès',
+                    'total_ratings': int(total_string),
+                    'ratings_by_type': string_results.to_dict('records') if len(string_results) > 0 else []
+                })
             
-        except Exception as e:
-            logger.error(f"❌ Types ENUM STRING échoués: {e}")
-            conn.close()
-            return jsonify({
-                'success': False,
-                'error': f'Types ENUM string échoués: {str(e)}'
-            })
+            except Exception as e:
+                logger.error(f"❌ Types ENUM STRING échoués: {e}")
+                return jsonify({
+                    'success': False,
+                    'error': f'Types ENUM string échoués: {str(e)}'
+                })
             
     except Exception as e:
         logger.error(f"❌ Erreur test enum types: {e}")
@@ -1256,44 +1670,43 @@ def debug_recommendation_process():
         data = request.get_json()
         department_id = data.get('departmentId', 1)
         
-        conn = pyodbc.connect(recommendation_system.connection_string)
+        with recommendation_system.db_pool.connection() as conn:
         
-        # Étape 1: Récupérer tous les stagiaires
-        all_stagiaires_query = """
-        SELECT Id, FirstName, LastName, DepartmentId, StartDate, EndDate, Skills
-        FROM Users 
-        WHERE Role = 3
-        """
-        all_stagiaires = pd.read_sql(all_stagiaires_query, conn)
-        
-        # Étape 2: Filtrer par département
-        dept_filtered = all_stagiaires[all_stagiaires['DepartmentId'] == int(department_id)]
-        
-        # Étape 3: Vérifier les stages terminés
-        completed_stages = []
-        for _, stagiaire in dept_filtered.iterrows():
-            if recommendation_system.is_stage_completed(stagiaire):
-                completed_stages.append({
-                    'id': stagiaire['Id'],
-                    'name': f"{stagiaire['FirstName']} {stagiaire['LastName']}",
-                    'end_date': str(stagiaire['EndDate']),
-                    'skills': stagiaire.get('Skills', '')
-                })
+            # Étape 1: Récupérer tous les stagiaires
+            all_stagiaires_query = """
+            SELECT Id, FirstName, LastName, DepartmentId, StartDate, EndDate, Skills
+            FROM Users 
+            WHERE Role = 3
+            """
+            all_stagiaires = pd.read_sql(all_stagiaires_query, conn)
         
-        conn.close()
+            # Étape 2: Filtrer par département
+            dept_filtered = all_stagiaires[all_stagiaires['DepartmentId'] == int(department_id)]
         
-        return jsonify({
-            'success': True,
-            'debug_info': {
-                'total_stagiaires': len(all_stagiaires),
-                'department_filtered': len(dept_filtered),
-                'completed_stages': len(completed_stages),
-                'department_id_requested': department_id
-            },
-            'all_stagiaires_sample': all_stagiaires.head(3).to_dict('records'),
-            'dept_filtered_sample': dept_filtered.head(3).to_dict('records'),
-            'completed_stages_list': completed_stages
-        })
+            # Étape 3: Vérifier les stages terminés
+            completed_stages = []
+            for _, stagiaire in dept_filtered.iterrows():
+                if recommendation_system.is_stage_completed(stagiaire):
+                    completed_stages.append({
+                        'id': stagiaire['Id'],
+                        'name': f"{stagiaire['FirstName']} {stagiaire['LastName']}",
+                        'end_date': str(stagiaire['EndDate']),
+                        'skills': stagiaire.get('Skills', '')
+                    })
+        
+        
+            return jsonify({
+                'success': True,
+                'debug_info': {
+                    'total_stagiaires': len(all_stagiaires),
+                    'department_filtered': len(dept_filtered),
+                    'completed_stages': len(completed_stages),
+                    'department_id_requested': department_id
+                },
+                'all_stagiaires_sample': all_stagiaires.head(3).to_dict('records'),
+                'dept_filtered_sample': dept_filtered.head(3).to_dict('records'),
+                'completed_stages_list': completed_stages
+            })
         
     except Exception as e:
         logger.error(f"Erreur debug process: {e}")
@@ -1303,30 +1716,29 @@ def debug_recommendation_process():
 @app.route('/api/debug-departments', methods=['GET'])
 def debug_departments():
     try:
-        conn = pyodbc.connect(recommendation_system.connection_string)
-        
-        # Départements
-        dept_query = "SELECT Id, DepartmentName FROM Departments"
-        dept_df = pd.read_sql(dept_query, conn)
-        
-        # Stagiaires avec leurs départements  
-        stagiaire_query = """
-        SELECT u.Id, u.FirstName, u.LastName, u.DepartmentId, d.DepartmentName,
-               u.EndDate, u.Role
-        FROM Users u
-        LEFT JOIN Departments d ON u.DepartmentId = d.Id
-        WHERE u.Role = 3
-        """
-        stagiaire_df = pd.read_sql(stagiaire_query, conn)
+        with recommendation_system.db_pool.connection() as conn:
         
-        conn.close()
+            # Départements
+            dept_query = "SELECT Id, DepartmentName FROM Departments"
+            dept_df = pd.read_sql(dept_query, conn)
         
-        return jsonify({
-            'success': True,
-            'departments': dept_df.to_dict('records'),
-            'stagiaires': stagiaire_df.to_dict('records'),
-            'stagiaires_count': len(stagiaire_df)
-        })
+            # Stagiaires avec leurs départements  
+            stagiaire_query = """
+            SELECT u.Id, u.FirstName, u.LastName, u.DepartmentId, d.DepartmentName,
+                   u.EndDate, u.Role
+            FROM Users u
+            LEFT JOIN Departments d ON u.DepartmentId = d.Id
+            WHERE u.Role = 3
+            """
+            stagiaire_df = pd.read_sql(stagiaire_query, conn)
+        
+        
+            return jsonify({
+                'success': True,
+                'departments': dept_df.to_dict('records'),
+                'stagiaires': stagiaire_df.to_dict('records'),
+                'stagiaires_count': len(stagiaire_df)
+            })
         
     except Exception as e:
         logger.error(f"Erreur debug départements: {e}")
@@ -1336,36 +1748,35 @@ def debug_departments():
 @app.route('/api/debug-users-structure', methods=['GET'])
 def debug_users_structure():
     try:
-        conn = pyodbc.connect(recommendation_system.connection_string)
-        
-        # Structure de la table Users
-        structure_query = """
-        SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_DEFAULT
-        FROM INFORMATION_SCHEMA.COLUMNS 
-        WHERE TABLE_NAME = 'Users'
-        ORDER BY ORDINAL_POSITION
-        """
+        with recommendation_system.db_pool.connection() as conn:
+        
+            # Structure de la table Users
+            structure_query = """
+            SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_DEFAULT
+            FROM INFORMATION_SCHEMA.COLUMNS 
+            WHERE TABLE_NAME = 'Users'
+            ORDER BY ORDINAL_POSITION
+            """
         
-        structure_df = pd.read_sql(structure_query, conn)
+            structure_df = pd.read_sql(structure_query, conn)
         
-        # Échantillon de données Users avec Role = 3
-        sample_query = """
-        SELECT TOP 5 Id, FirstName, LastName, Email, Role, DepartmentId, 
-               StartDate, EndDate, Skills, stage, etudiant, statuts
-        FROM Users 
-        WHERE Role = 3
-        """
+            # Échantillon de données Users avec Role = 3
+            sample_query = """
+            SELECT TOP 5 Id, FirstName, LastName, Email, Role, DepartmentId, 
+                   StartDate, EndDate, Skills, stage, etudiant, statuts
+            FROM Users 
+            WHERE Role = 3
+            """
         
-        sample_df = pd.read_sql(sample_query, conn)
+            sample_df = pd.read_sql(sample_query, conn)
         
-        conn.close()
         
-        return jsonify({
-            'success': True,
-            'table_structure': structure_df.to_dict('records'),
-            'sample_users': sample_df.to_dict('records'),
-            'users_count': len(sample_df)
-        })
+            return jsonify({
+                'success': True,
+                'table_structure': structure_df.to_dict('records'),
+                'sample_users': sample_df.to_dict('records'),
+                'users_count': len(sample_df)
+            })
         
     except Exception as e:
         logger.error(f"Erreur debug users: {e}")
@@ -1399,24 +1810,23 @@ def debug_stagiaires_data():
 @app.route('/api/debug-table-names', methods=['GET'])
 def debug_table_names():
     try:
-        conn = pyodbc.connect(recommendation_system.connection_string)
-        
-        # Récupérer la liste des tables
-        tables_query = """
-        SELECT TABLE_NAME 
-        FROM INFORMATION_SCHEMA.TABLES 
-        WHERE TABLE_TYPE = 'BASE TABLE'
-        ORDER BY TABLE_NAME
-        """
+        with recommendation_system.db_pool.connection() as conn:
+        
+            # Récupérer la liste des tables
+            tables_query = """
+            SELECT TABLE_NAME 
+            FROM INFORMATION_SCHEMA.TABLES 
+            WHERE TABLE_TYPE = 'BASE TABLE'
+            ORDER BY TABLE_NAME
+            """
         
-        tables_df = pd.read_sql(tables_query, conn)
-        conn.close()
+            tables_df = pd.read_sql(tables_query, conn)
         
-        return jsonify({
-            'success': True,
-            'tables': tables_df['TABLE_NAME'].tolist(),
-            'table_count': len(tables_df)
-        })
+            return jsonify({
+                'success': True,
+                'tables': tables_df['TABLE_NAME'].tolist(),
+                'table_count': len(tables_df)
+            })
         
     except Exception as e:
         logger.error(f"Erreur debug tables: {e}")
@@ -1426,51 +1836,50 @@ def debug_table_names():
 @app.route('/api/debug-base-query', methods=['GET'])
 def debug_base_query():
     try:
-        conn = pyodbc.connect(recommendation_system.connection_string)
+        with recommendation_system.db_pool.connection() as conn:
         
-        # Test de la requête de base simple
-        simple_query = """
-        SELECT Id, FirstName, LastName, Email, Role
-        FROM Users 
-        WHERE Role = 3
-        """
+            # Test de la requête de base simple
+            simple_query = """
+            SELECT Id, FirstName, LastName, Email, Role
+            FROM Users 
+            WHERE Role = 3
+            """
         
-        simple_df = pd.read_sql(simple_query, conn)
+            simple_df = pd.read_sql(simple_query, conn)
         
-        # Test de la requête complète
-        full_query = """
-        SELECT 
-            Id, FirstName, LastName, Email, Skills, CvUrl,
-            StartDate, EndDate, DepartmentId, Role, statuts,
-            stage, etudiant, UniversityId
-        FROM Users 
-        WHERE Role = 3
-        """
+            # Test de la requête complète
+            full_query = """
+            SELECT 
+                Id, FirstName, LastName, Email, Skills, CvUrl,
+                StartDate, EndDate, DepartmentId, Role, statuts,
+                stage, etudiant, UniversityId
+            FROM Users 
+            WHERE Role = 3
+            """
         
-        try:
-            full_df = pd.read_sql(full_query, conn)
-            full_success = True
-            full_error = None
-        except Exception as e:
-            full_df = pd.DataFrame()
-            full_success = False
-            full_error = str(e)
+            try:
+                full_df = pd.read_sql(full_query, conn)
+                full_success = True
+                full_error = None
+            except Exception as e:
+                full_df = pd.DataFrame()
+                full_success = False
+                full_error = str(e)
         
-        conn.close()
         
-        return jsonify({
-            'success': True,
-            'simple_query': {
-                'count': len(simple_df),
-                'sample': simple_df.head(3).to_dict('records') if not simple_df.empty else []
-            },
-            'full_query': {
-                'success': full_success,
-                'count': len(full_df),
-                'error': full_error,
-                'sample': full_df.head(3).to_dict('records') if not full_df.empty else []
-            }
-        })
+            return jsonify({
+                'success': True,
+                'simple_query': {
+                    'count': len(simple_df),
+                    'sample': simple_df.head(3).to_dict('records') if not simple_df.empty else []
+                },
+                'full_query': {
+                    'success': full_success,
+                    'count': len(full_df),
+                    'error': full_error,
+                    'sample': full_df.head(3).to_dict('records') if not full_df.empty else []
+                }
+            })
         
     except Exception as e:
         logger.error(f"Erreur debug base query: {e}")
@@ -1536,7 +1945,12 @@ if __name__ == '__main__':
     print("   🎯 Bonus pour excellence (rating + compétences)")
     print("\n📊 Endpoints disponibles pour Angular:")
     print("   POST /api/recommendations - Recommandations IA")
+    print("   POST /api/recommendations/batch - Recommandations pour plusieurs offres")
+    print("   POST /api/recommendations/jobs - Recommandations en arrière-plan (GET/DELETE /api/recommendations/jobs/<id>)")
+    print("   GET  /api/stagiaires/<id>/matching-offers - Offres adaptées à un stagiaire")
     print("   GET  /api/health - Vérification de santé")
+    print("   POST /api/candidates/refresh - Rafraîchissement du snapshot des candidats")
+    print("   POST /api/events - Événements du backend (rating, compétences, CV)")
     print("   GET  /api/test-enum-types - Test types ENUM corrigés")
     print("   GET  /api/test-ratings-comprehensive - Test complet ratings")
     print("   GET  /api/test-stagiaire-rating/<id> - Test rating stagiaire")
@@ -1549,5 +1963,6 @@ if __name__ == '__main__':
     print("   - Méthode: POST")
     print("   - Body: { title, description, requiredSkills, departmentId }")
     print("   - departmentId OBLIGATOIRE !")
+    print("   - { jobOfferId, persist: true } : liste enregistrée dans JobOfferRecommendations")
 
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -8,10 +8,29 @@ from flask_cors import CORS
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import logging
+import threading
+import hashlib
 import json
 import re
 import os
 
+from data_layer import (
+    fetch_stagiaires, filter_eligible_stagiaires, load_rating_aggregates,
+    attach_rating_columns, calculate_rating_quality
+)
+from db_pool import ConnectionPool, connection_string_from_env
+from candidate_snapshot import CandidateSnapshot
+from tfidf_index import CandidateTfidfIndex
+from skill_cache import SkillExtractionCache
+from skill_matcher import SkillMatcher, MATCHER_VERSION
+from skill_families import SkillFamilyIndex
+from skill_index import CandidateSkillIndex, EMPTY_SKILLS_VALUES
+from job_offer_index import JobOfferIndex
+from recommendation_cache import RecommendationCache, offer_key
+from recommendation_writer import RecommendationWriter
+from recommendation_jobs import RecommendationJobManager, JobCancelledError, JobQueueFullError
+from scoring_engine import score_candidates, score_candidate_matrix, rank_candidates
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,6 +38,15 @@ logger = logging.getLogger(__name__)
 # Charger les variables d'environnement
 load_dotenv()
 
+# Nombre maximum d'offres par appel à /api/recommendations/batch
+BATCH_MAX_OFFERS = int(os.getenv('RECOMMENDATION_BATCH_MAX_OFFERS', 500))
+
+# Événements acceptés par /api/events (envoyés par le backend .NET)
+EVENT_TYPES = ('rating_submitted', 'skills_changed', 'cv_uploaded')
+
+# Lignes remplacées (part du snapshot) au-delà desquelles un index candidats est reconstruit plutôt que complété
+INDEX_PATCH_MAX_FRACTION = 0.2
+
 class ImprovedRecommendationSystem:
     def __init__(self):
         self.tfidf_vectorizer = TfidfVectorizer(
@@ -28,6 +56,16 @@ class ImprovedRecommendationSystem:
             lowercase=True
         )
         self.connection_string = self._get_connection_string()
+        self.db_pool = self._create_db_pool()
+        self.candidate_snapshot = self._create_candidate_snapshot()
+        
+        # Index TF-IDF des profils candidats (reconstruit quand le snapshot change)
+        self.tfidf_index = None
+        self._tfidf_index_lock = threading.Lock()
+        
+        # Matrice candidats x compétences (reconstruite quand le snapshot change)
+        self.skill_index = None
+        self._skill_index_lock = threading.Lock()
         
         # DICTIONNAIRE DE SYNONYMES ÉTENDU
         self.synonyms_dict = {
@@ -74,16 +112,46 @@ class ImprovedRecommendationSystem:
             'tensorflow': 'ai', 'pytorch': 'ai', 'pandas': 'data', 'numpy': 'data'
         }
         
+        # Synonymes compilés une fois en automate (correspondance la plus longue)
+        self.skill_matcher = SkillMatcher(self.synonyms_dict)
+        
+        # Masques de familles de compétences (calculés une fois par compétence)
+        self.skill_families = SkillFamilyIndex()
+        
+        # Offres ouvertes (JobOffers) pour la recherche inverse stagiaire -> offres
+        self.job_offer_index = JobOfferIndex(
+            self.db_pool, self.extract_skills_dynamically, self.skill_families, self.preprocess_text
+        )
+        
+        # Cache des compétences extraites (SKILL_CACHE_MAX_SIZE, SKILL_CACHE_PATH), invalidé si les règles changent
+        synonyms_fingerprint = hashlib.blake2b(
+            json.dumps([MATCHER_VERSION, self.synonyms_dict], sort_keys=True).encode('utf-8'), digest_size=8
+        ).hexdigest()
+        self.skill_cache = SkillExtractionCache.from_env(namespace=synonyms_fingerprint)
+        
+        # Résultats de /api/recommendations par offre normalisée et version du snapshot
+        # (RECOMMENDATION_CACHE_MAX_SIZE, RECOMMENDATION_CACHE_TTL)
+        self.recommendation_cache = RecommendationCache.from_env()
+        
+        # Enregistrement des listes classées dans JobOfferRecommendations (RECOMMENDATION_WRITE_BATCH_SIZE)
+        self.recommendation_writer = RecommendationWriter.from_env(self.db_pool)
+        
+        # Recommandations en arrière-plan (RECOMMENDATION_JOB_WORKERS, RECOMMENDATION_JOB_QUEUE_SIZE, RECOMMENDATION_JOB_TTL)
+        self.recommendation_jobs = RecommendationJobManager.from_env()
+        
     def _get_connection_string(self):
         """Configuration de la connexion à SQL Server"""
-        return (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={os.getenv('DB_SERVER', 'DESKTOP-913R9GN')};"
-            f"DATABASE={os.getenv('DB_NAME', 'PFEDb')};"
-            f"Trusted_Connection=yes;"
-            f"MultipleActiveResultSets=yes;"
-            f"Encrypt=no;"
-        )
+        return connection_string_from_env()
+    
+    def _create_db_pool(self):
+        """Pool de connexions (DB_POOL_MAX_SIZE, DB_POOL_IDLE_TIMEOUT, DB_POOL_TIMEOUT)"""
+        return ConnectionPool.from_env(self.connection_string)
+    
+    def _create_candidate_snapshot(self):
+        """Snapshot des candidats rafraîchi par watermark (désactivable: CANDIDATE_SNAPSHOT_ENABLED=false)"""
+        if os.getenv('CANDIDATE_SNAPSHOT_ENABLED', 'true').lower() in ('0', 'false', 'no'):
+            return None
+        return CandidateSnapshot(self.db_pool, self.get_stagiaires_data)
     
     def normalize_skill(self, skill):
         """Normalise une compétence en gérant les synonymes"""
@@ -92,17 +160,18 @@ class ImprovedRecommendationSystem:
         if skill in self.synonyms_dict:
             return self.synonyms_dict[skill]
         
-        for synonym, normalized in self.synonyms_dict.items():
-            if synonym in skill or skill in synonym:
-                return normalized
-                
-        return skill
+        # Synonyme le plus long contenu dans la compétence, sinon le plus court qui la contient
+        return self.skill_matcher.normalize(skill)
     
     def extract_skills_dynamically(self, text):
-        """Extraction dynamique des compétences avec nettoyage amélioré"""
+        """Extraction dynamique des compétences, mémoïsée par empreinte du texte brut"""
         if not text or pd.isna(text):
             return []
         
+        return self.skill_cache.get_or_compute(str(text), self._extract_skills_uncached)
+    
+    def _extract_skills_uncached(self, text):
+        """Extraction dynamique des compétences avec nettoyage amélioré"""
         text = str(text).lower()
         
         # Mots vides étendus
@@ -158,21 +227,17 @@ class ImprovedRecommendationSystem:
         # Correspondances exactes
         exact_matches = job_set.intersection(candidate_set)
         
-        # Correspondances partielles
-        partial_matches = set()
-        for job_skill in job_skills_list:
-            for candidate_skill in candidate_skills_list:
-                if self._are_skills_related(job_skill, candidate_skill):
-                    partial_matches.add((job_skill, candidate_skill))
+        # Correspondances partielles (paires liées, via les masques de familles précalculés)
+        partial_count = self.skill_families.count_related_pairs(job_skills_list, candidate_skills_list)
         
         # Calcul du score
         exact_score = len(exact_matches) / len(job_set) if job_set else 0
-        partial_score = len(partial_matches) / len(job_set) if job_set else 0
+        partial_score = partial_count / len(job_set) if job_set else 0
         
         final_score = (exact_score * 0.8) + (partial_score * 0.2)
         
         # Bonus de couverture
-        total_matches = len(exact_matches) + len(partial_matches)
+        total_matches = len(exact_matches) + partial_count
         coverage_ratio = total_matches / len(job_set) if job_set else 0
         
         if coverage_ratio >= 1.0:
@@ -188,25 +253,7 @@ class ImprovedRecommendationSystem:
     
     def _are_skills_related(self, skill1, skill2):
         """Détecte les compétences similaires"""
-        if skill1 in skill2 or skill2 in skill1:
-            return True
-        
-        skill_families = {
-            'frontend': ['react', 'angular', 'vue', 'javascript', 'typescript', 'html', 'css'],
-            'backend': ['node', 'python', 'java', 'csharp', 'php', 'dotnet'],
-            'database': ['sql', 'nosql', 'mysql', 'mongodb', 'postgresql'],
-            'mobile': ['ios', 'android', 'react native', 'flutter', 'swift', 'kotlin'],
-            'data': ['data', 'analytics', 'ai', 'ml'],
-            'design': ['design', 'ui', 'ux', 'photoshop', 'figma'],
-            'cloud': ['aws', 'azure', 'cloud', 'devops']
-        }
-        
-        for family, skills in skill_families.items():
-            if (any(s in skill1 for s in skills) and 
-                any(s in skill2 for s in skills)):
-                return True
-        
-        return False
+        return self.skill_families.are_related(skill1, skill2)
     
     def is_stage_completed(self, stagiaire):
         """Vérifie si le stage est terminé"""
@@ -247,34 +294,11 @@ class ImprovedRecommendationSystem:
             return True  # En cas d'erreur, considérer comme terminé
     
     def get_stagiaire_comprehensive_rating(self, stagiaire_id, conn):
-        """Calcul amélioré des ratings - copié depuis app1.py qui fonctionne"""
+        """Calcul des ratings d'un stagiaire (même agrégation que le chargement groupé)"""
         try:
-            # Requête principale - Types ENUM STRING corrigés + sans filtre status
-            rating_query = """
-            SELECT 
-                r.Id,
-                r.EvaluatorId,
-                r.EvaluatedUserId,
-                r.Score,
-                r.Type,
-                r.Status,
-                r.Comment,
-                r.DetailedScores,
-                r.CreatedAt,
-                r.SubmittedAt,
-                r.ApprovedAt,
-                e.FirstName + ' ' + e.LastName as EvaluatorName,
-                e.Role as EvaluatorRole
-            FROM Ratings r
-            LEFT JOIN Users e ON r.EvaluatorId = e.Id
-            WHERE r.EvaluatedUserId = ?
-            AND r.Type IN ('TuteurToStagiaire', 'RHToStagiaire')
-            ORDER BY r.CreatedAt DESC
-            """
-            
-            ratings_df = pd.read_sql(rating_query, conn, params=[stagiaire_id])
-            
-            if len(ratings_df) == 0:
+            rating_data = load_rating_aggregates(conn, [stagiaire_id]).get(int(stagiaire_id))
+            
+            if rating_data is None:
                 return {
                     'average_rating': 3.0,
                     'rating_count': 0,
@@ -283,51 +307,7 @@ class ImprovedRecommendationSystem:
                     'rating_details': []
                 }
             
-            # Analyse détaillée des ratings
-            rating_details = []
-            total_score_sum = 0
-            valid_ratings_count = 0
-            
-            for _, rating in ratings_df.iterrows():
-                try:
-                    score = float(rating['Score'])
-                    total_score_sum += score
-                    valid_ratings_count += 1
-                    
-                    evaluator_type = "Tuteur" if rating['Type'] == 'TuteurToStagiaire' else "RH"
-                    
-                    rating_detail = {
-                        'id': rating['Id'],
-                        'score': score,
-                        'evaluator_name': rating['EvaluatorName'],
-                        'evaluator_type': evaluator_type,
-                        'comment': rating['Comment'] or '',
-                        'created_at': rating['CreatedAt'].strftime('%Y-%m-%d') if rating['CreatedAt'] else '',
-                        'status': rating['Status']
-                    }
-                    
-                    rating_details.append(rating_detail)
-                    
-                except Exception as e:
-                    logger.error(f"Erreur traitement rating {rating['Id']}: {e}")
-                    continue
-            
-            # Calcul des moyennes
-            if valid_ratings_count == 0:
-                average_rating = 3.0
-            else:
-                average_rating = total_score_sum / valid_ratings_count
-            
-            result = {
-                'average_rating': round(average_rating, 2),
-                'rating_count': valid_ratings_count,
-                'detailed_scores': {},
-                'has_ratings': valid_ratings_count > 0,
-                'rating_details': rating_details,
-                'quality_score': self._calculate_rating_quality(valid_ratings_count, average_rating)
-            }
-            
-            return result
+            return rating_data
             
         except Exception as e:
             logger.error(f"Erreur calcul rating pour stagiaire {stagiaire_id}: {e}")
@@ -342,232 +322,449 @@ class ImprovedRecommendationSystem:
     
     def _calculate_rating_quality(self, rating_count, average_rating):
         """Calcule un score de qualité basé sur le nombre et la valeur des ratings"""
-        if rating_count == 0:
-            return 0.3
-        
-        count_score = min(rating_count / 3, 1.0)
-        rating_score = average_rating / 5.0
-        quality_score = (count_score * 0.3) + (rating_score * 0.7)
-        
-        return round(quality_score, 3)
+        return calculate_rating_quality(rating_count, average_rating)
     
-    def get_stagiaires_data(self):
-        """Récupère les données des stagiaires avec ratings"""
+    def get_stagiaires_data(self, stagiaire_ids=None, department_id=None, completed_only=False):
+        """Récupère les données des stagiaires avec ratings (tous, ou filtrés par IDs / département / stage terminé)"""
         try:
-            conn = pyodbc.connect(self.connection_string)
-            
-            # Requête de base pour les stagiaires
-            base_query = """
-            SELECT 
-                Id, FirstName, LastName, Email, Skills, CvUrl,
-                StartDate, EndDate, DepartmentId, Role, statuts,
-                stage, etudiant, UniversityId
-            FROM Users 
-            WHERE Role = 3
-            """
+            conn = self.db_pool.acquire()
             
-            df = pd.read_sql(base_query, conn)
+            # Stagiaires + départements + universités (filtres d'éligibilité appliqués côté SQL)
+            df = fetch_stagiaires(conn, stagiaire_ids, department_id, completed_only)
             
             if df.empty:
                 conn.close()
                 return df
             
-            # Enrichissement avec départements
+            # Calcul des ratings (une seule requête pour tous les stagiaires)
             try:
-                dept_query = "SELECT Id, DepartmentName FROM Departments"
-                dept_df = pd.read_sql(dept_query, conn)
-                df = df.merge(dept_df, left_on='DepartmentId', right_on='Id', how='left', suffixes=('', '_dept'))
-                df = df.drop('Id_dept', axis=1, errors='ignore')
+                # Ratings des seuls stagiaires retournés dès qu'un filtre est appliqué
+                filtered = stagiaire_ids is not None or department_id is not None or completed_only
+                rating_ids = df['Id'].tolist() if filtered else None
+                rating_aggregates = load_rating_aggregates(conn, rating_ids)
             except Exception as e:
-                df['DepartmentName'] = 'Département inconnu'
+                logger.error(f"Erreur chargement groupé des ratings: {e}")
+                rating_aggregates = {}
             
-            # Enrichissement avec universités
-            try:
-                if 'UniversityId' in df.columns:
-                    uni_query = "SELECT Id, Universityname FROM Universities"
-                    uni_df = pd.read_sql(uni_query, conn)
-                    df = df.merge(uni_df, left_on='UniversityId', right_on='Id', how='left', suffixes=('', '_uni'))
-                    df = df.drop('Id_uni', axis=1, errors='ignore')
-                else:
-                    df['Universityname'] = 'Université inconnue'
-            except Exception as e:
-                df['Universityname'] = 'Université inconnue'
-            
-            # Calcul des ratings
-            for idx, row in df.iterrows():
-                try:
-                    rating_data = self.get_stagiaire_comprehensive_rating(row['Id'], conn)
-                    
-                    df.at[idx, 'AverageRating'] = rating_data['average_rating']
-                    df.at[idx, 'RatingCount'] = rating_data['rating_count']
-                    df.at[idx, 'HasRatings'] = rating_data['has_ratings']
-                    df.at[idx, 'RatingQuality'] = rating_data['quality_score']
-                    df.at[idx, 'DetailedScores'] = json.dumps(rating_data['detailed_scores'])
-                    df.at[idx, 'RatingDetails'] = json.dumps(rating_data['rating_details'])
-                except Exception as e:
-                    # Valeurs par défaut en cas d'erreur
-                    df.at[idx, 'AverageRating'] = 3.0
-                    df.at[idx, 'RatingCount'] = 0
-                    df.at[idx, 'HasRatings'] = False
-                    df.at[idx, 'RatingQuality'] = 0.5
-                    df.at[idx, 'DetailedScores'] = '{}'
-                    df.at[idx, 'RatingDetails'] = '[]'
+            df = attach_rating_columns(df, rating_aggregates)
             
             conn.close()
             
-            # Nettoyage final
-            if 'DepartmentName' not in df.columns:
-                df['DepartmentName'] = 'Département inconnu'
-            if 'Universityname' not in df.columns:
-                df['Universityname'] = 'Université inconnue'
-            
             return df
             
         except Exception as e:
             logger.error(f"Erreur globale: {e}")
             return pd.DataFrame()
     
-    def get_recommendations(self, job_offer, top_n=10):
-        """Système de recommandations intelligent et strict"""
+    def get_eligible_stagiaires(self, department_id):
+        """Stagiaires du département dont le stage est terminé (snapshot mémoire ou requête filtrée)"""
+        if self.candidate_snapshot is None:
+            return self.get_stagiaires_data(department_id=department_id, completed_only=True)
+        
+        # Filtre appliqué au snapshot de base puis aux seules lignes remplacées par des événements
+        return self.candidate_snapshot.view().filtered(lambda df: filter_eligible_stagiaires(df, department_id))
+    
+    def get_recommendations(self, job_offer, top_n=10, progress=None):
+        """
+        Système de recommandations intelligent et strict.
+        progress(étape) est appelé au début de chaque étape (fetch, rating, skills, text, rank) :
+        une tâche asynchrone y suit l'avancement et y interrompt le calcul annulé.
+        """
+        if progress is None:
+            progress = lambda stage: None
+        
         try:
             logger.info(f"Démarrage recommandations pour: {job_offer.get('title', '')}")
             
-            # Récupération des données
-            stagiaires_df = self.get_stagiaires_data()
-            if stagiaires_df.empty:
-                return []
-            
             # Filtre strict département (obligatoire)
             required_dept_id = job_offer.get('departmentId')
             if not required_dept_id:
                 return []
-                
-            dept_mask = stagiaires_df['DepartmentId'] == int(required_dept_id)
-            dept_filtered = stagiaires_df[dept_mask].copy()
             
-            if dept_filtered.empty:
+            # Stagiaires éligibles : département demandé + stage terminé
+            progress('fetch')
+            eligible_df = self.get_eligible_stagiaires(required_dept_id)
+            
+            if eligible_df.empty:
                 return []
             
-            # Filtre strict stages terminés
-            eligible_stagiaires = []
-            current_date = datetime.now()
+            # Calcul intelligent des scores (colonnes NumPy, une passe sur tous les candidats)
+            job_skills_required = job_offer.get('requiredSkills', '')
+            job_text = f"{job_offer.get('title', '')} {job_offer.get('description', '')}"
             
-            for idx, stagiaire in dept_filtered.iterrows():
-                end_date_str = stagiaire.get('EndDate')
-                
-                if not end_date_str or pd.isna(end_date_str):
-                    continue
-                
-                try:
-                    end_date = pd.to_datetime(end_date_str)
-                    if hasattr(end_date, 'iloc'):
-                        end_date = end_date.iloc[0] if len(end_date) > 0 else end_date
-                    
-                    if end_date <= current_date:
-                        eligible_stagiaires.append(stagiaire)
-                        
-                except Exception as e:
-                    continue
+            # Colonnes de rating (jointes au snapshot des candidats)
+            progress('rating')
+            average_ratings = eligible_df['AverageRating'].to_numpy(dtype=float)
+            rating_counts = eligible_df['RatingCount'].to_numpy(dtype=float).astype(np.int64)
+            has_ratings = eligible_df['HasRatings'].to_numpy(dtype=bool)
             
-            if not eligible_stagiaires:
-                return []
+            # Score de Compétences (30% du score total) : produits creux sur la matrice candidats x compétences
+            progress('skills')
+            skill_similarities = self._get_skill_index(eligible_df).similarities(
+                self.extract_skills_dynamically(job_skills_required), eligible_df['Id'].tolist()
+            )
+            
+            # Score Textuel (10% du score total) : offre transformée une fois, une seule mat-vec creuse
+            progress('text')
+            text_similarities = self._get_tfidf_index(eligible_df).similarities(
+                self.preprocess_text(job_text), eligible_df['Id'].tolist()
+            )
+            
+            # Score de Rating (60%), composite, bonus excellence et seuils minimum
+            progress('rank')
+            scores = score_candidates(
+                average_ratings,
+                rating_counts,
+                has_ratings,
+                skill_similarities,
+                text_similarities
+            )
             
-            # Calcul intelligent des scores
+            # Sélection partielle du top N, recommandations construites pour ces candidats uniquement
             recommendations = []
-            job_skills_required = job_offer.get('requiredSkills', '')
+            for position in rank_candidates(scores['composite_scores'], top_n):
+                stagiaire = eligible_df.iloc[scores['indices'][position]]
+                recommendations.append(self._build_recommendation(
+                    stagiaire,
+                    str(stagiaire['Skills']),
+                    float(scores['composite_scores'][position]),
+                    float(scores['rating_scores'][position]),
+                    float(scores['skill_similarities'][position]),
+                    float(scores['text_similarities'][position])
+                ))
             
-            for stagiaire in eligible_stagiaires:
-                # Score de Rating (60% du score total)
-                avg_rating = float(stagiaire.get('AverageRating', 3.0))
-                rating_count = int(stagiaire.get('RatingCount', 0))
-                has_ratings = bool(stagiaire.get('HasRatings', False))
-                
-                if has_ratings and rating_count > 0:
-                    rating_score = avg_rating / 5.0
-                    if rating_count >= 3:
-                        rating_score *= 1.1
-                    elif rating_count >= 2:
-                        rating_score *= 1.05
-                else:
-                    rating_score = 0.4
-                
-                # Score de Compétences (30% du score total)
-                stagiaire_skills = str(stagiaire.get('Skills', ''))
-                
-                if not stagiaire_skills or stagiaire_skills.lower() in ['none', 'null', '']:
-                    skill_similarity = 0.1
-                else:
-                    skill_similarity = self.calculate_skill_similarity_improved(
-                        job_skills_required, stagiaire_skills
-                    )
-                
-                # Score Textuel (10% du score total)
-                job_text = f"{job_offer.get('title', '')} {job_offer.get('description', '')}"
-                stagiaire_text = f"{stagiaire_skills} {stagiaire.get('DepartmentName', '')}"
-                
-                try:
-                    if job_text.strip() and stagiaire_text.strip():
-                        job_clean = self.preprocess_text(job_text)
-                        stagiaire_clean = self.preprocess_text(stagiaire_text)
-                        
-                        if job_clean and stagiaire_clean:
-                            tfidf_matrix = self.tfidf_vectorizer.fit_transform([job_clean, stagiaire_clean])
-                            text_similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-                        else:
-                            text_similarity = 0.1
-                    else:
-                        text_similarity = 0.1
-                except:
-                    text_similarity = 0.1
-                
-                # Score composite final
-                composite_score = (rating_score * 0.6) + (skill_similarity * 0.3) + (text_similarity * 0.1)
+            return recommendations
+            
+        except JobCancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur critique dans get_recommendations: {e}")
+            return []
+    
+    def get_cached_recommendations(self, job_offer, top_n=10, progress=None):
+        """
+        get_recommendations servi depuis le cache quand la même offre (normalisée) a déjà été demandée
+        sur la même version du snapshot. Retourne (recommandations, informations de cache).
+        """
+        if self.candidate_snapshot is None or not self.recommendation_cache.enabled:
+            # Sans snapshot, aucune version ne signale un changement de ratings ou de stagiaires
+            return self.get_recommendations(job_offer, top_n, progress), {'enabled': False, 'hit': False, 'age_seconds': None}
+        
+        try:
+            # Watermark revérifié avant la lecture : un changement de ratings/stagiaires change la version
+            self.candidate_snapshot.view()
+        except Exception as e:
+            logger.error(f"Snapshot indisponible, cache de recommandations ignoré: {e}")
+            return self.get_recommendations(job_offer, top_n, progress), {'enabled': False, 'hit': False, 'age_seconds': None}
+        
+        version = self.candidate_snapshot.version
+        key = offer_key(job_offer, top_n)
+        
+        recommendations, age = self.recommendation_cache.get(key, version)
+        if recommendations is not None:
+            return recommendations, {'enabled': True, 'hit': True, 'age_seconds': round(age, 1), 'snapshot_version': version}
+        
+        recommendations = self.get_recommendations(job_offer, top_n, progress)
+        # Liste vide non conservée : get_recommendations retourne aussi [] en cas d'erreur
+        if recommendations:
+            self.recommendation_cache.put(key, version, recommendations)
+        return recommendations, {'enabled': True, 'hit': False, 'age_seconds': 0.0, 'snapshot_version': version}
+    
+    def submit_recommendation_job(self, job_offer, top_n=10, persist_job_offer_id=None):
+        """
+        get_cached_recommendations exécuté en arrière-plan (file bornée, JobQueueFullError si pleine).
+        Retourne la tâche : étapes, résultat et annulation via self.recommendation_jobs.
+        """
+        def work(job):
+            recommendations, cache_info = self.get_cached_recommendations(job_offer, top_n, job.enter_stage)
+            persisted = None
+            if persist_job_offer_id is not None and recommendations:
+                persisted = self.recommendation_writer.save(persist_job_offer_id, recommendations)
+            return {
+                'recommendations': recommendations,
+                'totalFound': len(recommendations),
+                'persisted': persisted,
+                'cache': cache_info
+            }
+        
+        return self.recommendation_jobs.submit(work)
+    
+    def get_recommendations_batch(self, job_offers, top_n=10):
+        """
+        Recommandations pour plusieurs offres (même format que get_recommendations, une liste par offre).
+        Offres regroupées par département : candidats chargés une fois, scores en matrices offres x candidats.
+        """
+        results = [[] for _ in job_offers]
+        
+        offers_by_department = {}
+        for position, job_offer in enumerate(job_offers):
+            department_id = job_offer.get('departmentId')
+            if not department_id:
+                continue
+            try:
+                # "3" et 3 : même département, candidats chargés et scorés une seule fois
+                department_id = int(department_id)
+            except (TypeError, ValueError):
+                logger.warning(f"departmentId invalide ignoré: {department_id!r}")
+                continue
+            offers_by_department.setdefault(department_id, []).append(position)
+        
+        for department_id, positions in offers_by_department.items():
+            try:
+                eligible_df = self.get_eligible_stagiaires(department_id)
+                if eligible_df.empty:
+                    continue
                 
-                # Bonus pour excellence
-                if avg_rating >= 4.0 and skill_similarity > 0.5:
-                    composite_score += 0.15
+                offers = [job_offers[position] for position in positions]
+                stagiaire_ids = eligible_df['Id'].tolist()
                 
-                # Filtrage par seuil minimum
-                if skill_similarity < 0.2 or composite_score < 0.3:
-                    continue
+                # Compétences et texte : une ligne par offre, un produit creux par composante
+                skill_matrix = self._get_skill_index(eligible_df).similarity_matrix(
+                    [self.extract_skills_dynamically(offer.get('requiredSkills', '')) for offer in offers],
+                    stagiaire_ids
+                )
+                text_matrix = self._get_tfidf_index(eligible_df).similarity_matrix(
+                    [self.preprocess_text(f"{offer.get('title', '')} {offer.get('description', '')}") for offer in offers],
+                    stagiaire_ids
+                )
                 
-                composite_score = min(composite_score, 1.0)
+                # Rating calculé une fois pour le département, composite pour toutes les offres
+                scores = score_candidate_matrix(
+                    eligible_df['AverageRating'].to_numpy(dtype=float),
+                    eligible_df['RatingCount'].to_numpy(dtype=float).astype(np.int64),
+                    eligible_df['HasRatings'].to_numpy(dtype=bool),
+                    skill_matrix,
+                    text_matrix
+                )
                 
-                # Construction de la recommandation
-                recommendation = {
-                    'stagiaireId': int(stagiaire['Id']),
-                    'name': f"{stagiaire['FirstName']} {stagiaire['LastName']}",
-                    'email': str(stagiaire.get('Email', '')),
-                    'skills': stagiaire_skills if stagiaire_skills not in ['None', 'null', ''] else 'Compétences non renseignées',
-                    'department': str(stagiaire.get('DepartmentName', '')),
-                    'university': str(stagiaire.get('Universityname', '')),
-                    'stagePeriod': f"{stagiaire.get('StartDate', '')} → {stagiaire.get('EndDate', '')}",
-                    'rating': avg_rating,
-                    'ratingCount': rating_count,
-                    'hasRatings': has_ratings,
-                    'ratingQuality': float(stagiaire.get('RatingQuality', 0.5)),
-                    'compositeScore': float(composite_score),
-                    'textSimilarity': float(text_similarity),
-                    'skillSimilarity': float(skill_similarity),
-                    'ratingScore': float(rating_score),
-                    'departmentMatch': True,
-                    'stageCompleted': True,
-                    'matchReasons': self._generate_match_reasons(
-                        skill_similarity, rating_score, avg_rating, rating_count, composite_score
-                    ),
-                    'detailedScores': json.loads(stagiaire.get('DetailedScores', '{}')),
-                    'ratingDetails': json.loads(stagiaire.get('RatingDetails', '[]'))
-                }
+                for row, position in enumerate(positions):
+                    indices = np.flatnonzero(scores['qualified'][row])
+                    composite_scores = scores['composite_scores'][row, indices]
+                    
+                    for ranked in rank_candidates(composite_scores, top_n):
+                        index = indices[ranked]
+                        stagiaire = eligible_df.iloc[index]
+                        results[position].append(self._build_recommendation(
+                            stagiaire,
+                            str(stagiaire['Skills']),
+                            float(composite_scores[ranked]),
+                            float(scores['rating_scores'][index]),
+                            float(skill_matrix[row, index]),
+                            float(text_matrix[row, index])
+                        ))
                 
-                recommendations.append(recommendation)
-            
-            # Tri et finalisation
-            recommendations.sort(key=lambda x: x['compositeScore'], reverse=True)
-            return recommendations[:top_n]
-            
-        except Exception as e:
-            logger.error(f"Erreur critique dans get_recommendations: {e}")
+            except Exception as e:
+                logger.error(f"Erreur recommandations groupées (département {department_id}): {e}")
+        
+        return results
+    
+    def get_matching_offers(self, stagiaire_id, top_n=10):
+        """
+        Offres ouvertes les plus adaptées à un stagiaire (recherche inverse de get_recommendations).
+        Mêmes composantes et filtres stricts ; retourne None si le stagiaire est inconnu.
+        """
+        stagiaire_id = int(stagiaire_id)
+        if self.candidate_snapshot is not None:
+            stagiaire = self.candidate_snapshot.view().row(stagiaire_id)
+        else:
+            stagiaire_df = self.get_stagiaires_data(stagiaire_ids=[stagiaire_id])
+            stagiaire = None if stagiaire_df.empty else stagiaire_df.iloc[0]
+        
+        if stagiaire is None:
+            return None
+        
+        department_id = stagiaire.get('DepartmentId')
+        if pd.isna(department_id):
+            return []
+        
+        # Un stagiaire n'est recommandé que dans son département et une fois son stage terminé
+        eligible_df = self.get_eligible_stagiaires(int(department_id))
+        if eligible_df.empty or not (eligible_df['Id'] == stagiaire_id).any():
             return []
+        stagiaire = eligible_df[eligible_df['Id'] == stagiaire_id].iloc[0]
+        
+        skills_text = str(stagiaire['Skills'])
+        candidate_skills = (
+            [] if skills_text.lower() in EMPTY_SKILLS_VALUES else self.extract_skills_dynamically(skills_text)
+        )
+        
+        # Un produit creux candidat x offres par composante (compétences, texte)
+        offers, skill_similarities, text_similarities = self.job_offer_index.match_stagiaire(
+            stagiaire_id, candidate_skills, department_id, self._get_tfidf_index(eligible_df)
+        )
+        if offers.empty:
+            return []
+        
+        # Matrices offres x 1 candidat : même composite, bonus et seuils que get_recommendations
+        scores = score_candidate_matrix(
+            [float(stagiaire['AverageRating'])],
+            [int(stagiaire['RatingCount'])],
+            [bool(stagiaire['HasRatings'])],
+            skill_similarities[:, None],
+            text_similarities[:, None]
+        )
+        indices = np.flatnonzero(scores['qualified'][:, 0])
+        composite_scores = scores['composite_scores'][indices, 0]
+        
+        matching_offers = []
+        for ranked in rank_candidates(composite_scores, top_n):
+            offer = offers.iloc[indices[ranked]]
+            matching_offers.append({
+                'jobOfferId': int(offer['Id']),
+                'title': str(offer['Title']),
+                'departmentId': int(offer['DepartmentId']),
+                'publishedAt': str(offer.get('PublishedAt', '')),
+                'compositeScore': float(composite_scores[ranked]),
+                'ratingScore': float(scores['rating_scores'][0]),
+                'skillSimilarity': float(skill_similarities[indices[ranked]]),
+                'textSimilarity': float(text_similarities[indices[ranked]])
+            })
+        
+        return matching_offers
+    
+    def apply_event(self, event_type, stagiaire_id):
+        """
+        Événement du backend .NET (rating soumis, compétences modifiées, CV déposé) : seul ce stagiaire est
+        rechargé dans le snapshot, ses lignes des index compétences / TF-IDF sont remplacées et les
+        résultats en cache de son département (ancien et nouveau) invalidés.
+        """
+        if self.candidate_snapshot is None:
+            return {'applied': False, 'reason': 'Snapshot des candidats désactivé (données relues à chaque demande)'}
+        
+        update = self.candidate_snapshot.apply_update(stagiaire_id)
+        if update is None:
+            return {'applied': False, 'reason': 'Snapshot pas encore chargé (stagiaire lu au premier chargement)'}
+        previous, current = update
+        version = self.candidate_snapshot.version
+        
+        # Index déjà construits complétés tout de suite ; sinon construits à la prochaine demande
+        if self.skill_index is not None:
+            self._get_skill_index(None)
+        if self.tfidf_index is not None:
+            self._get_tfidf_index(None)
+        
+        departments = sorted({
+            int(row['DepartmentId']) for row in (previous, current)
+            if row is not None and pd.notna(row.get('DepartmentId'))
+        })
+        self.recommendation_cache.invalidate_departments(departments, version)
+        
+        logger.info(f"Événement {event_type}: stagiaire {stagiaire_id} mis à jour (départements {departments})")
+        return {
+            'applied': True,
+            'stagiaireId': int(stagiaire_id),
+            'removed': current is None,
+            'departments': departments,
+            'snapshotVersion': version
+        }
+    
+    def _get_tfidf_index(self, eligible_df):
+        """Index TF-IDF du corpus candidats, reconstruit à chaque nouvelle version du snapshot"""
+        if self.candidate_snapshot is None:
+            # Sans snapshot : vocabulaire ajusté une fois par demande sur les candidats éligibles
+            return self._build_tfidf_index(eligible_df, version=None)
+        
+        view = self.candidate_snapshot.view()
+        version = view.version
+        
+        with self._tfidf_index_lock:
+            if self.tfidf_index is None or self.tfidf_index.version != version:
+                # Stagiaires modifiés depuis la version de l'index : lignes remplacées, sinon reconstruction
+                changed_df = self._changed_candidates(self.tfidf_index, view)
+                updated = None if changed_df is None else self.tfidf_index.updated(
+                    changed_df['Id'].tolist(), self._tfidf_texts(changed_df), self.preprocess_text, version
+                )
+                self.tfidf_index = updated if updated is not None else self._build_tfidf_index(view.frame, version)
+            return self.tfidf_index
+    
+    def _build_tfidf_index(self, candidates_df, version):
+        return CandidateTfidfIndex.build(
+            self.tfidf_vectorizer, candidates_df['Id'].tolist(), self._tfidf_texts(candidates_df),
+            self.preprocess_text, version
+        )
+    
+    def _tfidf_texts(self, candidates_df):
+        return [
+            f"{str(skills)} {department_name}"
+            for skills, department_name in zip(candidates_df['Skills'].tolist(), candidates_df['DepartmentName'].tolist())
+        ]
+    
+    def _get_skill_index(self, eligible_df):
+        """Index des compétences candidats, reconstruit à chaque nouvelle version du snapshot"""
+        if self.candidate_snapshot is None:
+            return self._build_skill_index(eligible_df, version=None)
+        
+        view = self.candidate_snapshot.view()
+        version = view.version
+        
+        with self._skill_index_lock:
+            if self.skill_index is None or self.skill_index.version != version:
+                changed_df = self._changed_candidates(self.skill_index, view)
+                if changed_df is None:
+                    self.skill_index = self._build_skill_index(view.frame, version)
+                else:
+                    self.skill_index = self.skill_index.updated(
+                        changed_df['Id'].tolist(),
+                        [str(skills) for skills in changed_df['Skills'].tolist()],
+                        self.extract_skills_dynamically,
+                        version
+                    )
+            return self.skill_index
+    
+    def _changed_candidates(self, index, view):
+        """
+        Lignes de la vue du snapshot modifiées depuis la version d'un index, ou None s'il faut le reconstruire
+        (index absent, rechargement complet entre-temps, trop de lignes déjà remplacées).
+        """
+        if index is None:
+            return None
+        
+        changed = self.candidate_snapshot.changes_since(index.version, view.version)
+        if changed is None or index.appended_rows + len(changed) > INDEX_PATCH_MAX_FRACTION * view.size:
+            return None
+        
+        return view.rows(changed)
+    
+    def _build_skill_index(self, candidates_df, version):
+        return CandidateSkillIndex.build(
+            candidates_df['Id'].tolist(),
+            [str(skills) for skills in candidates_df['Skills'].tolist()],
+            self.extract_skills_dynamically,
+            self.skill_families,
+            version
+        )
+    
+    def _build_recommendation(self, stagiaire, stagiaire_skills, composite_score, rating_score,
+                              skill_similarity, text_similarity):
+        """Construit la recommandation (format attendu par Angular/.NET) d'un candidat retenu"""
+        avg_rating = float(stagiaire.get('AverageRating', 3.0))
+        rating_count = int(stagiaire.get('RatingCount', 0))
+        has_ratings = bool(stagiaire.get('HasRatings', False))
+        
+        return {
+            'stagiaireId': int(stagiaire['Id']),
+            'name': f"{stagiaire['FirstName']} {stagiaire['LastName']}",
+            'email': str(stagiaire.get('Email', '')),
+            'skills': stagiaire_skills if stagiaire_skills not in ['None', 'null', ''] else 'Compétences non renseignées',
+            'department': str(stagiaire.get('DepartmentName', '')),
+            'university': str(stagiaire.get('Universityname', '')),
+            'stagePeriod': f"{stagiaire.get('StartDate', '')} → {stagiaire.get('EndDate', '')}",
+            'rating': avg_rating,
+            'ratingCount': rating_count,
+            'hasRatings': has_ratings,
+            'ratingQuality': float(stagiaire.get('RatingQuality', 0.5)),
+            'compositeScore': composite_score,
+            'textSimilarity': text_similarity,
+            'skillSimilarity': skill_similarity,
+            'ratingScore': rating_score,
+            'departmentMatch': True,
+            'stageCompleted': True,
+            'matchReasons': self._generate_match_reasons(
+                skill_similarity, rating_score, avg_rating, rating_count, composite_score
+            ),
+            'detailedScores': json.loads(stagiaire.get('DetailedScores', '{}')),
+            'ratingDetails': json.loads(stagiaire.get('RatingDetails', '[]'))
+        }
     
     def _generate_match_reasons(self, skill_similarity, rating_score, avg_rating, rating_count, composite_score):
         """Génère des raisons intelligentes pour le match"""
@@ -661,14 +858,31 @@ def get_recommendations():
         
         top_n = data.get('topN', 10)
         
+        # Enregistrement optionnel de la liste dans JobOfferRecommendations (remplace les lignes actives de l'offre)
+        persist = bool(data.get('persist', False))
+        if persist:
+            try:
+                job_offer_id = int(data.get('jobOfferId'))
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'error': 'Champ jobOfferId obligatoire pour enregistrer les recommandations'
+                }), 400
+        
         logger.info(f"Nouvelle demande de recommandations - Poste: {job_offer['title']}, Département: {job_offer['departmentId']}")
         
-        recommendations = recommendation_system.get_recommendations(job_offer, top_n)
+        recommendations, cache_info = recommendation_system.get_cached_recommendations(job_offer, top_n)
+        
+        # Liste vide (aucun candidat ou erreur de calcul) : les recommandations actives sont conservées
+        persisted = None
+        if persist and recommendations:
+            persisted = recommendation_system.recommendation_writer.save(job_offer_id, recommendations)
         
         return jsonify({
             'success': True,
             'recommendations': recommendations,
             'totalFound': len(recommendations),
+            'persisted': persisted,
             'algorithm_info': {
                 'version': '2.0 - Rating Priority',
                 'weights': {
@@ -679,7 +893,8 @@ def get_recommendations():
                 'filters_applied': {
                     'department_required': job_offer['departmentId'],
                     'stage_completed': True
-                }
+                },
+                'cache': cache_info
             }
         })
         
@@ -691,32 +906,264 @@ def get_recommendations():
             'recommendations': []
         }), 500
 
+@app.route('/api/recommendations/batch', methods=['POST'])
+def get_recommendations_batch():
+    """Recommandations pour plusieurs offres en un appel (body: { offers: [...], topN })"""
+    try:
+        if recommendation_system is None:
+            return jsonify({
+                'success': False,
+                'error': 'Système de recommandation non disponible',
+                'results': []
+            }), 503
+        
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('offers'), list) or not data['offers']:
+            return jsonify({'success': False, 'error': 'Liste offers manquante ou vide'}), 400
+        
+        if len(data['offers']) > BATCH_MAX_OFFERS:
+            return jsonify({
+                'success': False,
+                'error': f"Trop d'offres ({len(data['offers'])}), maximum {BATCH_MAX_OFFERS} par appel"
+            }), 400
+        
+        job_offers = [
+            {
+                'jobOfferId': offer.get('jobOfferId'),
+                'title': offer.get('title', ''),
+                'description': offer.get('description', ''),
+                'requiredSkills': offer.get('requiredSkills', ''),
+                'departmentId': offer.get('departmentId')
+            }
+            for offer in data['offers']
+        ]
+        
+        # Validation: Département obligatoire pour chaque offre
+        missing_department = [position for position, offer in enumerate(job_offers) if not offer['departmentId']]
+        if missing_department:
+            return jsonify({
+                'success': False,
+                'error': f"Le département est obligatoire pour chaque offre (positions {missing_department})"
+            }), 400
+        
+        top_n = data.get('topN', 10)
+        
+        logger.info(f"Nouvelle demande de recommandations groupées - {len(job_offers)} offres, "
+                    f"{len({offer['departmentId'] for offer in job_offers})} départements")
+        
+        recommendations_per_offer = recommendation_system.get_recommendations_batch(job_offers, top_n)
+        
+        return jsonify({
+            'success': True,
+            'results': [
+                {
+                    'jobOfferId': offer['jobOfferId'],
+                    'departmentId': offer['departmentId'],
+                    'recommendations': recommendations,
+                    'totalFound': len(recommendations)
+                }
+                for offer, recommendations in zip(job_offers, recommendations_per_offer)
+            ],
+            'totalOffers': len(job_offers),
+            'algorithm_info': {
+                'version': '2.0 - Rating Priority',
+                'weights': {
+                    'ratings': '60%',
+                    'skills': '30%', 
+                    'text_similarity': '10%'
+                },
+                'filters_applied': {
+                    'department_required': True,
+                    'stage_completed': True
+                }
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans get_recommendations_batch: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'results': []
+        }), 500
+
+# ⏳ RECOMMANDATIONS ASYNCHRONES (TÂCHES EN ARRIÈRE-PLAN)
+@app.route('/api/recommendations/jobs', methods=['POST'])
+def submit_recommendation_job():
+    """Même body que /api/recommendations ; retourne immédiatement l'identifiant de la tâche (202)"""
+    try:
+        if recommendation_system is None:
+            return jsonify({
+                'success': False,
+                'error': 'Système de recommandation non disponible'
+            }), 503
+        
+        data = request.get_json(silent=True)
+        
+        if not data:
+            return jsonify({'success': False, 'error': 'Données JSON manquantes'}), 400
+        
+        job_offer = {
+            'title': data.get('title', ''),
+            'description': data.get('description', ''),
+            'requiredSkills': data.get('requiredSkills', ''),
+            'departmentId': data.get('departmentId')
+        }
+        
+        # Validation: Département obligatoire
+        if not job_offer['departmentId']:
+            return jsonify({
+                'success': False,
+                'error': 'Le département est obligatoire pour les recommandations'
+            }), 400
+        
+        top_n = data.get('topN', 10)
+        
+        persist_job_offer_id = None
+        if data.get('persist', False):
+            try:
+                persist_job_offer_id = int(data.get('jobOfferId'))
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'error': 'Champ jobOfferId obligatoire pour enregistrer les recommandations'
+                }), 400
+        
+        try:
+            job = recommendation_system.submit_recommendation_job(job_offer, top_n, persist_job_offer_id)
+        except JobQueueFullError as e:
+            return jsonify({'success': False, 'error': str(e)}), 429
+        
+        logger.info(f"Tâche de recommandations {job.id} en file - Poste: {job_offer['title']}, "
+                    f"Département: {job_offer['departmentId']}")
+        
+        return jsonify({
+            'success': True,
+            'jobId': job.id,
+            'status': job.status,
+            'statusUrl': f'/api/recommendations/jobs/{job.id}'
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Erreur dans submit_recommendation_job: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/recommendations/jobs/<job_id>', methods=['GET'])
+def get_recommendation_job(job_id):
+    """Avancement par étape (fetch, rating, skills, text, rank) et résultat une fois la tâche terminée"""
+    try:
+        if recommendation_system is None:
+            return jsonify({
+                'success': False,
+                'error': 'Système de recommandation non disponible'
+            }), 503
+        
+        job = recommendation_system.recommendation_jobs.get(job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': f'Tâche {job_id} introuvable ou expirée'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            **job.to_dict()
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans get_recommendation_job ({job_id}): {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/recommendations/jobs/<job_id>', methods=['DELETE'])
+def cancel_recommendation_job(job_id):
+    """Annule la tâche : immédiatement si elle attend, à la fin de l'étape en cours sinon"""
+    try:
+        if recommendation_system is None:
+            return jsonify({
+                'success': False,
+                'error': 'Système de recommandation non disponible'
+            }), 503
+        
+        job = recommendation_system.recommendation_jobs.cancel(job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': f'Tâche {job_id} introuvable ou expirée'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            **job.to_dict()
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans cancel_recommendation_job ({job_id}): {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/stagiaires/<int:stagiaire_id>/matching-offers', methods=['GET'])
+def get_matching_offers(stagiaire_id):
+    """Offres ouvertes les plus adaptées à un stagiaire (?topN=10)"""
+    try:
+        if recommendation_system is None:
+            return jsonify({
+                'success': False,
+                'error': 'Système de recommandation non disponible',
+                'offers': []
+            }), 503
+        
+        top_n = request.args.get('topN', 10, type=int)
+        
+        matching_offers = recommendation_system.get_matching_offers(stagiaire_id, top_n)
+        
+        if matching_offers is None:
+            return jsonify({
+                'success': False,
+                'error': f'Stagiaire {stagiaire_id} introuvable',
+                'offers': []
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'stagiaireId': stagiaire_id,
+            'offers': matching_offers,
+            'totalFound': len(matching_offers)
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans get_matching_offers (stagiaire {stagiaire_id}): {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'offers': []
+        }), 500
+
 # 🏥 ENDPOINT DE SANTÉ
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Vérification de santé du service"""
     try:
-        # Test de connexion à la base
-        server = os.getenv('DB_SERVER', 'DESKTOP-913R9GN')
-        database = os.getenv('DB_NAME', 'PFEDb')
-        
-        connection_string = (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={server};"
-            f"DATABASE={database};"
-            f"Trusted_Connection=yes;"
-        )
-        
-        conn = pyodbc.connect(connection_string)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM Users WHERE Role = 3")
-        stagiaires_count = cursor.fetchone()[0]
+        # Test de connexion à la base (via le pool du système)
+        if recommendation_system is None:
+            raise RuntimeError('Système de recommandation non disponible')
         
-        # Test des ratings
-        cursor.execute("SELECT COUNT(*) FROM Ratings WHERE Type IN ('TuteurToStagiaire', 'RHToStagiaire')")
-        ratings_count = cursor.fetchone()[0]
+        with recommendation_system.db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM Users WHERE Role = 3")
+            stagiaires_count = cursor.fetchone()[0]
         
-        conn.close()
+            # Test des ratings
+            cursor.execute("SELECT COUNT(*) FROM Ratings WHERE Type IN ('TuteurToStagiaire', 'RHToStagiaire')")
+            ratings_count = cursor.fetchone()[0]
         
         return jsonify({
             'status': 'healthy',
@@ -726,6 +1173,16 @@ def health_check():
             'stagiaires_count': stagiaires_count,
             'ratings_count': ratings_count,
             'system_ready': recommendation_system is not None,
+            'database_pool': recommendation_system.db_pool.stats(),
+            'candidate_snapshot': recommendation_system.candidate_snapshot.stats() if recommendation_system.candidate_snapshot else None,
+            'tfidf_index': recommendation_system.tfidf_index.stats() if recommendation_system.tfidf_index else None,
+            'skill_index': recommendation_system.skill_index.stats() if recommendation_system.skill_index else None,
+            'job_offer_index': recommendation_system.job_offer_index.stats(),
+            'skill_cache': recommendation_system.skill_cache.stats(),
+            'recommendation_cache': recommendation_system.recommendation_cache.stats(),
+            'recommendation_writer': recommendation_system.recommendation_writer.stats(),
+            'recommendation_jobs': recommendation_system.recommendation_jobs.stats(),
+            'skill_families': recommendation_system.skill_families.stats(),
             'features': [
                 'Types ENUM string corrigés',
                 'Ratings prioritaires (60% du score)',
@@ -741,12 +1198,89 @@ def health_check():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+# 🔄 RAFRAÎCHISSEMENT MANUEL DU SNAPSHOT DES CANDIDATS
+@app.route('/api/candidates/refresh', methods=['POST'])
+def refresh_candidates():
+    """Force le rafraîchissement du snapshot (body optionnel: { full: true })"""
+    try:
+        if recommendation_system is None:
+            return jsonify({
+                'success': False,
+                'error': 'Système de recommandation non disponible'
+            }), 503
+        
+        if recommendation_system.candidate_snapshot is None:
+            return jsonify({
+                'success': False,
+                'error': 'Snapshot des candidats désactivé (CANDIDATE_SNAPSHOT_ENABLED=false)'
+            }), 409
+        
+        data = request.get_json(silent=True) or {}
+        snapshot_stats = recommendation_system.candidate_snapshot.refresh(full=bool(data.get('full', False)))
+        
+        return jsonify({
+            'success': True,
+            'snapshot': snapshot_stats
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur rafraîchissement snapshot: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# 📨 ÉVÉNEMENTS DU BACKEND (MISE À JOUR PONCTUELLE D'UN STAGIAIRE)
+@app.route('/api/events', methods=['POST'])
+def post_event():
+    """Événement du backend .NET (body: { type: rating_submitted | skills_changed | cv_uploaded, stagiaireId })"""
+    try:
+        if recommendation_system is None:
+            return jsonify({
+                'success': False,
+                'error': 'Système de recommandation non disponible'
+            }), 503
+        
+        data = request.get_json(silent=True) or {}
+        
+        event_type = data.get('type')
+        if event_type not in EVENT_TYPES:
+            return jsonify({
+                'success': False,
+                'error': f"Type d'événement inconnu: {event_type} (attendu: {', '.join(EVENT_TYPES)})"
+            }), 400
+        
+        try:
+            stagiaire_id = int(data.get('stagiaireId'))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Champ stagiaireId obligatoire'}), 400
+        
+        result = recommendation_system.apply_event(event_type, stagiaire_id)
+        
+        return jsonify({
+            'success': True,
+            'event': event_type,
+            **result
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur traitement événement: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 
 if __name__ == '__main__':
     print("🚀 Système de Recommandation IA v2.0 - VERSION SIMPLIFIÉE")
     print("📋 ENDPOINTS DISPONIBLES:")
     print("   POST /api/recommendations - Recommandations intelligentes")
+    print("   POST /api/recommendations/batch - Recommandations pour plusieurs offres")
+    print("   POST /api/recommendations/jobs - Recommandations en arrière-plan (GET/DELETE /api/recommendations/jobs/<id>)")
+    print("   GET  /api/stagiaires/<id>/matching-offers - Offres adaptées à un stagiaire")
     print("   GET  /api/health - Vérification de santé")
+    print("   POST /api/candidates/refresh - Rafraîchissement du snapshot des candidats")
+    print("   POST /api/events - Événements du backend (rating, compétences, CV)")
     print(f"\n⚙️ Configuration: {os.getenv('DB_SERVER', 'DESKTOP-913R9GN')} / {os.getenv('DB_NAME', 'PFEDb')}")
     print("🔧 PRÊT POUR ANGULAR - Utilisez http://localhost:5000/api/recommendations")
     print("\n🎯 POUR VOTRE SERVICE ANGULAR:")
@@ -754,5 +1288,6 @@ if __name__ == '__main__':
     print("   - Méthode: POST")
     print("   - Body: { title, description, requiredSkills, departmentId }")
     print("   - departmentId OBLIGATOIRE !")
+    print("   - { jobOfferId, persist: true } : liste enregistrée dans JobOfferRecommendations")
 
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,100 @@
+"""
+Rappel de l'index ANN (IVF) face au score exact de tous les candidats.
+
+    python benchmark_ann.py --candidates 200000 --departments 8 --nprobe 4 8 16 32
+    python benchmark_ann.py --store-path embedding_store   # vecteurs réels du store
+
+Pour chaque nprobe : rappel@K moyen (part des K voisins exacts retrouvés) et temps de recherche.
+"""
+import os
+import time
+import shutil
+import tempfile
+import argparse
+
+import numpy as np
+
+from ann_index import SemanticAnnIndex
+from embedding_store import EmbeddingStore, normalize_rows
+
+DEFAULT_DIMENSION = 384  # paraphrase-multilingual-MiniLM-L12-v2
+DEFAULT_NPROBES = [4, 8, 16, 32]
+
+
+def synthetic_vectors(count, dimension, clusters, seed=0):
+    """Vecteurs normalisés groupés autour de `clusters` thèmes (profils proches d'une même filière)"""
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(rng.normal(size=(clusters, dimension)))
+    labels = rng.integers(clusters, size=count)
+    noise = rng.normal(scale=1.0 / np.sqrt(dimension), size=(count, dimension)).astype(np.float32)
+    return normalize_rows(centers[labels] + noise)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--candidates', type=int, default=100000)
+    parser.add_argument('--dimension', type=int, default=DEFAULT_DIMENSION)
+    parser.add_argument('--departments', type=int, default=8)
+    parser.add_argument('--clusters', type=int, default=1024, help='thèmes des vecteurs synthétiques')
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--top-k', type=int, default=100)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=DEFAULT_NPROBES)
+    parser.add_argument('--store-path', help='répertoire EMBEDDING_STORE_PATH à évaluer')
+    parser.add_argument('--model', default='paraphrase-multilingual-MiniLM-L12-v2')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+
+    if args.store_path:
+        store = EmbeddingStore(args.model, args.store_path)
+        ids, rows = store.entries()
+        print(f"Store {store.directory}: {len(ids)} vecteurs")
+    else:
+        vectors = synthetic_vectors(args.candidates, args.dimension, clusters=args.clusters)
+        store = EmbeddingStore('benchmark', tempfile.mkdtemp(prefix='ann-benchmark-'))
+        ids = list(range(len(vectors)))
+        # Textes = identifiants : l'encodage "lit" simplement les vecteurs synthétiques
+        rows = store.ensure(ids, [str(i) for i in ids], lambda texts: vectors[[int(t) for t in texts]])
+        print(f"{len(ids)} vecteurs synthétiques ({args.dimension} dimensions) dans {store.directory}")
+
+    departments = rng.integers(args.departments, size=len(ids)).tolist()
+    all_vectors = store.vectors(rows)
+    queries = normalize_rows(all_vectors[rng.choice(len(ids), args.queries, replace=False)]
+                             + rng.normal(scale=0.3 / np.sqrt(all_vectors.shape[1]),
+                                          size=(args.queries, all_vectors.shape[1])).astype(np.float32))
+
+    start = time.perf_counter()
+    index = SemanticAnnIndex(store, top_k=args.top_k)
+    index.sync(ids, rows, departments, [str(i) for i in ids])
+    print(f"Construction de l'index : {time.perf_counter() - start:.1f}s, {index.stats()['lists']} listes\n")
+
+    # Référence exacte : produit matrice-vecteur sur tous les candidats
+    ids_array = np.array(ids)
+    start = time.perf_counter()
+    exact = [set(ids_array[np.argsort(-(all_vectors @ query))[:args.top_k]].tolist()) for query in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    # Passe de chauffe : copies contiguës des listes construites hors mesure
+    index.nprobe = max(args.nprobe)
+    for query in queries:
+        index.search(query)
+
+    print(f"{'nprobe':>6} {'rappel@' + str(args.top_k):>11} {'ms/requête':>11} {'exact (ms)':>11}")
+    for nprobe in args.nprobe:
+        index.nprobe = nprobe
+        recalls = []
+        start = time.perf_counter()
+        for query, expected in zip(queries, exact):
+            found, _ = index.search(query)
+            recalls.append(len(expected.intersection(found.tolist())) / len(expected))
+        ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        print(f"{nprobe:>6} {np.mean(recalls):>11.3f} {ann_ms:>11.2f} {exact_ms:>11.2f}")
+
+    if not args.store_path:
+        directory = os.path.dirname(store.directory)
+        del index, store
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
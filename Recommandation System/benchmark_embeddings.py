@@ -0,0 +1,76 @@
+"""
+Débit d'encodage du modèle sémantique selon la taille des lots (CPU).
+
+    python benchmark_embeddings.py --texts 2000 --batch-sizes 1 8 16 32 64 128
+
+Le résultat sert à choisir EMBEDDING_BATCH_SIZE pour app.py.
+"""
+import time
+import random
+import argparse
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+DEFAULT_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+DEFAULT_BATCH_SIZES = [1, 8, 16, 32, 64, 128]
+
+# Vocabulaire des profils synthétiques (proche des champs Skills / CV_ExtractedSkills)
+SAMPLE_SKILLS = [
+    'python', 'java', 'javascript', 'typescript', 'react', 'angular', 'vue', 'node', 'django',
+    'flask', 'spring', 'php', 'sql', 'mongodb', 'docker', 'kubernetes', 'aws', 'azure', 'git',
+    'figma', 'photoshop', 'machine learning', 'data analysis', 'développement web',
+    'gestion de projet', 'communication', 'marketing digital', 'comptabilité'
+]
+
+
+def sample_texts(count, seed=42):
+    rng = random.Random(seed)
+    return [
+        ', '.join(rng.sample(SAMPLE_SKILLS, rng.randint(3, 12)))
+        for _ in range(count)
+    ]
+
+
+def benchmark(model, texts, batch_size, repeats):
+    """Meilleur temps sur `repeats` passes (secondes) et débit correspondant (textes/s)"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.encode(texts, batch_size=batch_size, normalize_embeddings=True,
+                     convert_to_numpy=True, show_progress_bar=False)
+        best = min(best, time.perf_counter() - start)
+    return best, len(texts) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--texts', type=int, default=1000, help='nombre de profils encodés par passe')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Chargement du modèle {args.model} (CPU)...")
+    model = SentenceTransformer(args.model, device='cpu')
+    texts = sample_texts(args.texts)
+
+    # Passe de chauffe : initialisation des noyaux hors mesure
+    model.encode(texts[:32], batch_size=32, show_progress_bar=False)
+
+    # Gain relatif à la première taille de lot (1 = un appel au modèle par texte, ancien fonctionnement)
+    print(f"\n{'batch_size':>10} {'temps (s)':>10} {'textes/s':>10} {'gain':>7}")
+    baseline = None
+    for batch_size in args.batch_sizes:
+        seconds, throughput = benchmark(model, texts, batch_size, args.repeats)
+        baseline = baseline or throughput
+        print(f"{batch_size:>10} {seconds:>10.2f} {throughput:>10.1f} {throughput / baseline:>6.1f}x")
+
+    # Contrôle : les vecteurs ne dépendent pas de la taille des lots
+    reference = model.encode(texts[:64], batch_size=1, normalize_embeddings=True, show_progress_bar=False)
+    batched = model.encode(texts[:64], batch_size=64, normalize_embeddings=True, show_progress_bar=False)
+    print(f"\nÉcart max lot=1 / lot=64 : {np.abs(reference - batched).max():.2e}")
+
+
+if __name__ == '__main__':
+    main()
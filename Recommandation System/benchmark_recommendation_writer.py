@@ -0,0 +1,93 @@
+"""
+Durée d'enregistrement d'une liste classée dans JobOfferRecommendations (objectif : 10 000 lignes en moins d'une seconde).
+
+    python benchmark_recommendation_writer.py --job-offer-id 12 --rows 10000 --repeat 5
+    python benchmark_recommendation_writer.py --job-offer-id 12 --batch-size 500 2000 5000
+
+Mêmes requêtes que RecommendationWriter.save (désactivation puis insertion groupée fast_executemany)
+sur la base DB_SERVER / DB_NAME, dans une transaction annulée à chaque mesure : la table n'est pas modifiée.
+L'offre doit exister (clé étrangère JobOfferId).
+"""
+import time
+import random
+import argparse
+from datetime import datetime, timezone
+
+from db_pool import ConnectionPool, connection_string_from_env
+from recommendation_writer import RecommendationWriter, recommendation_rows
+
+TARGET_SECONDS = 1.0
+
+
+def synthetic_recommendations(count, stagiaire_ids, seed=0):
+    """Recommandations au format de /api/recommendations (scores et textes de longueur réaliste)"""
+    rng = random.Random(seed)
+    recommendations = []
+    for position in range(count):
+        recommendations.append({
+            'stagiaireId': stagiaire_ids[position % len(stagiaire_ids)],
+            'email': f"stagiaire{position}@example.com",
+            'name': f"Stagiaire {position}",
+            'skills': ', '.join(rng.sample(['python', 'sql', 'react', 'java', 'docker', 'angular', 'c#', 'azure'], 5)),
+            'department': 'Informatique',
+            'university': 'Université de test',
+            'compositeScore': rng.random(),
+            'skillSimilarity': rng.random(),
+            'textSimilarity': rng.random(),
+            'departmentMatch': True,
+            'matchReasons': ['Excellentes évaluations', 'Compétences techniques alignées']
+        })
+    return recommendations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--job-offer-id', type=int, required=True)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1000])
+    args = parser.parse_args()
+
+    pool = ConnectionPool(connection_string_from_env(), max_size=1)
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT TOP 1000 Id FROM Users WHERE Role = 3 ORDER BY Id")
+        stagiaire_ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    if not stagiaire_ids:
+        raise SystemExit("Aucun stagiaire (Role = 3) : clé étrangère StagiaireId impossible à satisfaire")
+
+    generated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = recommendation_rows(args.job_offer_id, synthetic_recommendations(args.rows, stagiaire_ids), generated_at)
+    print(f"{len(rows)} lignes pour l'offre {args.job_offer_id} ({len(stagiaire_ids)} stagiaires distincts)\n")
+
+    print(f"{'lot':>6} {'médiane (s)':>12} {'min (s)':>9} {'lignes/s':>10} {'objectif':>9}")
+    for batch_size in args.batch_size:
+        writer = RecommendationWriter(pool, batch_size=batch_size)
+        durations = []
+        for _ in range(args.repeat):
+            with pool.connection() as conn:
+                started = time.perf_counter()
+                writer.execute(conn, args.job_offer_id, rows, generated_at)
+                durations.append(time.perf_counter() - started)
+
+                # Relecture dans la transaction : scores decimal(5,4) transmis sans perte
+                cursor = conn.cursor()
+                cursor.execute("SELECT TOP 1 CompositeScore FROM JobOfferRecommendations "
+                               "WHERE JobOfferId = ? AND IsActive = 1 AND RecommendationRank = 1", args.job_offer_id)
+                stored = cursor.fetchone()[0]
+                cursor.close()
+                if stored != rows[0][7]:
+                    print(f"   CompositeScore relu {stored} au lieu de {rows[0][7]}")
+                conn.rollback()
+
+        durations.sort()
+        median = durations[len(durations) // 2]
+        print(f"{batch_size:>6} {median:>12.3f} {durations[0]:>9.3f} {len(rows) / median:>10.0f} "
+              f"{'OK' if median < TARGET_SECONDS else 'DÉPASSÉ':>9}")
+
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
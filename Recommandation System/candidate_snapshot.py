@@ -0,0 +1,445 @@
+import os
+import time
+import threading
+import logging
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Durée (secondes) pendant laquelle le snapshot est servi sans revérifier le watermark
+DEFAULT_MAX_STALENESS = 30
+
+# Versions dont les stagiaires modifiés sont mémorisés (mise à jour des index ligne par ligne)
+CHANGELOG_SIZE = 256
+
+# Watermark global : un changement de départements/universités ou une suppression
+# de rating (compteur incohérent) force un rechargement complet
+WATERMARK_QUERY = """
+SELECT
+    (SELECT MAX(CreatedAt) FROM Ratings) AS RatingsMaxCreatedAt,
+    (SELECT MAX(UpdatedAt) FROM Ratings) AS RatingsMaxUpdatedAt,
+    (SELECT COUNT(*) FROM Ratings) AS RatingsCount,
+    (SELECT CHECKSUM_AGG(BINARY_CHECKSUM(Id, DepartmentName)) FROM Departments) AS DepartmentsChecksum,
+    (SELECT CHECKSUM_AGG(BINARY_CHECKSUM(Id, Universityname)) FROM Universities) AS UniversitiesChecksum
+"""
+
+# Empreinte par stagiaire (Users n'a pas de colonne UpdatedAt)
+USERS_CHECKSUM_QUERY = """
+SELECT
+    Id,
+    BINARY_CHECKSUM(FirstName, LastName, Email, Skills, CvUrl, StartDate, EndDate,
+                    DepartmentId, statuts, stage, etudiant, UniversityId, CvUploadedAt) AS RowChecksum
+FROM Users
+WHERE Role = 3
+"""
+
+# Ratings créés ou modifiés depuis le dernier watermark (>= : tolère les égalités d'horodatage)
+CHANGED_RATINGS_QUERY = """
+SELECT Id, EvaluatedUserId, CreatedAt, UpdatedAt
+FROM Ratings
+WHERE CreatedAt >= ? OR UpdatedAt >= ?
+"""
+
+# Même empreinte et mêmes ratings, pour un seul stagiaire (événement du backend)
+STAGIAIRE_CHECKSUM_QUERY = USERS_CHECKSUM_QUERY + "AND Id = ?\n"
+STAGIAIRE_CHANGED_RATINGS_QUERY = """
+SELECT Id, EvaluatedUserId, CreatedAt, UpdatedAt
+FROM Ratings
+WHERE EvaluatedUserId = ? AND (CreatedAt >= ? OR UpdatedAt >= ?)
+"""
+
+
+class SnapshotView:
+    """
+    État publié du snapshot, jamais modifié : DataFrame de base, étiquettes de ses lignes, version et
+    lignes remplacées depuis (Id -> DataFrame d'une ligne, None si le stagiaire a disparu).
+
+    Un événement publie une nouvelle vue qui partage le DataFrame de base et n'ajoute qu'une entrée
+    aux remplacements : coût indépendant du nombre de candidats. Les remplacements sont intégrés
+    au DataFrame de base au rafraîchissement suivant.
+    """
+
+    def __init__(self, df=None, labels=None, version=0, overrides=None):
+        self.df = df
+        self.labels = labels or {}
+        self.version = version
+        self.overrides = overrides or {}
+        self._frame = None
+
+    @property
+    def loaded(self):
+        return self.df is not None
+
+    @property
+    def size(self):
+        if self.df is None:
+            return 0
+        size = len(self.df)
+        for stagiaire_id, row in self.overrides.items():
+            if stagiaire_id in self.labels:
+                size -= row is None
+            else:
+                size += row is not None
+        return size
+
+    @property
+    def frame(self):
+        """DataFrame complet (remplacements appliqués), construit une fois par vue à la première lecture"""
+        if self._frame is None:
+            self._frame = self._merge(self.df)
+        return self._frame
+
+    def filtered(self, select):
+        """
+        select(df) -> sous-ensemble, appliqué au DataFrame de base puis aux seules lignes remplacées :
+        la vue complète n'est pas reconstruite pour une requête filtrée
+        """
+        if self.df is None or not self.overrides:
+            return select(self.df) if self.df is not None else self.df
+        return self._merge(select(self.df), select)
+
+    def row(self, stagiaire_id):
+        """Ligne courante d'un stagiaire (Series) ou None"""
+        if stagiaire_id in self.overrides:
+            row = self.overrides[stagiaire_id]
+            return None if row is None else row.iloc[0]
+        label = self.labels.get(stagiaire_id)
+        return None if label is None else self.df.loc[label].copy()
+
+    def rows(self, stagiaire_ids):
+        """Lignes de ces stagiaires (absents ignorés) sans parcourir le snapshot"""
+        base = [self.labels[i] for i in stagiaire_ids if i not in self.overrides and i in self.labels]
+        replaced = [self.overrides[i] for i in stagiaire_ids if self.overrides.get(i) is not None]
+        rows = self.df.loc[base]
+        return pd.concat([rows] + replaced).sort_index() if replaced else rows
+
+    def label(self, stagiaire_id):
+        """Étiquette de ligne du stagiaire (base ou remplacement), None s'il n'en a pas encore"""
+        if stagiaire_id in self.labels:
+            return self.labels[stagiaire_id]
+        row = self.overrides.get(stagiaire_id)
+        return None if row is None else row.index[0]
+
+    def with_override(self, stagiaire_id, row, label):
+        """Nouvelle vue (version + 1) où `row` (DataFrame d'une ligne ou None) remplace le stagiaire"""
+        if row is not None:
+            row = row.copy()
+            # Même étiquette que la ligne remplacée : la position dans le snapshot est conservée
+            row.index = [label]
+        overrides = dict(self.overrides)
+        overrides[stagiaire_id] = row
+        return SnapshotView(self.df, self.labels, self.version + 1, overrides)
+
+    def _merge(self, df, select=None):
+        if not self.overrides:
+            return df
+        kept = df[~df['Id'].isin(list(self.overrides))] if len(df) else df
+        replaced = [row for row in self.overrides.values() if row is not None]
+        if select is not None:
+            replaced = [selected for selected in (select(row) for row in replaced) if not selected.empty]
+        return pd.concat([kept] + replaced).sort_index() if replaced else kept
+
+
+class CandidateSnapshot:
+    """Snapshot mémoire des stagiaires (avec ratings) rafraîchi de façon incrémentale"""
+
+    def __init__(self, db_pool, loader, max_staleness=None):
+        """
+        db_pool : pool de connexions (lecture des watermarks)
+        loader  : loader(stagiaire_ids=None) -> DataFrame des stagiaires enrichis
+        """
+        self.db_pool = db_pool
+        self.loader = loader
+        if max_staleness is None:
+            max_staleness = float(os.getenv('CANDIDATE_SNAPSHOT_MAX_STALENESS', DEFAULT_MAX_STALENESS))
+        self.max_staleness = max_staleness
+
+        # SnapshotView publiée par une seule affectation : un lecteur ne voit jamais un DataFrame
+        # avec les étiquettes, la version ou les remplacements d'un autre
+        self._state = SnapshotView()
+        self._next_label = 0        # étiquette libre pour un stagiaire ajouté par événement
+        self._changes = deque(maxlen=CHANGELOG_SIZE)   # (version, Ids modifiés ou None si rechargement complet)
+        self._watermark = None
+        self._row_checksums = {}
+        self._seen_ratings = set()
+        self._checked_at = 0.0
+        self._loaded_at = None
+        self._last_refresh = {}
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Incrémenté à chaque changement effectif du snapshot"""
+        return self._state.version
+
+    @property
+    def _df(self):
+        return self._state.df
+
+    def get(self):
+        """Retourne le snapshot courant, revérifié si plus vieux que max_staleness"""
+        return self.view().frame
+
+    def view(self):
+        """
+        Vue courante (SnapshotView), revérifiée si plus vieille que max_staleness : DataFrame, version et
+        lignes remplacées lus ensemble, un index construit sur cette vue porte sa version
+        """
+        if self._df is None or time.monotonic() - self._checked_at > self.max_staleness:
+            try:
+                self.refresh(only_if_stale=True)
+            except Exception as e:
+                if self._df is None:
+                    raise
+                logger.error(f"Erreur rafraîchissement snapshot, données précédentes conservées: {e}")
+        return self._state
+
+    def refresh(self, full=False, only_if_stale=False):
+        """Rafraîchit le snapshot (incrémental par défaut) et retourne les stats"""
+        with self._refresh_lock:
+            # Un autre thread vient peut-être de rafraîchir pendant l'attente du verrou
+            if only_if_stale and self._df is not None and time.monotonic() - self._checked_at <= self.max_staleness:
+                return self.stats()
+
+            start = time.monotonic()
+            conn = self.db_pool.acquire()
+            try:
+                watermark = self._read_watermark(conn)
+                row_checksums = self._read_row_checksums(conn)
+                changed_ratings = None
+                if not full and self._can_refresh_incrementally(watermark):
+                    changed_ratings = self._read_changed_ratings(conn)
+            finally:
+                conn.close()
+
+            if changed_ratings is None or not self._ratings_consistent(watermark, changed_ratings):
+                mode, changed, removed = self._full_load()
+                changed_ratings = self._read_boundary_ratings(watermark)
+            else:
+                self._fold()
+                mode, changed, removed = self._incremental_load(row_checksums, changed_ratings)
+
+            self._seen_ratings = self._rating_keys(changed_ratings)
+            self._watermark = watermark
+            self._row_checksums = row_checksums
+            self._checked_at = time.monotonic()
+            self._last_refresh = {
+                'mode': mode,
+                'changed': changed,
+                'removed': removed,
+                'duration_ms': round((time.monotonic() - start) * 1000, 1),
+                'at': datetime.now().isoformat()
+            }
+            logger.info(f"Snapshot stagiaires: {mode} ({changed} modifiés, {removed} supprimés)")
+            return self.stats()
+
+    def apply_update(self, stagiaire_id):
+        """
+        Recharge un seul stagiaire (rating soumis, compétences modifiées, CV déposé) sans attendre le watermark.
+        La ligne est publiée comme remplacement dans une nouvelle SnapshotView (le DataFrame de base n'est
+        ni copié ni modifié : coût indépendant du nombre de candidats) ; son empreinte et ses ratings sont
+        mémorisés pour que le rafraîchissement suivant ne la recharge pas une seconde fois.
+        Retourne (ancienne ligne, nouvelle ligne), None pour une ligne absente ; None si le snapshot n'est pas chargé.
+        """
+        stagiaire_id = int(stagiaire_id)
+        with self._refresh_lock:
+            if self._df is None:
+                return None
+
+            conn = self.db_pool.acquire()
+            try:
+                checksum = self._read_row_checksum(conn, stagiaire_id)
+                ratings = self._read_stagiaire_ratings(conn, stagiaire_id)
+            finally:
+                conn.close()
+
+            loaded = self.loader([stagiaire_id]) if checksum is not None else pd.DataFrame()
+            if checksum is not None and 'Id' not in loaded.columns:
+                raise RuntimeError(f"Chargement du stagiaire {stagiaire_id} échoué")
+
+            view = self._state
+            previous = view.row(stagiaire_id)
+            current = None if loaded.empty else loaded.iloc[0]
+
+            if current is not None or previous is not None:
+                label = view.label(stagiaire_id)
+                if label is None:
+                    # Nouveau stagiaire : étiquette après la dernière ligne du snapshot
+                    label, self._next_label = self._next_label, self._next_label + 1
+                self._changes.append((view.version + 1, {stagiaire_id}))
+                self._state = view.with_override(stagiaire_id, None if current is None else loaded.iloc[[0]], label)
+
+            if checksum is None:
+                self._row_checksums.pop(stagiaire_id, None)
+            else:
+                self._row_checksums[stagiaire_id] = checksum
+            self._seen_ratings |= self._rating_keys(ratings)
+
+            logger.info(f"Snapshot stagiaires: stagiaire {stagiaire_id} rechargé (version {self.version})")
+            return previous, current
+
+    def changes_since(self, version, until=None):
+        """
+        Ids modifiés ou supprimés entre `version` (exclue) et `until` (incluse, version courante par défaut),
+        None si un rechargement complet a eu lieu entre-temps ou si l'historique ne remonte pas assez loin.
+        """
+        until = self.version if until is None else until
+        if version is None:
+            return None
+
+        changed = set()
+        entries = [entry for entry in list(self._changes) if version < entry[0] <= until]
+        if len(entries) != until - version:
+            return None
+        for _, ids in entries:
+            if ids is None:
+                return None
+            changed |= ids
+        return changed
+
+    def rows(self, stagiaire_ids):
+        """Lignes courantes de ces stagiaires (absents ignorés) sans parcourir le snapshot"""
+        return self._state.rows(stagiaire_ids)
+
+    def stats(self):
+        view = self._state
+        return {
+            'version': view.version,
+            'size': view.size,
+            'overrides': len(view.overrides),
+            'loaded_at': self._loaded_at,
+            'age_seconds': round(time.monotonic() - self._checked_at, 1) if view.loaded else None,
+            'max_staleness': self.max_staleness,
+            'last_refresh': self._last_refresh
+        }
+
+    def _full_load(self):
+        df = self.loader()
+        if 'Id' not in df.columns and self._df is not None:
+            raise RuntimeError("Chargement complet des stagiaires échoué")
+        self._publish(df)
+        return 'full', len(df), 0
+
+    def _incremental_load(self, row_checksums, changed_ratings):
+        current_ids = set(row_checksums)
+        removed_ids = set(self._row_checksums) - current_ids
+        changed_ids = {
+            stagiaire_id for stagiaire_id, checksum in row_checksums.items()
+            if self._row_checksums.get(stagiaire_id) != checksum
+        }
+        # Les ratings à la frontière du watermark déjà vus au passage précédent sont ignorés
+        new_ratings = [
+            evaluated_id for key, evaluated_id in zip(self._rating_keys_list(changed_ratings),
+                                                      changed_ratings['EvaluatedUserId'])
+            if key not in self._seen_ratings and pd.notna(evaluated_id)
+        ]
+        changed_ids |= {int(i) for i in new_ratings} & current_ids
+
+        if not changed_ids and not removed_ids:
+            return 'unchanged', 0, 0
+
+        df = self._df[~self._df['Id'].isin(changed_ids | removed_ids)]
+        if changed_ids:
+            changed_df = self.loader(sorted(changed_ids))
+            if 'Id' not in changed_df.columns:
+                raise RuntimeError("Chargement incrémental des stagiaires échoué")
+            df = pd.concat([df, changed_df], ignore_index=True)
+
+        self._publish(df.sort_values('Id', kind='stable').reset_index(drop=True), changed_ids | removed_ids)
+        return 'incremental', len(changed_ids), len(removed_ids)
+
+    def _publish(self, df, changed_ids=None):
+        # Remplacement atomique : les lecteurs gardent leur référence à l'ancienne vue
+        version = self.version + 1
+        self._changes.append((version, changed_ids))
+        self._set_base(df, version)
+        self._loaded_at = datetime.now().isoformat()
+
+    def _fold(self):
+        """Remplacements des événements intégrés au DataFrame de base (même contenu, même version)"""
+        view = self._state
+        if view.overrides:
+            self._set_base(view.frame, view.version)
+
+    def _set_base(self, df, version):
+        labels = dict(zip(df['Id'].astype(int).tolist(), df.index.tolist())) if 'Id' in df.columns else {}
+        self._next_label = int(df.index.max()) + 1 if len(df) else 0
+        self._state = SnapshotView(df, labels, version)
+
+    def _can_refresh_incrementally(self, watermark):
+        previous = self._watermark
+        if self._df is None or previous is None:
+            return False
+        return (previous['DepartmentsChecksum'] == watermark['DepartmentsChecksum']
+                and previous['UniversitiesChecksum'] == watermark['UniversitiesChecksum'])
+
+    def _ratings_consistent(self, watermark, changed_ratings):
+        # Sans suppression, le compteur n'augmente que des ratings strictement plus récents
+        previous_max = self._watermark['RatingsMaxCreatedAt']
+        new_count = 0
+        if previous_max is not None and not changed_ratings.empty:
+            created_since = pd.to_datetime(changed_ratings['CreatedAt'])
+            new_count = int((created_since > pd.Timestamp(previous_max)).sum())
+        return watermark['RatingsCount'] == self._watermark['RatingsCount'] + new_count
+
+    @staticmethod
+    def _rating_keys_list(ratings):
+        if ratings is None or ratings.empty:
+            return []
+        return list(zip(ratings['Id'], pd.to_datetime(ratings['CreatedAt']), pd.to_datetime(ratings['UpdatedAt'])))
+
+    def _rating_keys(self, ratings):
+        return set(self._rating_keys_list(ratings))
+
+    def _read_boundary_ratings(self, watermark):
+        # Après un rechargement complet : ratings à la frontière du nouveau watermark
+        if watermark['RatingsMaxCreatedAt'] is None:
+            return None
+        conn = self.db_pool.acquire()
+        try:
+            since_updated = watermark['RatingsMaxUpdatedAt'] or watermark['RatingsMaxCreatedAt']
+            return pd.read_sql(CHANGED_RATINGS_QUERY, conn,
+                               params=[watermark['RatingsMaxCreatedAt'], since_updated])
+        finally:
+            conn.close()
+
+    def _read_watermark(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(WATERMARK_QUERY)
+        row = cursor.fetchone()
+        columns = [column[0] for column in cursor.description]
+        cursor.close()
+        return dict(zip(columns, row))
+
+    def _read_row_checksums(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(USERS_CHECKSUM_QUERY)
+        checksums = {int(row[0]): row[1] for row in cursor.fetchall()}
+        cursor.close()
+        return checksums
+
+    def _read_row_checksum(self, conn, stagiaire_id):
+        cursor = conn.cursor()
+        cursor.execute(STAGIAIRE_CHECKSUM_QUERY, stagiaire_id)
+        row = cursor.fetchone()
+        cursor.close()
+        return None if row is None else row[1]
+
+    def _read_stagiaire_ratings(self, conn, stagiaire_id):
+        # Ratings de ce stagiaire que le prochain rafraîchissement incrémental verra
+        if self._watermark is None or self._watermark['RatingsMaxCreatedAt'] is None:
+            return None
+        since_created = self._watermark['RatingsMaxCreatedAt']
+        since_updated = self._watermark['RatingsMaxUpdatedAt'] or since_created
+        return pd.read_sql(STAGIAIRE_CHANGED_RATINGS_QUERY, conn, params=[stagiaire_id, since_created, since_updated])
+
+    def _read_changed_ratings(self, conn):
+        since_created = self._watermark['RatingsMaxCreatedAt']
+        if since_created is None:
+            # Aucun rating au dernier passage : le compteur suffit à détecter les ajouts
+            return pd.DataFrame(columns=['Id', 'EvaluatedUserId', 'CreatedAt', 'UpdatedAt'])
+        since_updated = self._watermark['RatingsMaxUpdatedAt'] or since_created
+        return pd.read_sql(CHANGED_RATINGS_QUERY, conn, params=[since_created, since_updated])
@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import atexit
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (surchargées par CV_CACHE_PATH / CV_CACHE_MAX_BYTES)
+DEFAULT_CV_CACHE_PATH = 'cv_cache'
+DEFAULT_CV_CACHE_MAX_BYTES = 500 * 1024 * 1024   # 0 : cache désactivé
+
+INDEX_FILE = 'index.json'
+OBJECTS_DIR = 'objects'
+# Nombre de modifications de l'index avant une sauvegarde intermédiaire
+SAVE_EVERY_CHANGES = 20
+
+
+def content_sha256(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+class CVCache:
+    """
+    Cache disque des CVs téléchargés, indexé par CvUrl.
+
+    Les fichiers sont stockés sous leur SHA-256 (objects/ab/abcdef...) : deux URLs servant le même
+    fichier partagent une copie. L'index (index.json) garde pour chaque URL l'empreinte, le type de
+    contenu et les validateurs HTTP (ETag, Last-Modified) envoyés en If-None-Match / If-Modified-Since :
+    un CV inchangé coûte une réponse 304 au lieu d'un téléchargement. Taille totale bornée, éviction LRU.
+    """
+
+    def __init__(self, path=DEFAULT_CV_CACHE_PATH, max_bytes=DEFAULT_CV_CACHE_MAX_BYTES):
+        self.directory = path
+        self.max_bytes = max(0, int(max_bytes))
+
+        self._entries = OrderedDict()   # URL -> métadonnées, de la moins à la plus récemment utilisée
+        self._blobs = {}                # empreinte -> (taille, nombre d'URLs)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._unsaved = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._uncacheable = 0
+        self._changed = 0
+        self._evictions = 0
+
+        if self.enabled:
+            os.makedirs(os.path.join(self.directory, OBJECTS_DIR), exist_ok=True)
+            self._load()
+            atexit.register(self.save)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            path=os.getenv('CV_CACHE_PATH') or DEFAULT_CV_CACHE_PATH,
+            max_bytes=int(os.getenv('CV_CACHE_MAX_BYTES', DEFAULT_CV_CACHE_MAX_BYTES))
+        )
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def validators(self, url):
+        """En-têtes de requête conditionnelle pour une URL en cache ({} sinon)"""
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def get(self, url):
+        """(contenu, type de contenu) après une réponse 304, ou None si le fichier n'est plus disponible"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            self._entries.move_to_end(url)
+            entry['last_used'] = time.time()
+            self._unsaved += 1
+
+        try:
+            with open(self._blob_path(entry['sha256']), 'rb') as f:
+                content = f.read()
+        except OSError:
+            content = None
+
+        # Fichier supprimé ou altéré : entrée retirée, le CV sera retéléchargé
+        if content is None or content_sha256(content) != entry['sha256']:
+            with self._lock:
+                if self._entries.get(url) is entry:
+                    self._remove(url)
+            return None
+
+        return content, entry.get('content_type', '')
+
+    def put(self, url, content, content_type='', etag=None, last_modified=None):
+        """
+        Enregistre un téléchargement complet (réponse 200). Sans ETag ni Last-Modified, la réponse
+        ne pourrait pas être revalidée : rien n'est conservé.
+        """
+        with self._lock:
+            previous = self._entries.get(url)
+
+        if (not etag and not last_modified) or len(content) > self.max_bytes:
+            with self._lock:
+                self._uncacheable += 1
+                if url in self._entries:
+                    self._remove(url)
+            return
+
+        sha256 = content_sha256(content)
+        if previous is not None and previous['sha256'] != sha256:
+            with self._lock:
+                self._changed += 1
+
+        blob_path = self._blob_path(sha256)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, blob_path)
+
+        with self._lock:
+            if url in self._entries:
+                self._remove(url, delete_blob=self._entries[url]['sha256'] != sha256)
+            self._add(url, {
+                'sha256': sha256,
+                'size': len(content),
+                'content_type': content_type,
+                'etag': etag,
+                'last_modified': last_modified,
+                'last_used': time.time()
+            })
+            self._evict()
+            should_save = self._unsaved >= SAVE_EVERY_CHANGES
+
+        if should_save:
+            self.save()
+
+    def count_lookup(self, hit):
+        """
+        Une consultation par CV demandé (appelé par CVFetcher une fois le téléchargement terminé) :
+        succès si le CV a été servi depuis le disque (304), échec sinon, téléchargement échoué compris
+        """
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'files': len(self._blobs),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'uncacheable': self._uncacheable,
+                'changed': self._changed,
+                'evictions': self._evictions,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0
+            }
+
+    def save(self):
+        """Écrit l'index sur disque (écriture atomique)"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            payload = {'entries': [[url, entry] for url, entry in self._entries.items()]}
+            self._unsaved = 0
+
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"Sauvegarde de l'index du cache de CVs impossible ({self.index_path}): {e}")
+
+    def _blob_path(self, sha256):
+        return os.path.join(self.directory, OBJECTS_DIR, sha256[:2], sha256)
+
+    def _add(self, url, entry):
+        self._entries[url] = entry
+        size, references = self._blobs.get(entry['sha256'], (entry['size'], 0))
+        if references == 0:
+            self._bytes += size
+        self._blobs[entry['sha256']] = (size, references + 1)
+        self._unsaved += 1
+
+    def _remove(self, url, delete_blob=True):
+        entry = self._entries.pop(url)
+        size, references = self._blobs[entry['sha256']]
+        if references > 1:
+            self._blobs[entry['sha256']] = (size, references - 1)
+        else:
+            del self._blobs[entry['sha256']]
+            self._bytes -= size
+            if delete_blob:
+                self._delete_blob(entry['sha256'])
+        self._unsaved += 1
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    def _delete_blob(self, sha256):
+        _unlink(self._blob_path(sha256))
+
+    def _load(self):
+        entries = []
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f).get('entries', [])
+            except (OSError, ValueError) as e:
+                logger.warning(f"Index du cache de CVs illisible ({self.index_path}), ignoré: {e}")
+
+        # Entrées dont le fichier a disparu ignorées
+        for url, entry in entries:
+            if os.path.exists(self._blob_path(entry['sha256'])):
+                self._add(url, entry)
+        self._evict()
+
+        # Fichiers sans entrée (arrêt avant la sauvegarde de l'index, éviction) supprimés
+        objects_dir = os.path.join(self.directory, OBJECTS_DIR)
+        for prefix in os.listdir(objects_dir):
+            prefix_dir = os.path.join(objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if name not in self._blobs:
+                    _unlink(os.path.join(prefix_dir, name))
+
+        self._unsaved = 0
+        if self._entries:
+            logger.info(f"Cache de CVs chargé: {len(self._entries)} URLs, {self._bytes} octets ({self.directory})")
+
+
+def _unlink(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,295 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cv_cache import CVCache
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (surchargées par CV_FETCH_WORKERS / CV_FETCH_PER_HOST / CV_FETCH_RETRIES /
+# CV_FETCH_BACKOFF / CV_FETCH_TIMEOUT / CV_FETCH_MAX_BYTES)
+DEFAULT_CV_FETCH_WORKERS = 8            # téléchargements simultanés, tous hôtes confondus
+DEFAULT_CV_FETCH_PER_HOST = 4           # téléchargements simultanés vers un même hôte
+DEFAULT_CV_FETCH_RETRIES = 2            # nouvelles tentatives après une erreur transitoire
+DEFAULT_CV_FETCH_BACKOFF = 0.5          # secondes, doublées à chaque tentative
+DEFAULT_CV_FETCH_TIMEOUT = 30           # secondes (connexion et lecture)
+DEFAULT_CV_FETCH_MAX_BYTES = 20 * 1024 * 1024
+
+# Attente max imposée par un en-tête Retry-After
+MAX_RETRY_AFTER = 30
+# Réponses transitoires : nouvelle tentative
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+TRANSIENT_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class CVDownload:
+    """Résultat d'un téléchargement : contenu et type, ou erreur après la dernière tentative"""
+
+    def __init__(self, url, content=None, content_type='', status_code=None, error=None, attempts=0, elapsed=0.0):
+        self.url = url
+        self.content = content
+        self.content_type = content_type
+        self.status_code = status_code
+        self.error = error
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None and self.content is not None
+
+    @property
+    def from_cache(self):
+        """CV inchangé (304) servi par le cache disque"""
+        return self.status_code == 304
+
+
+class TransientFetchError(Exception):
+    """Erreur pouvant disparaître à la tentative suivante (timeout, 5xx, 429)"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def normalize_cv_url(cv_url):
+    """URL sans schéma complétée en http:// (même règle que CVAnalysisEngine)"""
+    cv_url = str(cv_url).strip()
+    if not urlparse(cv_url).scheme:
+        cv_url = 'http://' + cv_url
+    return cv_url
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After', '')
+    try:
+        return min(max(float(value), 0.0), MAX_RETRY_AFTER)
+    except ValueError:
+        return None
+
+
+class CVFetcher:
+    """
+    Téléchargement des CVs : une requests.Session partagée (connexions HTTP réutilisées),
+    un pool de threads borné, une limite de connexions simultanées par hôte et des nouvelles
+    tentatives avec attente exponentielle sur les erreurs transitoires.
+
+    fetch_many() rend chaque CV dès qu'il est arrivé : l'extraction du texte commence
+    pendant que les autres téléchargements sont en cours.
+    """
+
+    def __init__(self, max_workers=DEFAULT_CV_FETCH_WORKERS, per_host=DEFAULT_CV_FETCH_PER_HOST,
+                 retries=DEFAULT_CV_FETCH_RETRIES, backoff=DEFAULT_CV_FETCH_BACKOFF,
+                 timeout=DEFAULT_CV_FETCH_TIMEOUT, max_bytes=DEFAULT_CV_FETCH_MAX_BYTES, session=None, cache=None):
+        self.max_workers = max(1, int(max_workers))
+        self.per_host = max(1, int(per_host))
+        self.retries = max(0, int(retries))
+        self.backoff = max(0.0, float(backoff))
+        self.timeout = timeout
+        self.max_bytes = int(max_bytes)
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        # Cache disque optionnel (CVCache) : requêtes conditionnelles, 304 servis depuis le disque
+        self.cache = cache if cache is not None and cache.enabled else None
+
+        self._executor = None
+        self._hosts = {}            # hôte -> BoundedSemaphore(per_host)
+        self._lock = threading.Lock()
+
+        self._downloads = 0
+        self._failures = 0
+        self._retries = 0
+        self._bytes = 0
+        self._not_modified = 0
+        self._in_flight = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_workers=int(os.getenv('CV_FETCH_WORKERS', DEFAULT_CV_FETCH_WORKERS)),
+            per_host=int(os.getenv('CV_FETCH_PER_HOST', DEFAULT_CV_FETCH_PER_HOST)),
+            retries=int(os.getenv('CV_FETCH_RETRIES', DEFAULT_CV_FETCH_RETRIES)),
+            backoff=float(os.getenv('CV_FETCH_BACKOFF', DEFAULT_CV_FETCH_BACKOFF)),
+            timeout=float(os.getenv('CV_FETCH_TIMEOUT', DEFAULT_CV_FETCH_TIMEOUT)),
+            max_bytes=int(os.getenv('CV_FETCH_MAX_BYTES', DEFAULT_CV_FETCH_MAX_BYTES)),
+            cache=CVCache.from_env()
+        )
+
+    def fetch(self, cv_url):
+        """Télécharge un CV (bloquant) ; CVDownload.error renseigné après la dernière tentative"""
+        cv_url = normalize_cv_url(cv_url)
+        started = time.monotonic()
+        slot = self._host_slot(cv_url)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            delay = None
+            try:
+                with slot:
+                    with self._lock:
+                        self._in_flight += 1
+                    try:
+                        content, content_type, status_code = self._get(cv_url)
+                    finally:
+                        with self._lock:
+                            self._in_flight -= 1
+
+                with self._lock:
+                    self._downloads += 1
+                    if status_code == 304:
+                        self._not_modified += 1
+                    else:
+                        self._bytes += len(content)
+                self._count_lookup(hit=status_code == 304)
+                return CVDownload(cv_url, content, content_type, status_code,
+                                  attempts=attempt, elapsed=time.monotonic() - started)
+
+            except TransientFetchError as e:
+                error, retryable, delay = str(e), True, e.retry_after
+            except requests.RequestException as e:
+                # Connexion, timeout, transfert interrompu : transitoires ; 4xx (hors 429), taille : définitives
+                error, retryable = str(e), isinstance(e, TRANSIENT_EXCEPTIONS)
+
+            if not retryable or attempt > self.retries:
+                with self._lock:
+                    self._failures += 1
+                logger.warning(f"Téléchargement CV échoué après {attempt} tentative(s): {cv_url} ({error})")
+                self._count_lookup(hit=False)
+                return CVDownload(cv_url, error=error, attempts=attempt, elapsed=time.monotonic() - started)
+
+            # Attente hors du créneau de l'hôte : les autres téléchargements continuent
+            if delay is None:
+                delay = self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            with self._lock:
+                self._retries += 1
+            time.sleep(delay)
+
+    def fetch_many(self, cv_urls):
+        """
+        Télécharge les CVs en parallèle et rend chaque CVDownload dès qu'il est terminé
+        (ordre d'arrivée). Les URLs en double ne sont téléchargées qu'une fois.
+        """
+        urls = list(OrderedDict.fromkeys(normalize_cv_url(url) for url in cv_urls if url and str(url).strip()))
+        if not urls:
+            return
+
+        # Hôtes alternés dans la file : un hôte saturé ne bloque pas les threads pendant que d'autres attendent
+        by_host = OrderedDict()
+        for url in urls:
+            by_host.setdefault(urlparse(url).netloc.lower(), []).append(url)
+        interleaved = [url for group in _round_robin(list(by_host.values())) for url in group]
+
+        executor = self._get_executor()
+        futures = [executor.submit(self.fetch, url) for url in interleaved]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Générateur abandonné : téléchargements pas encore commencés annulés
+            for future in futures:
+                future.cancel()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'per_host': self.per_host,
+                'hosts': len(self._hosts),
+                'in_flight': self._in_flight,
+                'downloads': self._downloads,
+                'failures': self._failures,
+                'retries': self._retries,
+                'not_modified': self._not_modified,
+                'bytes': self._bytes
+            }
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def _get(self, cv_url, revalidate=True):
+        # CV en cache : requête conditionnelle (ETag / Last-Modified de la dernière réponse complète)
+        headers = self.cache.validators(cv_url) if self.cache and revalidate else {}
+        response = self.session.get(cv_url, headers=headers, timeout=self.timeout, allow_redirects=True, stream=True)
+        try:
+            if response.status_code == 304 and headers:
+                cached = self.cache.get(cv_url)
+                if cached is not None:
+                    return cached[0], cached[1], 304
+                # Fichier évincé ou altéré entre-temps : téléchargement complet
+                response.close()
+                return self._get(cv_url, revalidate=False)
+            if response.status_code == 304:
+                # 304 sans If-None-Match / If-Modified-Since : aucun contenu à servir, erreur définitive
+                raise requests.RequestException("HTTP 304 sans requête conditionnelle")
+
+            if response.status_code in RETRY_STATUS_CODES:
+                raise TransientFetchError(f"HTTP {response.status_code}", _retry_after(response))
+            response.raise_for_status()
+
+            content = bytearray()
+            for chunk in response.iter_content(READ_CHUNK_SIZE):
+                content += chunk
+                if len(content) > self.max_bytes:
+                    raise requests.RequestException(f"CV trop volumineux (> {self.max_bytes} octets)")
+            content = bytes(content)
+            content_type = response.headers.get('content-type', '').lower()
+        finally:
+            response.close()
+
+        if self.cache:
+            try:
+                self.cache.put(cv_url, content, content_type,
+                               response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            except OSError as e:
+                logger.warning(f"Mise en cache du CV impossible ({cv_url}): {e}")
+        return content, content_type, response.status_code
+
+    def _count_lookup(self, hit):
+        # Taux de succès du cache : une consultation par CV demandé, quelle que soit l'issue
+        if self.cache:
+            self.cache.count_lookup(hit)
+
+    def _host_slot(self, cv_url):
+        host = urlparse(cv_url).netloc.lower()
+        with self._lock:
+            slot = self._hosts.get(host)
+            if slot is None:
+                slot = self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='cv-fetch')
+            return self._executor
+
+
+def _round_robin(groups):
+    """[a1, a2], [b1] -> [[a1, b1], [a2]] : une URL de chaque hôte par tour"""
+    rounds = []
+    position = 0
+    while True:
+        current = [group[position] for group in groups if position < len(group)]
+        if not current:
+            return rounds
+        rounds.append(current)
+        position += 1
@@ -0,0 +1,256 @@
+import pandas as pd
+import logging
+import json
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Limite SQL Server : 2100 paramètres par requête
+RATING_IDS_CHUNK_SIZE = 1000
+
+# Valeurs appliquées aux stagiaires sans rating exploitable
+# (identiques au fallback historique de get_stagiaires_data)
+DEFAULT_RATING_COLUMNS = {
+    'AverageRating': 3.0,
+    'RatingCount': 0,
+    'HasRatings': False,
+    'RatingQuality': 0.5,
+    'DetailedScores': '{}',
+    'RatingDetails': '[]'
+}
+
+# Stagiaires + départements + universités en une seule requête jointe
+STAGIAIRES_QUERY = """
+SELECT
+    u.Id, u.FirstName, u.LastName, u.Email, u.Skills, u.CvUrl,
+    u.StartDate, u.EndDate, u.DepartmentId, u.Role, u.statuts,
+    u.stage, u.etudiant, u.UniversityId,
+    d.DepartmentName,
+    un.Universityname
+FROM Users u
+LEFT JOIN Departments d ON u.DepartmentId = d.Id
+LEFT JOIN Universities un ON u.UniversityId = un.Id
+WHERE u.Role = 3
+{eligibility_filter}
+{{id_filter}}
+"""
+
+RATINGS_BULK_QUERY = """
+SELECT
+    r.Id,
+    r.EvaluatorId,
+    r.EvaluatedUserId,
+    r.Score,
+    r.Type,
+    r.Status,
+    r.Comment,
+    r.DetailedScores,
+    r.CreatedAt,
+    r.SubmittedAt,
+    r.ApprovedAt,
+    e.FirstName + ' ' + e.LastName as EvaluatorName,
+    e.Role as EvaluatorRole
+FROM Ratings r
+LEFT JOIN Users e ON r.EvaluatorId = e.Id
+WHERE r.Type IN ('TuteurToStagiaire', 'RHToStagiaire')
+{id_filter}
+ORDER BY r.EvaluatedUserId, r.CreatedAt DESC
+"""
+
+
+def calculate_rating_quality(rating_count, average_rating):
+    """Calcule un score de qualité basé sur le nombre et la valeur des ratings"""
+    if rating_count == 0:
+        return 0.3
+
+    count_score = min(rating_count / 3, 1.0)
+    rating_score = average_rating / 5.0
+    quality_score = (count_score * 0.3) + (rating_score * 0.7)
+
+    return round(quality_score, 3)
+
+
+def read_sql_for_ids(conn, query, column, ids, chunk_size=RATING_IDS_CHUNK_SIZE, params=None):
+    """Exécute une requête contenant {id_filter}, pour tous les IDs (ids=None) ou par lots d'IDs"""
+    params = list(params or [])
+    if ids is None:
+        return pd.read_sql(query.format(id_filter=''), conn, params=params or None)
+
+    ids = [int(i) for i in ids]
+    if not ids:
+        return pd.DataFrame()
+
+    chunks = []
+    for start in range(0, len(ids), chunk_size):
+        chunk_ids = ids[start:start + chunk_size]
+        placeholders = ', '.join('?' * len(chunk_ids))
+        chunk_query = query.format(id_filter=f"AND {column} IN ({placeholders})")
+        chunks.append(pd.read_sql(chunk_query, conn, params=params + chunk_ids))
+
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def build_stagiaires_query(department_id=None, completed_only=False):
+    """Construit la requête stagiaires paramétrée avec les filtres d'éligibilité côté SQL"""
+    predicates = []
+    params = []
+
+    if department_id is not None:
+        predicates.append("AND u.DepartmentId = ?")
+        params.append(int(department_id))
+
+    if completed_only:
+        # Stage terminé : même règle que is_stage_completed (date de fin connue et passée)
+        predicates.append("AND u.EndDate IS NOT NULL AND u.EndDate <= GETDATE()")
+
+    query = STAGIAIRES_QUERY.format(eligibility_filter='\n'.join(predicates))
+    return query, params
+
+
+def fetch_stagiaires(conn, stagiaire_ids=None, department_id=None, completed_only=False):
+    """Récupère les stagiaires (Role = 3) avec département et université, éventuellement filtrés"""
+    query, params = build_stagiaires_query(department_id, completed_only)
+    return read_sql_for_ids(conn, query, 'u.Id', stagiaire_ids, params=params)
+
+
+def filter_eligible_stagiaires(df, department_id, reference_date=None):
+    """Applique en mémoire les mêmes filtres que build_stagiaires_query (département + stage terminé)"""
+    if df.empty:
+        return df
+
+    reference_date = reference_date or datetime.now()
+    end_dates = pd.to_datetime(df['EndDate'], errors='coerce')
+    mask = (df['DepartmentId'] == int(department_id)) & end_dates.notna() & (end_dates <= reference_date)
+
+    return df[mask]
+
+
+def fetch_ratings(conn, stagiaire_ids=None, chunk_size=RATING_IDS_CHUNK_SIZE):
+    """Récupère les ratings des stagiaires en une requête (ou quelques requêtes par lots d'IDs)"""
+    return read_sql_for_ids(conn, RATINGS_BULK_QUERY, 'r.EvaluatedUserId', stagiaire_ids, chunk_size)
+
+
+def aggregate_ratings(ratings, with_detailed_scores=False):
+    """Agrège une liste de ratings (ordonnés par CreatedAt DESC) pour un stagiaire"""
+    rating_details = []
+    detailed_scores_sum = {}
+    detailed_scores_count = {}
+    total_score_sum = 0
+    valid_ratings_count = 0
+
+    for rating in ratings:
+        try:
+            score = float(rating['Score'])
+            total_score_sum += score
+            valid_ratings_count += 1
+
+            evaluator_type = "Tuteur" if rating['Type'] == 'TuteurToStagiaire' else "RH"
+
+            rating_detail = {
+                'id': rating['Id'],
+                'score': score,
+                'evaluator_name': rating['EvaluatorName'],
+                'evaluator_type': evaluator_type,
+                'comment': rating['Comment'] if pd.notna(rating['Comment']) and rating['Comment'] else '',
+                'created_at': rating['CreatedAt'].strftime('%Y-%m-%d') if pd.notna(rating['CreatedAt']) else '',
+                'status': rating['Status']
+            }
+
+            # Scores détaillés (JSON) - uniquement pour la variante détaillée
+            if with_detailed_scores and pd.notna(rating['DetailedScores']) and rating['DetailedScores']:
+                try:
+                    detailed_json = json.loads(rating['DetailedScores'])
+                    rating_detail['detailed_scores'] = detailed_json
+
+                    for criterion, value in detailed_json.items():
+                        if isinstance(value, (int, float)):
+                            if criterion not in detailed_scores_sum:
+                                detailed_scores_sum[criterion] = 0
+                                detailed_scores_count[criterion] = 0
+                            detailed_scores_sum[criterion] += float(value)
+                            detailed_scores_count[criterion] += 1
+
+                except json.JSONDecodeError:
+                    logger.warning(f"Erreur parsing JSON pour rating {rating['Id']}")
+
+            rating_details.append(rating_detail)
+
+        except Exception as e:
+            logger.error(f"Erreur traitement rating {rating['Id']}: {e}")
+            continue
+
+    if valid_ratings_count == 0:
+        average_rating = 3.0
+    else:
+        average_rating = total_score_sum / valid_ratings_count
+
+    detailed_averages = {}
+    for criterion, total in detailed_scores_sum.items():
+        count = detailed_scores_count[criterion]
+        detailed_averages[criterion] = total / count if count > 0 else 0
+
+    return {
+        'average_rating': round(average_rating, 2),
+        'rating_count': valid_ratings_count,
+        'detailed_scores': detailed_averages,
+        'has_ratings': valid_ratings_count > 0,
+        'rating_details': rating_details,
+        'quality_score': calculate_rating_quality(valid_ratings_count, average_rating)
+    }
+
+
+def load_rating_aggregates(conn, stagiaire_ids=None, with_detailed_scores=False):
+    """Charge et agrège les ratings de tous les stagiaires en une passe (par EvaluatedUserId)"""
+    ratings_df = fetch_ratings(conn, stagiaire_ids)
+
+    if ratings_df.empty:
+        return {}
+
+    # Regroupement en mémoire : l'ordre CreatedAt DESC est conservé dans chaque groupe
+    grouped = {}
+    for rating in ratings_df.to_dict('records'):
+        grouped.setdefault(int(rating['EvaluatedUserId']), []).append(rating)
+
+    return {
+        stagiaire_id: aggregate_ratings(ratings, with_detailed_scores)
+        for stagiaire_id, ratings in grouped.items()
+    }
+
+
+def attach_rating_columns(df, rating_aggregates):
+    """Joint les agrégats de ratings au DataFrame des stagiaires"""
+    columns = {name: [] for name in DEFAULT_RATING_COLUMNS}
+
+    for stagiaire_id in df['Id']:
+        rating_data = rating_aggregates.get(int(stagiaire_id))
+
+        if rating_data is None:
+            for name, default in DEFAULT_RATING_COLUMNS.items():
+                columns[name].append(default)
+            continue
+
+        try:
+            values = {
+                'AverageRating': rating_data['average_rating'],
+                'RatingCount': rating_data['rating_count'],
+                'HasRatings': rating_data['has_ratings'],
+                'RatingQuality': rating_data['quality_score'],
+                'DetailedScores': json.dumps(rating_data['detailed_scores']),
+                'RatingDetails': json.dumps(rating_data['rating_details'])
+            }
+        except Exception as e:
+            logger.error(f"Erreur sérialisation rating pour stagiaire {stagiaire_id}: {e}")
+            values = DEFAULT_RATING_COLUMNS
+
+        for name in DEFAULT_RATING_COLUMNS:
+            columns[name].append(values[name])
+
+    df = df.copy()
+    df['AverageRating'] = pd.Series(columns['AverageRating'], index=df.index, dtype=float)
+    df['RatingCount'] = pd.Series(columns['RatingCount'], index=df.index, dtype=float)
+    df['HasRatings'] = pd.Series(columns['HasRatings'], index=df.index, dtype=object)
+    df['RatingQuality'] = pd.Series(columns['RatingQuality'], index=df.index, dtype=float)
+    df['DetailedScores'] = pd.Series(columns['DetailedScores'], index=df.index, dtype=object)
+    df['RatingDetails'] = pd.Series(columns['RatingDetails'], index=df.index, dtype=object)
+
+    return df
@@ -0,0 +1,256 @@
+import os
+import time
+import threading
+import logging
+from collections import deque
+
+import pyodbc
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (surchargées par DB_POOL_MAX_SIZE / DB_POOL_IDLE_TIMEOUT / DB_POOL_TIMEOUT)
+DEFAULT_POOL_MAX_SIZE = 10
+DEFAULT_POOL_IDLE_TIMEOUT = 300  # secondes avant fermeture d'une connexion inactive
+DEFAULT_POOL_TIMEOUT = 30        # secondes d'attente max pour obtenir une connexion
+
+# Base par défaut (surchargée par DB_SERVER / DB_NAME)
+DEFAULT_DB_SERVER = 'DESKTOP-913R9GN'
+DEFAULT_DB_NAME = 'PFEDb'
+
+LIVENESS_QUERY = "SELECT 1"
+
+
+def connection_string_from_env():
+    """Chaîne de connexion SQL Server (DB_SERVER, DB_NAME), commune au service et aux scripts de mesure"""
+    return (
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+        f"SERVER={os.getenv('DB_SERVER', DEFAULT_DB_SERVER)};"
+        f"DATABASE={os.getenv('DB_NAME', DEFAULT_DB_NAME)};"
+        f"Trusted_Connection=yes;"
+        f"MultipleActiveResultSets=yes;"
+        f"Encrypt=no;"
+    )
+
+
+class PoolTimeoutError(Exception):
+    """Aucune connexion disponible dans le délai imparti"""
+
+
+class PooledConnection:
+    """Connexion empruntée au pool : close() la rend au pool au lieu de la fermer"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        """Rend la connexion au pool (idempotent)"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+    def invalidate(self):
+        """Ferme réellement la connexion (ex: connexion cassée)"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn, discard=True)
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise pyodbc.ProgrammingError("Connexion déjà rendue au pool")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        # Filet de sécurité : une connexion oubliée (chemin d'erreur) retourne au pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Pool borné de connexions pyodbc avec vérification de vie à l'emprunt"""
+
+    def __init__(self, connection_string, max_size=DEFAULT_POOL_MAX_SIZE,
+                 idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT, timeout=DEFAULT_POOL_TIMEOUT):
+        self.connection_string = connection_string
+        self.max_size = max(1, int(max_size))
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self._idle = deque()  # (connexion, dernier usage)
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+
+        self._open_count = 0
+        self._in_use = 0
+        self._created = 0
+        self._discarded = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._borrows = 0
+
+    @classmethod
+    def from_env(cls, connection_string):
+        """Construit le pool à partir des variables d'environnement"""
+        return cls(
+            connection_string,
+            max_size=int(os.getenv('DB_POOL_MAX_SIZE', DEFAULT_POOL_MAX_SIZE)),
+            idle_timeout=float(os.getenv('DB_POOL_IDLE_TIMEOUT', DEFAULT_POOL_IDLE_TIMEOUT)),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT))
+        )
+
+    def acquire(self, timeout=None):
+        """Emprunte une connexion (réutilisée si vivante, sinon nouvelle)"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            conn = None
+            create = False
+
+            with self._available:
+                stale = self._take_expired()
+                waited = False
+                while not self._idle and self._open_count >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Aucune connexion disponible après {timeout}s "
+                            f"({self._in_use}/{self.max_size} utilisées)"
+                        )
+                    if not waited:
+                        self._waits += 1
+                        waited = True
+                    self._available.wait(remaining)
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    create = True
+                    self._open_count += 1
+
+                self._in_use += 1
+
+            for old in stale:
+                self._close_quietly(old)
+
+            if create:
+                try:
+                    conn = pyodbc.connect(self.connection_string)
+                except Exception:
+                    self._forget()
+                    raise
+                with self._lock:
+                    self._created += 1
+                    self._borrows += 1
+                return PooledConnection(self, conn)
+
+            # Connexion réutilisée : expirée ou morte -> on la jette et on recommence
+            expired = self.idle_timeout and time.monotonic() - last_used > self.idle_timeout
+            if expired or not self._is_alive(conn):
+                self._close_quietly(conn)
+                self._forget(discarded=True)
+                continue
+
+            with self._lock:
+                self._borrows += 1
+            return PooledConnection(self, conn)
+
+    def connection(self, timeout=None):
+        """Context manager : with pool.connection() as conn: ..."""
+        return self.acquire(timeout)
+
+    def release(self, conn, discard=False):
+        """Rend une connexion au pool (ou la ferme si elle est inutilisable)"""
+        if not discard:
+            try:
+                # Ne pas laisser de transaction ouverte à l'emprunteur suivant
+                conn.rollback()
+            except Exception as e:
+                logger.warning(f"Connexion rejetée au retour dans le pool: {e}")
+                discard = True
+
+        if discard:
+            self._close_quietly(conn)
+            self._forget(discarded=True)
+            return
+
+        with self._available:
+            self._in_use -= 1
+            self._idle.append((conn, time.monotonic()))
+            stale = self._take_expired()
+            self._available.notify()
+        for old in stale:
+            self._close_quietly(old)
+
+    def stats(self):
+        """Statistiques du pool (exposées sur /api/health)"""
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'idle_timeout': self.idle_timeout,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'open': self._open_count,
+                'created': self._created,
+                'discarded': self._discarded,
+                'borrows': self._borrows,
+                'waits': self._waits,
+                'timeouts': self._timeouts
+            }
+
+    def close_all(self):
+        """Ferme toutes les connexions inactives"""
+        with self._available:
+            idle, self._idle = list(self._idle), deque()
+            self._open_count -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def _take_expired(self):
+        # Appelé sous self._lock. Emprunts par la droite (pop) : les connexions les plus anciennes
+        # restent à gauche, retirées ici sans attendre qu'on les emprunte. Fermeture hors verrou.
+        if not self.idle_timeout:
+            return []
+        limit = time.monotonic() - self.idle_timeout
+        stale = []
+        while self._idle and self._idle[0][1] < limit:
+            stale.append(self._idle.popleft()[0])
+        self._open_count -= len(stale)
+        self._discarded += len(stale)
+        return stale
+
+    def _is_alive(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(LIVENESS_QUERY)
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Connexion morte détectée dans le pool: {e}")
+            return False
+
+    def _forget(self, discarded=False):
+        with self._available:
+            self._open_count -= 1
+            self._in_use -= 1
+            if discarded:
+                self._discarded += 1
+            self._available.notify()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
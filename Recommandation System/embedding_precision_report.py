@@ -0,0 +1,86 @@
+"""
+Mémoire gagnée et accord de classement des précisions réduites (float16, int8) face au float32.
+
+    python embedding_precision_report.py --store-path embedding_store
+    python embedding_precision_report.py --synthetic 50000      # sans store existant
+
+Les requêtes sont des vecteurs du store (chaque profil contre tous les autres). Pour chaque précision :
+- mémoire des vecteurs (octets par vecteur, total, gain)
+- recouvrement du top-10 avec le classement float32
+- tau de Kendall entre les scores float32 et quantifiés sur le top-100 float32
+- écart maximal de similarité
+"""
+import argparse
+
+import numpy as np
+from scipy.stats import kendalltau
+
+from embedding_store import EmbeddingStore, EMBEDDING_DTYPES, normalize_rows, quantize, dot
+
+DEFAULT_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+
+def load_vectors(args):
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        return normalize_rows(rng.normal(size=(args.synthetic, 384)))
+
+    # Ouvert dans sa précision actuelle : aucune conversion du store
+    store = EmbeddingStore(args.model, args.store_path, dtype=None)
+    ids, rows = store.entries()
+    print(f"Store {store.directory} ({store.dtype}): {len(ids)} vecteurs")
+    if store.dtype != 'float32':
+        print("Store déjà réduit : la référence float32 est sa version déquantifiée")
+    return store.vectors(rows)
+
+
+def ranking_agreement(reference, candidate, top):
+    """Recouvrement du top-`top` et tau de Kendall sur le top-100 de référence"""
+    reference_top = np.argsort(-reference, kind='stable')
+    overlap = len(set(reference_top[:top].tolist()) & set(np.argsort(-candidate, kind='stable')[:top].tolist())) / top
+    head = reference_top[:100]
+    tau = kendalltau(reference[head], candidate[head])[0]
+    return overlap, tau
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store-path', default='embedding_store')
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--synthetic', type=int, help='nombre de vecteurs aléatoires au lieu du store')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    if len(vectors) <= args.top:
+        print("Pas assez de vecteurs pour comparer les classements")
+        return
+
+    rng = np.random.default_rng(1)
+    query_rows = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    references = [np.delete(vectors @ vectors[row], row) for row in query_rows]
+
+    float32_bytes = vectors.shape[1] * 4
+    print(f"\n{'précision':>9} {'octets/vect.':>12} {'total (Mo)':>11} {'gain':>6} "
+          f"{f'top-{args.top}':>7} {'tau':>6} {'écart max':>10}")
+
+    for dtype in EMBEDDING_DTYPES:
+        codes, scales = quantize(vectors, dtype)
+        bytes_per_vector = codes.shape[1] * codes.itemsize + (0 if scales is None else scales.itemsize)
+
+        overlaps, taus, errors = [], [], []
+        for row, reference in zip(query_rows, references):
+            candidate = np.delete(dot(codes, scales, vectors[row]), row)
+            overlap, tau = ranking_agreement(reference, candidate, args.top)
+            overlaps.append(overlap)
+            taus.append(tau)
+            errors.append(np.abs(candidate - reference).max())
+
+        print(f"{dtype:>9} {bytes_per_vector:>12} {len(vectors) * bytes_per_vector / 1e6:>11.2f} "
+              f"{float32_bytes / bytes_per_vector:>5.1f}x {np.mean(overlaps):>7.3f} {np.nanmean(taus):>6.3f} "
+              f"{np.max(errors):>10.2e}")
+
+
+if __name__ == '__main__':
+    main()
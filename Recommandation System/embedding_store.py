@@ -0,0 +1,380 @@
+import os
+import re
+import json
+import atexit
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (surchargées par EMBEDDING_STORE_PATH / EMBEDDING_STORE_DTYPE)
+DEFAULT_EMBEDDING_STORE_PATH = 'embedding_store'
+DEFAULT_EMBEDDING_DTYPE = 'float32'
+# Capacité minimale du fichier de vecteurs (lignes), doublée quand elle est atteinte
+MIN_CAPACITY = 1024
+
+# Précisions de stockage : float16 (2 octets/dimension), int8 + échelle float32 par vecteur (1 octet/dimension)
+EMBEDDING_DTYPES = ('float32', 'float16', 'int8')
+INT8_MAX = 127
+# Vecteurs écrits avant une sauvegarde intermédiaire de l'index (sinon à l'arrêt du processus)
+SAVE_EVERY_CHANGES = 200
+# Lignes converties en float32 à la fois lors d'un produit scalaire (borne la mémoire temporaire)
+DOT_CHUNK_SIZE = 65536
+
+VECTORS_FILE = 'vectors.npy'
+SCALES_FILE = 'scales.npy'
+INDEX_FILE = 'index.json'
+
+
+def text_key(model_name, text):
+    """Empreinte d'un texte pour un modèle donné (changer de modèle invalide les vecteurs)"""
+    return hashlib.sha256(f"{model_name}\x00{text}".encode('utf-8')).hexdigest()
+
+
+def normalize_rows(vectors):
+    """Vecteurs de norme 1 (le produit scalaire devient la similarité cosinus)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def quantize(vectors, dtype):
+    """(codes, échelles) d'une matrice float32 ; échelles None sauf en int8 (une par vecteur)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype != 'int8':
+        return vectors.astype(dtype), None
+
+    scales = np.abs(vectors).max(axis=1) / INT8_MAX
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -INT8_MAX, INT8_MAX).astype(np.int8)
+    return codes, scales
+
+
+def dequantize(codes, scales=None):
+    vectors = np.asarray(codes, dtype=np.float32)
+    return vectors if scales is None else vectors * scales[:, None]
+
+
+def dot(codes, scales, query):
+    """Produits scalaires codes x requête float32, déquantification à la volée par blocs"""
+    similarities = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), DOT_CHUNK_SIZE):
+        block = codes[start:start + DOT_CHUNK_SIZE]
+        similarities[start:start + DOT_CHUNK_SIZE] = block.astype(np.float32, copy=False) @ query
+    if scales is not None:
+        similarities *= scales
+    return similarities
+
+
+class EmbeddingStore:
+    """
+    Vecteurs des candidats persistés sur disque pour un modèle donné.
+
+    - vectors.npy : matrice (lignes x dimension) float32, float16 ou int8, ouverte en mmap
+    - scales.npy  : échelle float32 de chaque vecteur (int8 uniquement)
+    - index.json  : identifiant -> (ligne, empreinte du texte encodé)
+
+    Seuls les textes nouveaux ou modifiés passent par le modèle, en un seul appel par lot.
+    """
+
+    def __init__(self, model_name, path=DEFAULT_EMBEDDING_STORE_PATH, dtype=DEFAULT_EMBEDDING_DTYPE):
+        """dtype=None : précision du store existant conservée (aucune conversion)"""
+        if dtype is not None and dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Précision {dtype} non supportée ({', '.join(EMBEDDING_DTYPES)})")
+
+        self.model_name = model_name
+        self.dtype = dtype
+        self.directory = os.path.join(path, re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name))
+
+        self._vectors = None   # np.memmap (capacité x dimension) dans la précision du store
+        self._scales = None    # np.memmap (capacité,), int8 uniquement
+        self._rows = {}        # identifiant -> [ligne, empreinte]
+        self._size = 0         # lignes utilisées
+        self._dimension = None
+        self._lock = threading.Lock()
+        self._in_flight = {}   # identifiant -> Event, encodage en cours hors verrou
+        self._unsaved = 0      # vecteurs écrits depuis la dernière sauvegarde de l'index
+        self._hits = 0
+        self._encoded = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+        if self.dtype is None:
+            self.dtype = DEFAULT_EMBEDDING_DTYPE
+        atexit.register(self.save)
+
+    @classmethod
+    def from_env(cls, model_name):
+        return cls(
+            model_name,
+            path=os.getenv('EMBEDDING_STORE_PATH') or DEFAULT_EMBEDDING_STORE_PATH,
+            dtype=os.getenv('EMBEDDING_STORE_DTYPE') or DEFAULT_EMBEDDING_DTYPE
+        )
+
+    @property
+    def vectors_path(self):
+        return os.path.join(self.directory, VECTORS_FILE)
+
+    @property
+    def scales_path(self):
+        return os.path.join(self.directory, SCALES_FILE)
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def ensure(self, ids, texts, encode):
+        """
+        Lignes des vecteurs de chaque identifiant, à jour avec son texte.
+        encode(liste de textes) -> matrice, appelé une seule fois avec les textes nouveaux ou modifiés.
+
+        Le modèle est appelé hors du verrou : les lectures (codes, similarities) des vecteurs déjà
+        en store ne sont pas bloquées par un encodage en cours. Un identifiant déjà en cours
+        d'encodage par une autre requête est attendu au lieu d'être encodé une seconde fois.
+        """
+        ids = [int(i) for i in ids]
+        keys = [text_key(self.model_name, text) for text in texts]
+        encoded = 0
+
+        while True:
+            with self._lock:
+                stale = [
+                    position for position, (row_id, key) in enumerate(zip(ids, keys))
+                    if self._rows.get(row_id, (None, None))[1] != key
+                ]
+                # Un même identifiant peut apparaître deux fois : un seul encodage
+                stale = list({ids[position]: position for position in stale}.values())
+                if not stale:
+                    self._hits += len(ids) - encoded
+                    self._encoded += encoded
+                    return np.array([self._rows[row_id][0] for row_id in ids], dtype=np.int64)
+
+                owned, pending = [], []
+                for position in stale:
+                    in_flight = self._in_flight.get(ids[position])
+                    if in_flight is None:
+                        self._in_flight[ids[position]] = threading.Event()
+                        owned.append(position)
+                    else:
+                        pending.append(in_flight)
+
+            if owned:
+                done = [self._in_flight[ids[position]] for position in owned]
+                try:
+                    vectors = normalize_rows(encode([texts[position] for position in owned]))
+                    with self._lock:
+                        # Lignes revérifiées sous verrou : seules celles encore périmées sont écrites
+                        fresh = [
+                            index for index, position in enumerate(owned)
+                            if self._rows.get(ids[position], (None, None))[1] != keys[position]
+                        ]
+                        if fresh:
+                            self._write([ids[owned[index]] for index in fresh],
+                                        [keys[owned[index]] for index in fresh], vectors[fresh])
+                        should_save = self._unsaved >= SAVE_EVERY_CHANGES
+                    encoded += len(fresh)
+                    # Index réécrit par paquets (fichier proportionnel au nombre de candidats) hors verrou
+                    if should_save:
+                        self.save()
+                finally:
+                    with self._lock:
+                        for position in owned:
+                            del self._in_flight[ids[position]]
+                    for event in done:
+                        event.set()
+
+            # Encodages d'une autre requête terminés (ou échoués) : lignes revérifiées au tour suivant
+            for event in pending:
+                event.wait()
+
+    def similarities(self, rows, query_vector):
+        """Similarité cosinus du vecteur requête avec les lignes demandées (un produit matrice-vecteur)"""
+        query = normalize_rows(query_vector)[0]
+        codes, scales = self.codes(rows)
+        return dot(codes, scales, query)
+
+    def codes(self, rows):
+        """Copie en mémoire des lignes demandées dans la précision du store : (codes, échelles ou None)"""
+        with self._lock:
+            if self._vectors is None:
+                return np.zeros((len(rows), self._dimension or 0), dtype=self.dtype), None
+            scales = None if self._scales is None else np.array(self._scales[rows])
+            return np.array(self._vectors[rows]), scales
+
+    def vectors(self, rows):
+        """Copie en mémoire des vecteurs des lignes demandées, en float32"""
+        return dequantize(*self.codes(rows))
+
+    def entries(self):
+        """Identifiants et lignes de tous les vecteurs stockés"""
+        with self._lock:
+            ids = sorted(self._rows)
+            return ids, np.array([self._rows[row_id][0] for row_id in ids], dtype=np.int64)
+
+    def save(self):
+        """
+        Écrit l'index sur disque (écriture atomique). Entre deux sauvegardes, un arrêt brutal perd au plus
+        les SAVE_EVERY_CHANGES derniers vecteurs : leurs stagiaires sont simplement réencodés.
+        """
+        with self._lock:
+            if self._unsaved == 0:
+                return
+            payload = self._index_payload()
+            self._unsaved = 0
+        try:
+            self._write_index(payload)
+        except OSError as e:
+            logger.warning(f"Sauvegarde de l'index d'embeddings impossible ({self.index_path}): {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._encoded
+            return {
+                'model': self.model_name,
+                'dtype': self.dtype,
+                'vectors': self._size,
+                'dimension': self._dimension,
+                'capacity': 0 if self._vectors is None else int(self._vectors.shape[0]),
+                'memory_mb': round(self._size * self._bytes_per_vector() / 1e6, 2),
+                'hits': self._hits,
+                'encoded': self._encoded,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'path': self.directory
+            }
+
+    def _bytes_per_vector(self):
+        if self._dimension is None:
+            return 0
+        return self._dimension * np.dtype(self.dtype).itemsize + (4 if self.dtype == 'int8' else 0)
+
+    def _write(self, ids, keys, vectors):
+        if self._dimension is None:
+            self._dimension = int(vectors.shape[1])
+        elif vectors.shape[1] != self._dimension:
+            raise ValueError(f"Dimension {vectors.shape[1]} incompatible avec le store ({self._dimension})")
+
+        # Texte modifié : la ligne existante est réécrite ; nouvel identifiant : ligne ajoutée
+        rows = []
+        size = self._size
+        for row_id in ids:
+            entry = self._rows.get(row_id)
+            if entry is None:
+                rows.append(size)
+                size += 1
+            else:
+                rows.append(entry[0])
+
+        self._reserve(size)
+        self._write_rows(rows, vectors)
+
+        # L'index n'est publié qu'après l'écriture des vecteurs qu'il référence
+        for row_id, row, key in zip(ids, rows, keys):
+            self._rows[row_id] = [row, key]
+        self._size = size
+        self._unsaved += len(ids)
+
+    def _write_rows(self, rows, vectors):
+        codes, scales = quantize(vectors, self.dtype)
+        self._vectors[rows] = codes
+        self._vectors.flush()
+        if scales is not None:
+            self._scales[rows] = scales
+            self._scales.flush()
+
+    def _reserve(self, size):
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if size <= capacity:
+            return
+
+        new_capacity = max(size, 2 * capacity, MIN_CAPACITY)
+        self._grow('_vectors', self.vectors_path, (new_capacity, self._dimension), self.dtype)
+        if self.dtype == 'int8':
+            self._grow('_scales', self.scales_path, (new_capacity,), np.float32)
+        logger.info(f"Store d'embeddings agrandi: {new_capacity} lignes ({self.directory})")
+
+    def _grow(self, attribute, path, shape, dtype):
+        """Nouveau fichier plus grand (lignes utilisées recopiées), remplacé atomiquement et rouvert en mmap"""
+        tmp_path = f"{path}.tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=shape)
+        current = getattr(self, attribute)
+        if current is not None and current.dtype == grown.dtype:
+            grown[:self._size] = current[:self._size]
+        grown.flush()
+        del grown, current
+
+        # Le mapping courant doit être libéré avant le remplacement (Windows)
+        setattr(self, attribute, None)
+        os.replace(tmp_path, path)
+        setattr(self, attribute, np.load(path, mmap_mode='r+'))
+
+    def _index_payload(self):
+        return {
+            'model': self.model_name,
+            'dtype': self.dtype,
+            'dimension': self._dimension,
+            'size': self._size,
+            'rows': {str(row_id): list(entry) for row_id, entry in self._rows.items()}
+        }
+
+    def _write_index(self, payload):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _load(self):
+        if not (os.path.exists(self.index_path) and os.path.exists(self.vectors_path)):
+            return
+
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            stored_dtype = payload.get('dtype', 'float32')
+            vectors = np.load(self.vectors_path, mmap_mode='r+')
+            scales = np.load(self.scales_path, mmap_mode='r+') if stored_dtype == 'int8' else None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Store d'embeddings illisible ({self.directory}), reconstruit: {e}")
+            return
+
+        if payload.get('model') != self.model_name or stored_dtype not in EMBEDDING_DTYPES \
+                or vectors.shape[1] != payload.get('dimension') or vectors.shape[0] < payload.get('size', 0):
+            logger.info(f"Store d'embeddings incohérent avec le modèle {self.model_name}, reconstruit")
+            return
+
+        self._vectors = vectors
+        self._scales = scales
+        self._dimension = int(payload['dimension'])
+        self._size = int(payload['size'])
+        self._rows = {int(row_id): entry for row_id, entry in payload['rows'].items()}
+
+        if self.dtype is None:
+            self.dtype = stored_dtype
+        elif stored_dtype != self.dtype:
+            self._convert(stored_dtype)
+        logger.info(f"Store d'embeddings chargé: {self._size} vecteurs {self.dtype} ({self.directory})")
+
+    def _convert(self, stored_dtype):
+        """
+        Changement de précision sans réencodage : vecteurs existants requantifiés.
+        Revenir vers une précision supérieure conserve l'erreur de quantification (supprimer le répertoire pour réencoder).
+        """
+        scales = None if self._scales is None else np.array(self._scales[:self._size])
+        vectors = dequantize(np.array(self._vectors[:self._size]), scales)
+
+        capacity = max(self._size, MIN_CAPACITY)
+        self._grow('_vectors', self.vectors_path, (capacity, self._dimension), self.dtype)
+        if self.dtype == 'int8':
+            self._grow('_scales', self.scales_path, (capacity,), np.float32)
+        else:
+            self._scales = None
+            if os.path.exists(self.scales_path):
+                os.remove(self.scales_path)
+
+        self._write_rows(np.arange(self._size), vectors)
+        self._write_index(self._index_payload())
+        logger.info(f"Store d'embeddings converti: {stored_dtype} -> {self.dtype} ({self._size} vecteurs)")
@@ -0,0 +1,386 @@
+import os
+import time
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (surchargées par EMBEDDING_WORKERS / EMBEDDING_TIMEOUT / EMBEDDING_MAX_PENDING /
+# EMBEDDING_MAX_RESTARTS)
+DEFAULT_EMBEDDING_WORKERS = 0       # 0 : modèle chargé dans le processus Flask (pas de pool)
+DEFAULT_EMBEDDING_TIMEOUT = 30      # secondes max sans progression (place dans le pool, tâche terminée)
+DEFAULT_MAX_RESTARTS = 3            # workers relancés après un arrêt brutal, au-delà le pool est indisponible
+DEFAULT_STARTUP_TIMEOUT = 300       # secondes max pour le chargement du modèle dans les workers
+# Textes par tâche : un lot de textes est découpé pour être réparti entre les processus
+DEFAULT_TASK_SIZE = 256
+# Secondes entre deux vérifications de vie des workers par le collecteur
+WORKER_CHECK_INTERVAL = 1.0
+
+
+class EmbeddingPoolTimeoutError(Exception):
+    """Pool saturé ou encodage trop long : la requête abandonne au lieu de bloquer"""
+
+
+class EmbeddingWorkerLostError(EmbeddingPoolTimeoutError):
+    """Worker arrêté brutalement (OOM, plantage de torch) : ses tâches en cours ne reviendront pas"""
+
+
+def _attach(name):
+    """Ouvre un segment créé par le processus principal (qui reste seul responsable de l'unlink)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 : en spawn, le resource tracker est celui du parent, l'enregistrement est sans effet
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker_main(model_name, batch_size, threads, tasks, results, current):
+    """
+    Boucle d'un worker : modèle chargé une fois, puis tâches (textes -> segment de mémoire partagée).
+    `current` (mémoire partagée, écrite sans passer par la file) désigne la tâche en cours au parent.
+    """
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    try:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name, device='cpu')
+        dimension = int(model.get_sentence_embedding_dimension())
+    except Exception as e:
+        results.put(('failed', os.getpid(), str(e)))
+        return
+    results.put(('ready', os.getpid(), dimension))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+
+        task_id, texts, segment_name = task
+        current.value = task_id
+        try:
+            vectors = model.encode(texts, batch_size=batch_size, normalize_embeddings=True,
+                                   convert_to_numpy=True, show_progress_bar=False)
+            segment = _attach(segment_name)
+            try:
+                np.ndarray((len(texts), dimension), dtype=np.float32, buffer=segment.buf)[:] = vectors
+            finally:
+                segment.close()
+            results.put(('done', task_id, None))
+        except Exception as e:
+            results.put(('error', task_id, str(e)))
+
+
+class EmbeddingWorkerPool:
+    """
+    Processus d'encodage : chaque worker charge le modèle une fois et reçoit des lots de textes par une file.
+    Les vecteurs reviennent par mémoire partagée (un segment par tâche, créé et libéré par le parent).
+
+    encode() a la même signature utile que SentenceTransformer.encode : le pool remplace le modèle
+    dans le processus Flask, dont les threads ne font plus qu'attendre.
+    """
+
+    def __init__(self, model_name, processes=1, batch_size=64, timeout=DEFAULT_EMBEDDING_TIMEOUT,
+                 max_pending=None, task_size=DEFAULT_TASK_SIZE, threads=None, max_restarts=DEFAULT_MAX_RESTARTS):
+        self.model_name = model_name
+        self.processes = max(1, int(processes))
+        self.batch_size = max(1, int(batch_size))
+        self.timeout = timeout
+        self.max_pending = max(1, int(max_pending or 4 * self.processes))
+        self.task_size = max(1, int(task_size))
+        self.threads = max(1, int(threads or (os.cpu_count() or 1) // self.processes))
+        self.max_restarts = max(0, int(max_restarts))
+        self.dimension = None
+
+        self._context = multiprocessing.get_context('spawn')
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+        self._workers = []
+        self._pending = {}   # tâche -> (Future, segment, nombre de textes)
+        self._current = {}   # pid du worker -> Value (tâche en cours, -1 si aucune)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._startup_error = None
+        self._unavailable = None   # raison : plus aucun worker et relances épuisées
+        self._closing = False
+        self._collector = None
+
+        self._completed = 0
+        self._errors = 0
+        self._timeouts = 0
+        self._texts = 0
+        self._restarts = 0
+        self._lost = 0
+
+    @classmethod
+    def from_env(cls, model_name, processes, batch_size=64):
+        return cls(
+            model_name,
+            processes=processes,
+            batch_size=batch_size,
+            timeout=float(os.getenv('EMBEDDING_TIMEOUT', DEFAULT_EMBEDDING_TIMEOUT)),
+            max_pending=int(os.getenv('EMBEDDING_MAX_PENDING', 0)) or None,
+            max_restarts=int(os.getenv('EMBEDDING_MAX_RESTARTS', DEFAULT_MAX_RESTARTS))
+        )
+
+    def start(self, timeout=DEFAULT_STARTUP_TIMEOUT):
+        """Démarre les workers et attend que chacun ait chargé le modèle"""
+        for _ in range(self.processes):
+            self._spawn()
+
+        self._collector = threading.Thread(target=self._collect, name='embedding-results', daemon=True)
+        self._collector.start()
+
+        if not self._ready.wait(timeout):
+            self.close()
+            raise EmbeddingPoolTimeoutError(f"Workers d'encodage non prêts après {timeout}s")
+        if self._startup_error:
+            self.close()
+            raise RuntimeError(f"Chargement du modèle impossible dans les workers: {self._startup_error}")
+
+        logger.info(f"Pool d'encodage prêt: {self.processes} processus x {self.threads} threads "
+                    f"({self.model_name}, dimension {self.dimension})")
+        return self
+
+    def encode(self, texts, batch_size=None, normalize_embeddings=True, timeout=None, **kwargs):
+        """
+        Vecteurs normalisés des textes (float32). Le lot est découpé en tâches réparties entre les workers.
+        Lève EmbeddingPoolTimeoutError si aucune place ne se libère dans le pool, ou si une tâche ne revient pas,
+        en `timeout` secondes (un gros lot progresse tâche par tâche sans limite globale) ;
+        EmbeddingWorkerLostError si le worker d'une tâche s'arrête ou si le pool n'a plus de worker.
+        batch_size est fixé à la création du pool (taille des lots passés au modèle dans les workers).
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        texts = list(texts)
+        result = np.empty((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return result
+
+        timeout = self.timeout if timeout is None else timeout
+
+        submitted = []
+        try:
+            for start in range(0, len(texts), self.task_size):
+                chunk = texts[start:start + self.task_size]
+                submitted.append((start, len(chunk), self._submit(chunk, timeout)))
+
+            for start, count, future in submitted:
+                try:
+                    result[start:start + count] = future.result(timeout)
+                except FutureTimeoutError:
+                    raise EmbeddingPoolTimeoutError(f"Tâche d'encodage ({count} textes) non terminée après {timeout}s")
+        except EmbeddingPoolTimeoutError as e:
+            if not isinstance(e, EmbeddingWorkerLostError):
+                with self._lock:
+                    self._timeouts += 1
+            # Tâches abandonnées : places et segments libérés par le collecteur à leur retour ou à l'arrêt du worker
+            for _, _, future in submitted:
+                future.cancel()
+            raise
+
+        with self._lock:
+            self._texts += len(texts)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'processes': self.processes,
+                'alive': sum(1 for worker in self._workers if worker.is_alive()),
+                'available': self._unavailable is None,
+                'restarts': self._restarts,
+                'lost_tasks': self._lost,
+                'threads_per_process': self.threads,
+                'pending_tasks': len(self._pending),
+                'max_pending': self.max_pending,
+                'completed_tasks': self._completed,
+                'errors': self._errors,
+                'timeouts': self._timeouts,
+                'encoded_texts': self._texts
+            }
+
+    def close(self):
+        with self._lock:
+            self._closing = True
+            workers = list(self._workers)
+        for _ in workers:
+            self._tasks.put(None)
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._results.put(('stop', None, None))
+
+        # Tâches jamais revenues (worker arrêté) : segments libérés
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future, segment, _ in pending.values():
+            future.cancel()
+            segment.close()
+            segment.unlink()
+
+    def _spawn(self):
+        current = self._context.Value('q', -1, lock=False)
+        worker = self._context.Process(
+            target=_worker_main,
+            args=(self.model_name, self.batch_size, self.threads, self._tasks, self._results, current),
+            name='embedding-worker',
+            daemon=True
+        )
+        worker.start()
+        with self._lock:
+            self._workers.append(worker)
+            self._current[worker.pid] = current
+
+    def _submit(self, texts, timeout):
+        if self._unavailable:
+            raise EmbeddingWorkerLostError(f"Pool d'encodage indisponible: {self._unavailable}")
+        # Pool saturé : attente d'une place au plus `timeout` secondes
+        if not self._slots.acquire(timeout=timeout):
+            raise EmbeddingPoolTimeoutError(f"Pool d'encodage saturé ({self.max_pending} tâches en attente)")
+
+        try:
+            segment = shared_memory.SharedMemory(create=True, size=max(1, len(texts) * self.dimension * 4))
+        except Exception:
+            self._slots.release()
+            raise
+
+        task_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._pending[task_id] = (future, segment, len(texts))
+        self._tasks.put((task_id, texts, segment.name))
+        return future
+
+    def _collect(self):
+        """
+        Thread de réception : résout les tâches terminées et libère leur segment.
+        Vérifie aussi que les workers sont vivants : les tâches d'un worker arrêté sont échouées.
+        """
+        starting = self.processes
+        checked = time.monotonic()
+        while True:
+            try:
+                kind, key, value = self._results.get(timeout=WORKER_CHECK_INTERVAL)
+            except queue.Empty:
+                kind = None
+            except Exception:
+                # File fermée ou corrompue (arrêt du processus, worker interrompu en cours d'écriture)
+                return
+
+            if kind is None or time.monotonic() - checked >= WORKER_CHECK_INTERVAL:
+                checked = time.monotonic()
+                if not self._check_workers():
+                    self._startup_error = self._startup_error or self._unavailable
+                    self._ready.set()
+            if kind is None:
+                continue
+
+            if kind == 'stop':
+                return
+            if kind in ('ready', 'failed'):
+                if kind == 'ready':
+                    self.dimension = value
+                elif starting > 0:
+                    self._startup_error = value
+                else:
+                    logger.error(f"Worker d'encodage relancé sans modèle: {value}")
+                starting -= 1
+                if starting == 0 or kind == 'failed':
+                    self._ready.set()
+                continue
+            with self._lock:
+                entry = self._pending.pop(key, None)
+                if entry is None:
+                    # Tâche déjà échouée (worker tenu pour arrêté avant la lecture de sa réponse)
+                    continue
+                future, segment, count = entry
+                if kind == 'done':
+                    self._completed += 1
+                else:
+                    self._errors += 1
+            self._slots.release()
+
+            try:
+                if kind == 'done':
+                    vectors = np.ndarray((count, self.dimension), dtype=np.float32, buffer=segment.buf).copy()
+                    self._resolve(future, result=vectors)
+                else:
+                    self._resolve(future, error=RuntimeError(f"Erreur worker d'encodage: {value}"))
+            finally:
+                segment.close()
+                segment.unlink()
+
+    def _check_workers(self):
+        """
+        Workers arrêtés brutalement : leurs tâches échouent (place et segment libérés) et chacun est relancé
+        tant que max_restarts le permet. Faux quand plus aucun worker ne reste : le pool est alors indisponible
+        et la requête se rabat sur la similarité lexicale.
+        """
+        with self._lock:
+            if self._closing:
+                return True
+            dead = [worker for worker in self._workers if not worker.is_alive()]
+            if not dead:
+                return True
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            lost = [self._current.pop(worker.pid).value for worker in dead]
+            restarts = min(len(dead), self.max_restarts - self._restarts)
+            self._restarts += restarts
+            if not self._workers and restarts == 0:
+                # Plus personne pour vider la file : toutes les tâches en attente échouent
+                self._unavailable = f"workers arrêtés, {self.max_restarts} relance(s) épuisée(s)"
+                lost = list(self._pending)
+
+        for worker in dead:
+            worker.join(timeout=0)
+            logger.error(f"Worker d'encodage {worker.pid} arrêté (code {worker.exitcode})")
+        self._fail(lost, EmbeddingWorkerLostError("Worker d'encodage arrêté avant la fin de la tâche"))
+
+        for _ in range(restarts):
+            self._spawn()
+        if self._unavailable:
+            logger.error(f"Pool d'encodage indisponible: {self._unavailable}")
+            return False
+        return True
+
+    def _fail(self, task_ids, error):
+        """Tâches qui ne reviendront pas : Future en erreur, place dans le pool et segment libérés"""
+        with self._lock:
+            entries = []
+            for task_id in task_ids:
+                entry = self._pending.pop(task_id, None)
+                if entry is not None:
+                    entries.append(entry)
+            self._lost += len(entries)
+        for future, segment, _ in entries:
+            self._slots.release()
+            self._resolve(future, error=error)
+            segment.close()
+            segment.unlink()
+
+    @staticmethod
+    def _resolve(future, result=None, error=None):
+        # La requête a pu abandonner la tâche entre-temps (Future annulée)
+        if future.cancelled():
+            return
+        try:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+        except Exception:
+            pass
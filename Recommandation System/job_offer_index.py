@@ -0,0 +1,155 @@
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from skill_index import OfferSkillIndex
+
+logger = logging.getLogger(__name__)
+
+# JobOfferStatus.Active (enum stocké en entier dans JobOffers.Status)
+OPEN_JOB_OFFER_STATUS = 0
+
+# Durée (secondes) pendant laquelle l'index est servi sans revérifier la table
+DEFAULT_MAX_STALENESS = 60
+
+JOB_OFFERS_QUERY = """
+SELECT Id, Title, Description, RequiredSkills, DepartmentId, PublishedAt
+FROM JobOffers
+WHERE Status = ?
+ORDER BY Id
+"""
+
+# Empreinte des offres ouvertes : tout ajout, modification ou fermeture change le résultat
+JOB_OFFERS_WATERMARK_QUERY = """
+SELECT
+    COUNT(*) AS OffersCount,
+    CHECKSUM_AGG(BINARY_CHECKSUM(Id, Title, Description, RequiredSkills, DepartmentId)) AS OffersChecksum
+FROM JobOffers
+WHERE Status = ?
+"""
+
+
+class JobOfferIndex:
+    """Index mémoire des offres ouvertes (compétences requises, textes prétraités), rechargé quand la table change"""
+
+    def __init__(self, db_pool, extract_skills, family_index, preprocess, max_staleness=None):
+        self.db_pool = db_pool
+        self.extract_skills = extract_skills
+        self.family_index = family_index
+        self.preprocess = preprocess
+        if max_staleness is None:
+            max_staleness = float(os.getenv('JOB_OFFER_INDEX_MAX_STALENESS', DEFAULT_MAX_STALENESS))
+        self.max_staleness = max_staleness
+
+        self._state = None       # publié en bloc : offres, index de compétences, textes prétraités
+        self._text_vectors = {}  # (version des offres, version de l'index TF-IDF) -> vecteurs des offres
+        self._watermark = None
+        self._checked_at = 0.0
+        self._loaded_at = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._version
+
+    def match_stagiaire(self, stagiaire_id, candidate_skills, department_id, tfidf_index):
+        """
+        Offres ouvertes du département et similarités (compétences, texte) du candidat avec chacune.
+        Retourne (DataFrame des offres, similarités de compétences, similarités textuelles).
+        """
+        self._refresh_if_stale()
+        state = self._state
+
+        positions = np.flatnonzero(state['offers']['DepartmentId'].to_numpy() == int(department_id))
+        offers = state['offers'].iloc[positions]
+
+        skill_similarities = state['skill_index'].similarities(candidate_skills, offers['Id'].tolist())
+
+        # Offres transformées dans le vocabulaire de l'index TF-IDF candidats (une fois par version)
+        if tfidf_index.version is None:
+            offer_vectors = tfidf_index.transform_offers([state['job_cleans'][position] for position in positions])
+        else:
+            key = (state['version'], tfidf_index.version)
+            all_vectors = self._text_vectors.get(key)
+            if all_vectors is None:
+                all_vectors = tfidf_index.transform_offers(state['job_cleans'])
+                self._text_vectors = {key: all_vectors}
+            offer_vectors = None if all_vectors is None else all_vectors[positions]
+
+        text_similarities = tfidf_index.offer_similarities(stagiaire_id, offer_vectors, state['offer_empty'][positions])
+        return offers, skill_similarities, text_similarities
+
+    def refresh(self, force=False):
+        """Recharge les offres si la table a changé (ou systématiquement avec force=True)"""
+        with self._lock:
+            conn = self.db_pool.acquire()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(JOB_OFFERS_WATERMARK_QUERY, OPEN_JOB_OFFER_STATUS)
+                row = cursor.fetchone()
+                watermark = (row[0], row[1])
+                cursor.close()
+
+                if force or self._state is None or watermark != self._watermark:
+                    offers = pd.read_sql(JOB_OFFERS_QUERY, conn, params=[OPEN_JOB_OFFER_STATUS])
+                    self._load(offers)
+                    self._watermark = watermark
+            finally:
+                conn.close()
+
+            self._checked_at = time.monotonic()
+            return self.stats()
+
+    def stats(self):
+        return {
+            'version': self._version,
+            'offers': 0 if self._state is None else len(self._state['offers']),
+            'skills': 0 if self._state is None else len(self._state['skill_index'].vocabulary),
+            'loaded_at': self._loaded_at,
+            'max_staleness': self.max_staleness
+        }
+
+    def _refresh_if_stale(self):
+        if self._state is None or time.monotonic() - self._checked_at > self.max_staleness:
+            try:
+                self.refresh()
+            except Exception as e:
+                if self._state is None:
+                    raise
+                logger.error(f"Erreur rafraîchissement des offres, index précédent conservé: {e}")
+
+    def _load(self, offers):
+        offers = offers.reset_index(drop=True)
+        offers['DepartmentId'] = pd.to_numeric(offers['DepartmentId'], errors='coerce').fillna(-1).astype(np.int64)
+
+        # Mêmes textes que get_recommendations : compétences requises, puis titre + description
+        required_skills = [
+            '' if pd.isna(skills) else str(skills) for skills in offers['RequiredSkills'].tolist()
+        ]
+        job_cleans = [
+            self.preprocess(f"{'' if pd.isna(title) else title} {'' if pd.isna(description) else description}")
+            for title, description in zip(offers['Title'].tolist(), offers['Description'].tolist())
+        ]
+
+        version = self._version + 1
+        skill_index = OfferSkillIndex.build(
+            offers['Id'].tolist(), required_skills, self.extract_skills, self.family_index, version
+        )
+
+        # Remplacement en bloc : les lecteurs gardent une vue cohérente
+        self._state = {
+            'version': version,
+            'offers': offers,
+            'skill_index': skill_index,
+            'job_cleans': job_cleans,
+            'offer_empty': np.array([not job_clean for job_clean in job_cleans], dtype=bool)
+        }
+        self._version = version
+        self._loaded_at = datetime.now().isoformat()
+        logger.info(f"Index des offres ouvertes: {len(offers)} offres (version {version})")
@@ -0,0 +1,150 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Valeurs par défaut (surchargées par RECOMMENDATION_CACHE_MAX_SIZE / RECOMMENDATION_CACHE_TTL)
+DEFAULT_RECOMMENDATION_CACHE_MAX_SIZE = 500
+DEFAULT_RECOMMENDATION_CACHE_TTL = 300   # secondes
+
+
+def _normalize_text(value):
+    """Casse et espaces sans effet sur le résultat"""
+    return ' '.join(str(value or '').lower().split())
+
+
+def _normalize_skills(value):
+    """Liste de compétences : ordre, doublons et espaces ignorés"""
+    skills = {_normalize_text(skill) for skill in str(value or '').split(',')}
+    return ','.join(sorted(skill for skill in skills if skill))
+
+
+def _normalize_department(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return _normalize_text(value)
+
+
+def offer_key(job_offer, top_n):
+    """Clé d'une demande : offre normalisée (titre, description, compétences, département) et topN"""
+    return (
+        _normalize_text(job_offer.get('title')),
+        _normalize_text(job_offer.get('description')),
+        _normalize_skills(job_offer.get('requiredSkills')),
+        _normalize_department(job_offer.get('departmentId')),
+        None if top_n is None else int(top_n)
+    )
+
+
+class RecommendationCache:
+    """
+    Cache LRU borné (taille et durée de vie) des résultats de /api/recommendations.
+
+    Les entrées sont attachées à une version du snapshot des candidats : dès que la version change
+    (ratings ou stagiaires modifiés), tout le cache est vidé, sauf si le changement a été annoncé
+    par invalidate_departments (seules les offres des départements concernés sont retirées).
+    """
+
+    def __init__(self, max_size=DEFAULT_RECOMMENDATION_CACHE_MAX_SIZE, ttl=DEFAULT_RECOMMENDATION_CACHE_TTL):
+        self.max_size = max(0, int(max_size))
+        self.ttl = float(ttl)
+
+        self._entries = OrderedDict()   # clé -> (recommandations, horodatage monotone)
+        self._version = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_size=int(os.getenv('RECOMMENDATION_CACHE_MAX_SIZE', DEFAULT_RECOMMENDATION_CACHE_MAX_SIZE)),
+            ttl=float(os.getenv('RECOMMENDATION_CACHE_TTL', DEFAULT_RECOMMENDATION_CACHE_TTL))
+        )
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, key, version):
+        """(recommandations, âge en secondes) de l'entrée valide pour cette version, ou (None, None)"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None, None
+
+            recommendations, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age > self.ttl:
+                del self._entries[key]
+                self._expired += 1
+                self._misses += 1
+                return None, None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return recommendations, age
+
+    def put(self, key, version, recommendations):
+        with self._lock:
+            self._check_version(version)
+            # Calcul commencé sur une version remplacée entre-temps : résultat non conservé
+            if version != self._version:
+                return
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (recommendations, time.monotonic())
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate_departments(self, departments, version):
+        """Retire les résultats des départements touchés par un changement ponctuel et adopte la nouvelle version"""
+        departments = {_normalize_department(department) for department in departments}
+        with self._lock:
+            # Entrées d'une version encore plus ancienne : vidées comme pour tout changement de version
+            if self._version is not None and version > self._version + 1:
+                self._check_version(version)
+                return
+            stale = [key for key in self._entries if key[3] in departments]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self._invalidations += 1
+            self._version = version if self._version is None else max(self._version, version)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'snapshot_version': self._version,
+                'hits': self._hits,
+                'misses': self._misses,
+                'expired': self._expired,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0
+            }
+
+    def _check_version(self, version):
+        # Versions croissantes : une version plus ancienne (lecteur en retard) ne vide pas le cache
+        if self._version is None or version > self._version:
+            if self._entries:
+                self._entries.clear()
+                self._invalidations += 1
+            self._version = version
@@ -0,0 +1,254 @@
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (surchargées par RECOMMENDATION_JOB_WORKERS / RECOMMENDATION_JOB_QUEUE_SIZE / RECOMMENDATION_JOB_TTL)
+DEFAULT_RECOMMENDATION_JOB_WORKERS = 2
+DEFAULT_RECOMMENDATION_JOB_QUEUE_SIZE = 50   # tâches en attente au-delà desquelles une demande est refusée
+DEFAULT_RECOMMENDATION_JOB_TTL = 600         # secondes de conservation d'une tâche terminée (résultat compris)
+
+# Étapes de get_recommendations, dans l'ordre
+JOB_STAGES = ('fetch', 'rating', 'skills', 'text', 'rank')
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+FINISHED_STATUSES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobQueueFullError(Exception):
+    """File des tâches pleine : la demande est refusée au lieu d'attendre"""
+
+
+class JobCancelledError(Exception):
+    """Annulation demandée : levée à la frontière d'étape suivante"""
+
+
+class RecommendationJob:
+    """Tâche de recommandation : statut, étape courante, résultat ou erreur"""
+
+    def __init__(self, work):
+        self.id = uuid.uuid4().hex
+        self.status = JOB_QUEUED
+        self.stage = None
+        self.completed_stages = []
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.expires_at = None     # horloge monotone, fixée à la fin de la tâche
+
+        self._work = work
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    def enter_stage(self, stage):
+        """Passage à l'étape suivante (appelé par get_recommendations) ; seul point d'arrêt d'une annulation"""
+        with self._lock:
+            if self.stage is not None:
+                self.completed_stages.append(self.stage)
+                self.stage = None
+            if self._cancel.is_set():
+                raise JobCancelledError(f"Tâche {self.id} annulée avant l'étape {stage}")
+            self.stage = stage
+
+    def cancel(self):
+        """Demande d'annulation : immédiate si la tâche attend encore, sinon à la prochaine étape"""
+        self._cancel.set()
+        with self._lock:
+            if self.status == JOB_QUEUED:
+                self.status = JOB_CANCELLED
+                self.finished_at = datetime.now()
+                return True
+            return not self.finished
+
+    def to_dict(self):
+        with self._lock:
+            payload = {
+                'jobId': self.id,
+                'status': self.status,
+                'stage': self.stage,
+                'stages': [
+                    {
+                        'name': stage,
+                        'status': 'done' if stage in self.completed_stages
+                        else 'running' if stage == self.stage and self.status == JOB_RUNNING
+                        else 'pending'
+                    }
+                    for stage in JOB_STAGES
+                ],
+                'progress': round(len(self.completed_stages) / len(JOB_STAGES), 2),
+                'cancelRequested': self._cancel.is_set(),
+                'createdAt': self.created_at.isoformat(),
+                'startedAt': self.started_at.isoformat() if self.started_at else None,
+                'finishedAt': self.finished_at.isoformat() if self.finished_at else None
+            }
+            if self.status == JOB_DONE:
+                payload['result'] = self.result
+            if self.status == JOB_FAILED:
+                payload['error'] = self.error
+            return payload
+
+    def _run(self):
+        with self._lock:
+            if self.status != JOB_QUEUED:
+                return
+            self.status = JOB_RUNNING
+            self.started_at = datetime.now()
+
+        try:
+            result = self._work(self)
+            status, error = JOB_DONE, None
+        except JobCancelledError:
+            result, status, error = None, JOB_CANCELLED, None
+        except Exception as e:
+            logger.error(f"Erreur tâche de recommandation {self.id}: {e}")
+            result, status, error = None, JOB_FAILED, str(e)
+
+        with self._lock:
+            if status == JOB_DONE:
+                # Toutes les étapes franchies (un résultat servi par le cache n'en parcourt aucune)
+                self.completed_stages = list(JOB_STAGES)
+                self.stage = None
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = datetime.now()
+
+
+class RecommendationJobManager:
+    """
+    Exécution en arrière-plan des recommandations longues : file bornée, nombre fixe de threads,
+    tâches terminées conservées `ttl` secondes pour être relues par GET /api/recommendations/jobs/<id>.
+    """
+
+    def __init__(self, workers=DEFAULT_RECOMMENDATION_JOB_WORKERS, queue_size=DEFAULT_RECOMMENDATION_JOB_QUEUE_SIZE,
+                 ttl=DEFAULT_RECOMMENDATION_JOB_TTL):
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+        self.ttl = float(ttl)
+
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._jobs = {}            # identifiant -> RecommendationJob
+        self._lock = threading.Lock()
+        self._threads = []
+
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._expired = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            workers=int(os.getenv('RECOMMENDATION_JOB_WORKERS', DEFAULT_RECOMMENDATION_JOB_WORKERS)),
+            queue_size=int(os.getenv('RECOMMENDATION_JOB_QUEUE_SIZE', DEFAULT_RECOMMENDATION_JOB_QUEUE_SIZE)),
+            ttl=float(os.getenv('RECOMMENDATION_JOB_TTL', DEFAULT_RECOMMENDATION_JOB_TTL))
+        )
+
+    def submit(self, work):
+        """
+        Met en file work(job) et retourne la tâche. work reçoit la tâche pour signaler ses étapes
+        (job.enter_stage). Lève JobQueueFullError si la file est pleine.
+        """
+        self._start()
+        self._purge()
+
+        job = RecommendationJob(work)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._rejected += 1
+                raise JobQueueFullError(f"File des tâches pleine ({self.queue_size} en attente)")
+            self._jobs[job.id] = job
+            self._submitted += 1
+        return job
+
+    def get(self, job_id):
+        """Tâche connue et non expirée, ou None"""
+        self._purge()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Demande l'annulation ; retourne la tâche (None si inconnue ou expirée)"""
+        job = self.get(job_id)
+        if job is not None and job.cancel() and job.status == JOB_CANCELLED:
+            self._finish(job)
+        return job
+
+    def stats(self):
+        self._purge()
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'ttl': self.ttl,
+                'queued': self._queue.qsize(),
+                'running': statuses.count(JOB_RUNNING),
+                'retained': len(self._jobs),
+                'submitted': self._submitted,
+                'rejected': self._rejected,
+                'completed': self._completed,
+                'failed': self._failed,
+                'cancelled': self._cancelled,
+                'expired': self._expired
+            }
+
+    def _start(self):
+        # Threads démarrés à la première tâche (aucun coût si le mode asynchrone n'est pas utilisé)
+        with self._lock:
+            if self._threads:
+                return
+            for position in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'recommendation-job-{position}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                # Tâche annulée pendant son attente : déjà terminée, ignorée par _run
+                job._run()
+                self._finish(job)
+            finally:
+                self._queue.task_done()
+
+    def _finish(self, job):
+        with self._lock:
+            if job.expires_at is not None:
+                return
+            job.expires_at = time.monotonic() + self.ttl
+            if job.status == JOB_DONE:
+                self._completed += 1
+            elif job.status == JOB_FAILED:
+                self._failed += 1
+            else:
+                self._cancelled += 1
+
+    def _purge(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.expires_at is not None and job.expires_at <= now]
+            for job_id in expired:
+                del self._jobs[job_id]
+            self._expired += len(expired)
@@ -0,0 +1,199 @@
+import os
+import time
+import threading
+import logging
+from decimal import Decimal
+from datetime import datetime, timezone
+
+import pyodbc
+
+logger = logging.getLogger(__name__)
+
+# Valeur par défaut (surchargée par RECOMMENDATION_WRITE_BATCH_SIZE)
+DEFAULT_RECOMMENDATION_WRITE_BATCH_SIZE = 1000   # lignes par envoi groupé (borne la mémoire des tableaux de paramètres)
+
+# Séparateur des raisons du match (même format que le service .NET)
+MATCH_REASONS_SEPARATOR = ';'
+
+DEACTIVATE_QUERY = """
+UPDATE JobOfferRecommendations
+SET IsActive = 0, UpdatedAt = ?
+WHERE JobOfferId = ? AND IsActive = 1
+"""
+
+INSERT_QUERY = """
+INSERT INTO JobOfferRecommendations (
+    JobOfferId, StagiaireId, StagiaireEmail, StagiaireeName, Skills, Department, University,
+    CompositeScore, SkillSimilarity, TextSimilarity, DepartmentMatch, RecommendationRank,
+    MatchReasons, GeneratedAt, IsViewed, IsContacted, IsSelected, IsActive, CreatedAt
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 0, 1, ?)
+"""
+
+# Types des paramètres de INSERT_QUERY (colonnes de l'entité JobOfferRecommendation) :
+# tampons dimensionnés une fois au lieu d'être déduits de la première ligne
+INSERT_INPUT_SIZES = [
+    (pyodbc.SQL_INTEGER, 0, 0),            # JobOfferId
+    (pyodbc.SQL_INTEGER, 0, 0),            # StagiaireId
+    (pyodbc.SQL_WVARCHAR, 255, 0),         # StagiaireEmail
+    (pyodbc.SQL_WVARCHAR, 255, 0),         # StagiaireeName
+    (pyodbc.SQL_WVARCHAR, 2000, 0),        # Skills
+    (pyodbc.SQL_WVARCHAR, 255, 0),         # Department
+    (pyodbc.SQL_WVARCHAR, 255, 0),         # University
+    (pyodbc.SQL_DECIMAL, 5, 4),            # CompositeScore
+    (pyodbc.SQL_DECIMAL, 5, 4),            # SkillSimilarity
+    (pyodbc.SQL_DECIMAL, 5, 4),            # TextSimilarity
+    (pyodbc.SQL_BIT, 0, 0),                # DepartmentMatch
+    (pyodbc.SQL_INTEGER, 0, 0),            # RecommendationRank
+    (pyodbc.SQL_WVARCHAR, 1000, 0),        # MatchReasons
+    (pyodbc.SQL_TYPE_TIMESTAMP, 27, 7),    # GeneratedAt
+    (pyodbc.SQL_TYPE_TIMESTAMP, 27, 7),    # CreatedAt
+]
+
+# Bornes et pas de decimal(5,4)
+MAX_SCORE = 9.9999
+SCORE_STEP = Decimal('0.0001')
+
+
+def _truncate(value, max_length):
+    """Texte borné à la taille de la colonne nvarchar (comptée en unités UTF-16, comme SQL Server)"""
+    text = '' if value is None else str(value)
+    encoded = text.encode('utf-16-le')
+    if len(encoded) <= 2 * max_length:
+        return text
+    # Coupure au milieu d'une paire de substitution (emoji) : caractère incomplet retiré
+    return encoded[:2 * max_length].decode('utf-16-le', errors='ignore')
+
+
+def _score(value):
+    """Score en Decimal à 4 décimales : type attendu par le paramètre SQL_DECIMAL(5,4) de fast_executemany"""
+    try:
+        score = min(max(float(value), 0.0), MAX_SCORE)
+    except (TypeError, ValueError):
+        score = 0.0
+    if score != score:   # NaN
+        score = 0.0
+    return Decimal(repr(score)).quantize(SCORE_STEP)
+
+
+def recommendation_rows(job_offer_id, recommendations, generated_at):
+    """Paramètres de INSERT_QUERY : une ligne par recommandation, rang = position dans la liste"""
+    rows = []
+    for rank, recommendation in enumerate(recommendations, start=1):
+        reasons = recommendation.get('matchReasons') or []
+        if not isinstance(reasons, str):
+            reasons = MATCH_REASONS_SEPARATOR.join(str(reason) for reason in reasons)
+        rows.append((
+            int(job_offer_id),
+            int(recommendation['stagiaireId']),
+            _truncate(recommendation.get('email'), 255),
+            _truncate(recommendation.get('name'), 255),
+            _truncate(recommendation.get('skills'), 2000),
+            _truncate(recommendation.get('department'), 255),
+            _truncate(recommendation.get('university'), 255),
+            _score(recommendation.get('compositeScore')),
+            _score(recommendation.get('skillSimilarity')),
+            _score(recommendation.get('textSimilarity')),
+            bool(recommendation.get('departmentMatch', False)),
+            rank,
+            _truncate(reasons, 1000),
+            generated_at,
+            generated_at
+        ))
+    return rows
+
+
+class RecommendationWriter:
+    """
+    Enregistrement d'une liste classée dans JobOfferRecommendations, en une transaction :
+    désactivation (IsActive = 0) des lignes actives de l'offre puis insertion groupée des nouvelles
+    (requête paramétrée, pyodbc fast_executemany : un aller-retour par lot au lieu d'un par ligne).
+    """
+
+    def __init__(self, db_pool, batch_size=DEFAULT_RECOMMENDATION_WRITE_BATCH_SIZE):
+        self.db_pool = db_pool
+        self.batch_size = max(1, int(batch_size))
+
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._rows = 0
+        self._deactivated = 0
+        self._errors = 0
+        self._last_duration = None
+
+    @classmethod
+    def from_env(cls, db_pool):
+        return cls(
+            db_pool,
+            batch_size=int(os.getenv('RECOMMENDATION_WRITE_BATCH_SIZE', DEFAULT_RECOMMENDATION_WRITE_BATCH_SIZE))
+        )
+
+    def save(self, job_offer_id, recommendations):
+        """
+        Remplace les recommandations actives de l'offre par `recommendations` (ordre = rang).
+        Tout ou rien : en cas d'erreur la transaction est annulée et les anciennes lignes restent actives.
+        """
+        started = time.perf_counter()
+        generated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        rows = recommendation_rows(job_offer_id, recommendations, generated_at)
+
+        conn = self.db_pool.acquire()
+        try:
+            deactivated = self.execute(conn, job_offer_id, rows, generated_at)
+            conn.commit()
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            try:
+                conn.rollback()
+            except Exception:
+                # Connexion inutilisable : fermée au lieu d'être rendue au pool
+                conn.invalidate()
+            raise
+        finally:
+            conn.close()
+
+        duration = time.perf_counter() - started
+        with self._lock:
+            self._writes += 1
+            self._rows += len(rows)
+            self._deactivated += deactivated
+            self._last_duration = duration
+
+        logger.info(f"Recommandations enregistrées pour l'offre {job_offer_id}: {len(rows)} insérées, "
+                    f"{deactivated} désactivées ({duration * 1000:.0f} ms)")
+
+        return {
+            'jobOfferId': int(job_offer_id),
+            'inserted': len(rows),
+            'deactivated': deactivated,
+            'generatedAt': generated_at.isoformat(),
+            'duration_ms': round(duration * 1000, 1)
+        }
+
+    def execute(self, conn, job_offer_id, rows, generated_at):
+        """
+        Désactivation puis insertion groupée sur `conn`, sans valider la transaction
+        (save() valide ; benchmark_recommendation_writer.py annule). Retourne le nombre de lignes désactivées.
+        """
+        cursor = conn.cursor()
+        cursor.execute(DEACTIVATE_QUERY, generated_at, int(job_offer_id))
+        deactivated = max(cursor.rowcount, 0)
+
+        if rows:
+            cursor.fast_executemany = True
+            cursor.setinputsizes(INSERT_INPUT_SIZES)
+            for start in range(0, len(rows), self.batch_size):
+                cursor.executemany(INSERT_QUERY, rows[start:start + self.batch_size])
+        cursor.close()
+        return deactivated
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batch_size': self.batch_size,
+                'writes': self._writes,
+                'rows': self._rows,
+                'deactivated': self._deactivated,
+                'errors': self._errors,
+                'last_duration_ms': None if self._last_duration is None else round(self._last_duration * 1000, 1)
+            }
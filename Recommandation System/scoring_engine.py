@@ -0,0 +1,116 @@
+import numpy as np
+
+# Pondérations du score composite (ratings prioritaires)
+RATING_WEIGHT = 0.6
+SKILL_WEIGHT = 0.3
+TEXT_WEIGHT = 0.1
+
+# Score de rating appliqué aux stagiaires sans évaluation
+NO_RATING_SCORE = 0.4
+
+# Bonus multiplicatifs selon le nombre d'évaluations
+MANY_RATINGS_COUNT = 3
+MANY_RATINGS_MULTIPLIER = 1.1
+SEVERAL_RATINGS_COUNT = 2
+SEVERAL_RATINGS_MULTIPLIER = 1.05
+
+# Bonus pour excellence (note élevée + compétences solides)
+EXCELLENCE_BONUS = 0.15
+EXCELLENCE_MIN_RATING = 4.0
+EXCELLENCE_MIN_SKILL = 0.5
+
+# Seuils d'élimination
+MIN_SKILL_SIMILARITY = 0.2
+MIN_COMPOSITE_SCORE = 0.3
+
+
+def compute_rating_scores(avg_ratings, rating_counts, has_ratings):
+    """Score de rating (0 à ~1.1) pour chaque candidat"""
+    avg_ratings = np.asarray(avg_ratings, dtype=float)
+    rating_counts = np.asarray(rating_counts, dtype=np.int64)
+    has_ratings = np.asarray(has_ratings, dtype=bool)
+
+    multipliers = np.where(
+        rating_counts >= MANY_RATINGS_COUNT, MANY_RATINGS_MULTIPLIER,
+        np.where(rating_counts >= SEVERAL_RATINGS_COUNT, SEVERAL_RATINGS_MULTIPLIER, 1.0)
+    )
+    rated = has_ratings & (rating_counts > 0)
+
+    # Même ordre d'opérations que le calcul scalaire historique (note / 5, puis bonus)
+    return np.where(rated, (avg_ratings / 5.0) * multipliers, NO_RATING_SCORE)
+
+
+def compute_composite_scores(rating_scores, avg_ratings, skill_similarities, text_similarities):
+    """Score composite non plafonné (bonus excellence inclus) ; accepte des matrices offres x candidats"""
+    composite_scores = (rating_scores * RATING_WEIGHT) + (skill_similarities * SKILL_WEIGHT) + (text_similarities * TEXT_WEIGHT)
+
+    excellence = (avg_ratings >= EXCELLENCE_MIN_RATING) & (skill_similarities > EXCELLENCE_MIN_SKILL)
+    return np.where(excellence, composite_scores + EXCELLENCE_BONUS, composite_scores)
+
+
+def score_candidates(avg_ratings, rating_counts, has_ratings, skill_similarities, text_similarities):
+    """
+    Calcule en une passe les scores composites de tous les candidats.
+
+    Retourne les positions des candidats retenus (ordre d'origine) et leurs scores :
+    {'indices', 'composite_scores', 'rating_scores', 'skill_similarities',
+     'text_similarities', 'rejected_skills', 'rejected_composite'}
+    """
+    avg_ratings = np.asarray(avg_ratings, dtype=float)
+    skill_similarities = np.asarray(skill_similarities, dtype=float)
+    text_similarities = np.asarray(text_similarities, dtype=float)
+
+    rating_scores = compute_rating_scores(avg_ratings, rating_counts, has_ratings)
+    composite_scores = compute_composite_scores(rating_scores, avg_ratings, skill_similarities, text_similarities)
+
+    skills_ok = skill_similarities >= MIN_SKILL_SIMILARITY
+    composite_ok = composite_scores >= MIN_COMPOSITE_SCORE
+    indices = np.flatnonzero(skills_ok & composite_ok)
+
+    return {
+        'indices': indices,
+        'composite_scores': np.minimum(composite_scores[indices], 1.0),
+        'rating_scores': rating_scores[indices],
+        'skill_similarities': skill_similarities[indices],
+        'text_similarities': text_similarities[indices],
+        'rejected_skills': int((~skills_ok).sum()),
+        'rejected_composite': int((skills_ok & ~composite_ok).sum())
+    }
+
+
+def score_candidate_matrix(avg_ratings, rating_counts, has_ratings, skill_matrix, text_matrix):
+    """
+    Scores de plusieurs offres contre les mêmes candidats (matrices offres x candidats).
+
+    Retourne {'rating_scores' (par candidat), 'composite_scores' (plafonnés), 'qualified'}
+    """
+    avg_ratings = np.asarray(avg_ratings, dtype=float)
+    skill_matrix = np.asarray(skill_matrix, dtype=float)
+    text_matrix = np.asarray(text_matrix, dtype=float)
+
+    # Le rating ne dépend pas de l'offre : calculé une fois, diffusé sur chaque ligne
+    rating_scores = compute_rating_scores(avg_ratings, rating_counts, has_ratings)
+    composite_scores = compute_composite_scores(rating_scores, avg_ratings, skill_matrix, text_matrix)
+
+    return {
+        'rating_scores': rating_scores,
+        'composite_scores': np.minimum(composite_scores, 1.0),
+        'qualified': (skill_matrix >= MIN_SKILL_SIMILARITY) & (composite_scores >= MIN_COMPOSITE_SCORE)
+    }
+
+
+def rank_candidates(composite_scores, top_n):
+    """
+    Positions des top_n meilleurs scores (tri stable décroissant, ex aequo dans l'ordre d'origine).
+    top_n None : tous les candidats, comme recommendations[:None] avant la vectorisation.
+    """
+    negated = -np.asarray(composite_scores, dtype=float)
+    if top_n is None or top_n < 0 or top_n >= len(negated):
+        return np.argsort(negated, kind='stable')[:top_n]
+    if top_n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Sélection partielle O(n) : seuil du top_n-ième score, puis tri des seuls candidats au-dessus
+    threshold = np.partition(negated, top_n - 1)[top_n - 1]
+    selected = np.flatnonzero(negated <= threshold)
+    return selected[np.argsort(negated[selected], kind='stable')[:top_n]]
@@ -0,0 +1,142 @@
+import os
+import json
+import atexit
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (surchargées par SKILL_CACHE_MAX_SIZE / SKILL_CACHE_PATH)
+DEFAULT_SKILL_CACHE_MAX_SIZE = 20000
+# Nombre de nouvelles entrées avant une sauvegarde intermédiaire du fichier
+SAVE_EVERY_NEW_ENTRIES = 500
+
+
+def content_hash(text):
+    """Empreinte du texte brut de compétences"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SkillExtractionCache:
+    """Cache LRU borné des compétences extraites, indexé par empreinte du texte brut"""
+
+    def __init__(self, max_size=DEFAULT_SKILL_CACHE_MAX_SIZE, path=None, namespace=''):
+        """
+        path      : fichier JSON optionnel pour garder le cache chaud entre redémarrages
+        namespace : empreinte des règles d'extraction (un fichier d'une autre version est ignoré)
+        """
+        self.max_size = max(1, int(max_size))
+        self.path = path
+        self.namespace = namespace
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._unsaved = 0
+
+        if self.path:
+            self._load()
+            atexit.register(self.save)
+
+    @classmethod
+    def from_env(cls, namespace=''):
+        return cls(
+            max_size=int(os.getenv('SKILL_CACHE_MAX_SIZE', DEFAULT_SKILL_CACHE_MAX_SIZE)),
+            path=os.getenv('SKILL_CACHE_PATH') or None,
+            namespace=namespace
+        )
+
+    def get_or_compute(self, text, compute):
+        """Compétences de `text`, calculées par compute(text) seulement au premier passage"""
+        key = content_hash(text)
+
+        with self._lock:
+            skills = self._entries.get(key)
+            if skills is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return list(skills)
+            self._misses += 1
+
+        skills = tuple(compute(text))
+
+        with self._lock:
+            self._store(key, skills)
+            should_save = self.path and self._unsaved >= SAVE_EVERY_NEW_ENTRIES
+
+        if should_save:
+            self.save()
+
+        return list(skills)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'persistent': bool(self.path)
+            }
+
+    def save(self):
+        """Écrit le cache sur disque (écriture atomique)"""
+        if not self.path:
+            return
+
+        with self._lock:
+            payload = {
+                'namespace': self.namespace,
+                'entries': [[key, list(skills)] for key, skills in self._entries.items()]
+            }
+            self._unsaved = 0
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Sauvegarde du cache de compétences impossible ({self.path}): {e}")
+
+    def _store(self, key, skills):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        self._entries[key] = skills
+        self._unsaved += 1
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cache de compétences illisible ({self.path}), ignoré: {e}")
+            return
+
+        if payload.get('namespace') != self.namespace:
+            logger.info("Cache de compétences d'une autre version des règles d'extraction, ignoré")
+            return
+
+        # Les entrées sont écrites de la moins à la plus récemment utilisée
+        for key, skills in payload.get('entries', [])[-self.max_size:]:
+            self._entries[key] = tuple(skills)
+
+        logger.info(f"Cache de compétences chargé: {len(self._entries)} entrées ({self.path})")
@@ -0,0 +1,77 @@
+import threading
+
+import numpy as np
+
+from skill_matcher import SkillMatcher
+
+# Familles de compétences : deux compétences contenant un mot-clé d'une même famille sont liées
+SKILL_FAMILIES = {
+    'frontend': ['react', 'angular', 'vue', 'javascript', 'typescript', 'html', 'css'],
+    'backend': ['node', 'python', 'java', 'csharp', 'php', 'dotnet'],
+    'database': ['sql', 'nosql', 'mysql', 'mongodb', 'postgresql'],
+    'mobile': ['ios', 'android', 'react native', 'flutter', 'swift', 'kotlin'],
+    'data': ['data', 'analytics', 'ai', 'ml'],
+    'design': ['design', 'ui', 'ux', 'photoshop', 'figma'],
+    'cloud': ['aws', 'azure', 'cloud', 'devops']
+}
+
+
+class SkillFamilyIndex:
+    """Masque de familles (un bit par famille) calculé une fois par compétence normalisée"""
+
+    def __init__(self, families=None):
+        self.families = list((families or SKILL_FAMILIES).items())
+        self.family_names = [name for name, _ in self.families]
+
+        # Mot-clé -> bits des familles qui le citent
+        keyword_masks = {}
+        for bit, (_, keywords) in enumerate(self.families):
+            for keyword in keywords:
+                keyword_masks[keyword] = keyword_masks.get(keyword, 0) | (1 << bit)
+        self._matcher = SkillMatcher(keyword_masks)
+
+        self._masks = {}
+        self._lock = threading.Lock()
+
+    def mask(self, skill):
+        """Bits des familles dont au moins un mot-clé est contenu dans `skill`"""
+        mask = self._masks.get(skill)
+        if mask is None:
+            mask = 0
+            for keyword in self._matcher.find_all(skill):
+                mask |= self._matcher.patterns[keyword]
+            with self._lock:
+                self._masks[skill] = mask
+        return mask
+
+    def masks(self, skills):
+        return np.fromiter((self.mask(skill) for skill in skills), dtype=np.int64, count=len(skills))
+
+    def are_related(self, skill1, skill2):
+        """Inclusion de l'une dans l'autre, ou famille commune"""
+        if skill1 in skill2 or skill2 in skill1:
+            return True
+        return bool(self.mask(skill1) & self.mask(skill2))
+
+    def related_pairs(self, job_skills, candidate_skills):
+        """Matrice booléenne (offre x candidat) des paires de compétences liées"""
+        job_skills = list(job_skills)
+        candidate_skills = list(candidate_skills)
+
+        related = (self.masks(job_skills)[:, None] & self.masks(candidate_skills)[None, :]) != 0
+
+        # Paires sans famille commune : reste le test d'inclusion
+        for i, j in zip(*np.nonzero(~related)):
+            job_skill, candidate_skill = job_skills[i], candidate_skills[j]
+            if job_skill in candidate_skill or candidate_skill in job_skill:
+                related[i, j] = True
+        return related
+
+    def count_related_pairs(self, job_skills, candidate_skills):
+        return int(self.related_pairs(job_skills, candidate_skills).sum())
+
+    def stats(self):
+        return {
+            'families': len(self.families),
+            'indexed_skills': len(self._masks)
+        }
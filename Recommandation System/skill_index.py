@@ -0,0 +1,258 @@
+import logging
+from collections import ChainMap
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+# Similarité appliquée quand l'offre ou le candidat n'a aucune compétence exploitable (comportement historique)
+DEFAULT_SKILL_SIMILARITY = 0.1
+
+# Pondérations correspondances exactes / partielles
+EXACT_MATCH_WEIGHT = 0.8
+PARTIAL_MATCH_WEIGHT = 0.2
+
+# Bonus de couverture : (ratio minimum, bonus), du plus exigeant au moins exigeant
+COVERAGE_BONUSES = [(1.0, 0.3), (0.8, 0.25), (0.6, 0.2), (0.4, 0.1)]
+
+EMPTY_SKILLS_VALUES = ('none', 'null', '')
+
+
+def skill_match_scores(exact, partial, job_counts):
+    """Score de compétences à partir des nombres de correspondances exactes / partielles et de compétences de l'offre"""
+    final = (exact / job_counts) * EXACT_MATCH_WEIGHT + (partial / job_counts) * PARTIAL_MATCH_WEIGHT
+
+    coverage = (exact + partial) / job_counts
+    final = final + np.select(
+        [coverage >= ratio for ratio, _ in COVERAGE_BONUSES],
+        [bonus for _, bonus in COVERAGE_BONUSES],
+        default=0.0
+    )
+    return np.minimum(final, 1.0)
+
+
+class SkillIncidenceIndex:
+    """
+    Matrice d'incidence creuse lignes x compétences normalisées (CSR), vocabulaire à identifiants entiers.
+
+    Un index n'est jamais modifié : updated() retourne un nouvel index qui partage la matrice
+    et n'ajoute que les lignes remplacées (lecteurs concurrents sans verrou).
+    """
+
+    # Textes considérés comme vides avant extraction
+    empty_values = ()
+
+    def __init__(self, vocabulary, matrix, family_matrix, row_by_id, family_index, version=None, appended=()):
+        self.vocabulary = vocabulary          # compétence -> colonne
+        self.skills = np.array(list(vocabulary), dtype=object)
+        self.family_matrix = family_matrix    # compétences x familles (0/1)
+        self.row_by_id = row_by_id
+        self.family_index = family_index
+        self.version = version
+        self._base = matrix                   # lignes x compétences (0/1)
+        self._appended = list(appended)       # colonnes des lignes ajoutées après _base
+        self._matrix = matrix if not self._appended else None
+
+    @property
+    def matrix(self):
+        """Matrice complète, lignes ajoutées empilées au premier usage"""
+        if self._matrix is None:
+            indptr = np.cumsum([0] + [len(columns) for columns in self._appended])
+            indices = np.array([column for columns in self._appended for column in columns], dtype=np.int64)
+            appended = sparse.csr_matrix((np.ones(len(indices)), indices, indptr),
+                                         shape=(len(self._appended), len(self.vocabulary)))
+            base = sparse.csr_matrix((self._base.data, self._base.indices, self._base.indptr),
+                                     shape=(self._base.shape[0], len(self.vocabulary)))
+            self._matrix = sparse.vstack([base, appended], format='csr')
+        return self._matrix
+
+    @property
+    def appended_rows(self):
+        """Lignes ajoutées par updated() depuis la construction (les lignes remplacées restent dans la matrice)"""
+        return len(self._appended)
+
+    @classmethod
+    def build(cls, row_ids, skills_texts, extract_skills, family_index, version=None):
+        """Extrait les compétences de chaque ligne et construit les matrices creuses"""
+        vocabulary = {}
+        indices = []
+        indptr = [0]
+
+        for text in skills_texts:
+            skills = [] if not text or text.lower() in cls.empty_values else extract_skills(text)
+            for skill in set(skills):
+                indices.append(vocabulary.setdefault(skill, len(vocabulary)))
+            indptr.append(len(indices))
+
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices)), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(skills_texts), len(vocabulary))
+        )
+        family_matrix = cls._family_matrix(list(vocabulary), family_index)
+        row_by_id = {int(row_id): row for row, row_id in enumerate(row_ids)}
+
+        logger.info(f"{cls.__name__} construit: {len(row_by_id)} lignes, "
+                    f"{len(vocabulary)} compétences, {matrix.nnz} liens (version {version})")
+
+        return cls(vocabulary, matrix, family_matrix, row_by_id, family_index, version)
+
+    def updated(self, row_ids, skills_texts, extract_skills, version=None):
+        """
+        Index avec ces lignes remplacées (ou ajoutées) : nouvelles lignes en fin de matrice,
+        nouvelles compétences en fin de vocabulaire. Coût indépendant du nombre de lignes existantes.
+        """
+        vocabulary = dict(self.vocabulary)
+        appended = list(self._appended)
+
+        rows = {}
+        for row_id, text in zip(row_ids, skills_texts):
+            skills = [] if not text or text.lower() in self.empty_values else extract_skills(text)
+            appended.append(sorted({vocabulary.setdefault(skill, len(vocabulary)) for skill in skills}))
+            rows[int(row_id)] = self._base.shape[0] + len(appended) - 1
+
+        family_matrix = self.family_matrix
+        if len(vocabulary) > len(self.vocabulary):
+            new_skills = list(vocabulary)[len(self.vocabulary):]
+            family_matrix = sparse.vstack(
+                [family_matrix, self._family_matrix(new_skills, self.family_index)], format='csr'
+            )
+
+        # Deux niveaux : lignes remplacées depuis la construction, puis lignes d'origine
+        replaced, built = (self.row_by_id.maps if isinstance(self.row_by_id, ChainMap) else ({}, self.row_by_id))
+        row_by_id = ChainMap({**replaced, **rows}, built)
+        return type(self)(vocabulary, self._base, family_matrix, row_by_id, self.family_index, version, appended)
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'rows': len(self.row_by_id),
+            'skills': len(self.vocabulary),
+            'links': int(self.matrix.nnz),
+            'appended_rows': self.appended_rows
+        }
+
+    def _rows(self, row_ids):
+        rows = np.array([self.row_by_id.get(int(i), -1) for i in row_ids], dtype=np.int64)
+        return rows, rows >= 0
+
+    def _skill_vector(self, skills):
+        vector = np.zeros(len(self.vocabulary))
+        for skill in skills:
+            column = self.vocabulary.get(skill)
+            if column is not None:
+                vector[column] = 1.0
+        return vector
+
+    def _related_counts(self, job_skills):
+        """Pour chaque compétence du vocabulaire : nombre de compétences de `job_skills` liées"""
+        # Famille commune : produit compétences x familles contre familles x compétences de l'offre
+        job_families = self._family_matrix(job_skills, self.family_index).T
+        related = (self.family_matrix @ job_families).toarray() > 0
+
+        # Inclusion de l'une dans l'autre (même sémantique que SkillFamilyIndex.are_related)
+        for position, job_skill in enumerate(job_skills):
+            containing = np.fromiter((job_skill in skill for skill in self.skills), dtype=bool, count=len(self.skills))
+            related[:, position] |= containing
+            for column in self._contained_columns(job_skill):
+                related[column, position] = True
+
+        return related.sum(axis=1).astype(float)
+
+    def _contained_columns(self, text):
+        """Colonnes des compétences du vocabulaire qui sont des sous-chaînes de `text`"""
+        columns = set()
+        for start in range(len(text)):
+            for end in range(start + 1, len(text) + 1):
+                column = self.vocabulary.get(text[start:end])
+                if column is not None:
+                    columns.add(column)
+        return columns
+
+    @staticmethod
+    def _family_matrix(skills, family_index):
+        rows, columns = [], []
+        for row, skill in enumerate(skills):
+            mask = family_index.mask(skill)
+            bit = 0
+            while mask:
+                if mask & 1:
+                    rows.append(row)
+                    columns.append(bit)
+                mask >>= 1
+                bit += 1
+        return sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, columns)),
+            shape=(len(skills), len(family_index.families))
+        )
+
+
+class CandidateSkillIndex(SkillIncidenceIndex):
+    """Candidats x compétences : similarité de chaque candidat avec une ou plusieurs offres"""
+
+    empty_values = EMPTY_SKILLS_VALUES
+
+    def similarities(self, job_skills, stagiaire_ids):
+        """Similarité de compétences offre/candidat pour tous les candidats demandés en une fois"""
+        return self.similarity_matrix([job_skills], stagiaire_ids)[0]
+
+    def similarity_matrix(self, job_skills_lists, stagiaire_ids):
+        """Similarités offres x candidats : un produit creux pour toutes les offres"""
+        stagiaire_ids = [int(i) for i in stagiaire_ids]
+        result = np.full((len(job_skills_lists), len(stagiaire_ids)), DEFAULT_SKILL_SIMILARITY, dtype=float)
+
+        job_skills_lists = [list(dict.fromkeys(job_skills)) for job_skills in job_skills_lists]
+        offers = np.array([bool(job_skills) for job_skills in job_skills_lists], dtype=bool)
+        if not offers.any() or not self.vocabulary:
+            return result
+
+        rows, known = self._rows(stagiaire_ids)
+        if not known.any():
+            return result
+
+        candidates = self.matrix[rows[known]]
+        has_skills = np.diff(candidates.indptr) > 0
+        offer_positions = np.flatnonzero(offers)
+
+        # Une colonne par offre : compétences exactes (0/1) et nombre de compétences de l'offre liées
+        job_vectors = np.zeros((len(self.vocabulary), len(offer_positions)))
+        related_counts = np.zeros((len(self.vocabulary), len(offer_positions)))
+        for column, offer in enumerate(offer_positions):
+            job_vectors[:, column] = self._skill_vector(job_skills_lists[offer])
+            related_counts[:, column] = self._related_counts(job_skills_lists[offer])
+
+        # Correspondances exactes et partielles (paires liées) de chaque candidat pour chaque offre
+        exact = (candidates @ job_vectors).T
+        partial = (candidates @ related_counts).T
+
+        job_counts = np.array([len(job_skills_lists[offer]) for offer in offer_positions], dtype=float)[:, None]
+        scores = np.where(has_skills, skill_match_scores(exact, partial, job_counts), DEFAULT_SKILL_SIMILARITY)
+        result[np.ix_(offer_positions, np.flatnonzero(known))] = scores
+        return result
+
+
+class OfferSkillIndex(SkillIncidenceIndex):
+    """Offres x compétences requises : similarité d'un candidat avec toutes les offres en un produit creux"""
+
+    def similarities(self, candidate_skills, offer_ids):
+        """Même score que CandidateSkillIndex (relation symétrique), lignes = offres"""
+        result = np.full(len(offer_ids), DEFAULT_SKILL_SIMILARITY, dtype=float)
+
+        candidate_skills = list(dict.fromkeys(candidate_skills))
+        if not candidate_skills or not self.vocabulary:
+            return result
+
+        rows, known = self._rows(offer_ids)
+        if not known.any():
+            return result
+
+        offers = self.matrix[rows[known]]
+        job_counts = np.diff(offers.indptr).astype(float)
+        has_skills = job_counts > 0
+
+        exact = offers @ self._skill_vector(candidate_skills)
+        partial = offers @ self._related_counts(candidate_skills)
+
+        scores = skill_match_scores(exact, partial, np.where(has_skills, job_counts, 1.0))
+        result[known] = np.where(has_skills, scores, DEFAULT_SKILL_SIMILARITY)
+        return result
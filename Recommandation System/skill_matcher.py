@@ -0,0 +1,146 @@
+from collections import deque
+
+# Version des règles de correspondance (entre dans l'empreinte du cache de compétences)
+MATCHER_VERSION = 'longest-match-1'
+
+
+class SkillMatcher:
+    """
+    Automate Aho-Corasick compilé une fois à partir d'un dictionnaire motif -> valeur.
+
+    - find_all / contains_any / longest_match : motifs présents dans un texte, en un seul parcours
+    - containing : valeur du motif qui contient un fragment (trie des suffixes des motifs)
+    - normalize : correspondance exacte, sinon motif le plus long contenu dans le texte,
+      sinon motif le plus court contenant le texte ; temps linéaire en la longueur du texte
+    """
+
+    def __init__(self, patterns):
+        # Ordre d'insertion conservé : départage déterministe des ex aequo
+        self.patterns = {}
+        for pattern, value in patterns.items():
+            pattern = pattern.lower()
+            if pattern and pattern not in self.patterns:
+                self.patterns[pattern] = value
+
+        self._goto = [{}]
+        self._fail = [0]
+        self._terminal = [None]   # motif se terminant exactement sur ce nœud
+        self._longest = [None]    # plus long motif reconnu en ce nœud (lui-même ou via les liens d'échec)
+        self._outputs = [()]      # tous les motifs reconnus en ce nœud
+        self._build_automaton()
+
+        self._suffix_goto = [{}]
+        self._suffix_best = [None]  # motif le plus court passant par ce nœud
+        self._build_suffix_trie()
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def normalize(self, text):
+        """Valeur normalisée de `text` (inchangé si aucun motif ne correspond)"""
+        if not text:
+            return text
+        if text in self.patterns:
+            return self.patterns[text]
+
+        pattern = self.longest_match(text)
+        if pattern is None:
+            pattern = self._containing_pattern(text)
+        return text if pattern is None else self.patterns[pattern]
+
+    def longest_match(self, text):
+        """Plus long motif présent dans `text` (le plus à gauche en cas d'égalité)"""
+        best = None
+        node = 0
+        for char in text:
+            node = self._step(node, char)
+            candidate = self._longest[node]
+            if candidate is not None and (best is None or len(candidate) > len(best)):
+                best = candidate
+        return best
+
+    def find_all(self, text):
+        """Ensemble des motifs présents dans `text`"""
+        found = set()
+        node = 0
+        for char in text:
+            node = self._step(node, char)
+            found.update(self._outputs[node])
+        return found
+
+    def contains_any(self, text):
+        """Vrai si au moins un motif est présent dans `text`"""
+        node = 0
+        for char in text:
+            node = self._step(node, char)
+            if self._longest[node] is not None:
+                return True
+        return False
+
+    def containing(self, fragment):
+        """Valeur du motif le plus court qui contient `fragment` (None sinon)"""
+        pattern = self._containing_pattern(fragment)
+        return None if pattern is None else self.patterns[pattern]
+
+    def _step(self, node, char):
+        while char not in self._goto[node] and node:
+            node = self._fail[node]
+        return self._goto[node].get(char, 0)
+
+    def _containing_pattern(self, fragment):
+        if not fragment:
+            return None
+        node = 0
+        for char in fragment:
+            node = self._suffix_goto[node].get(char)
+            if node is None:
+                return None
+        return self._suffix_best[node]
+
+    def _build_automaton(self):
+        for pattern in self.patterns:
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._terminal.append(None)
+                    self._longest.append(None)
+                    self._outputs.append(())
+                node = next_node
+            self._terminal[node] = pattern
+
+        # Parcours en largeur : le lien d'échec d'un nœud est toujours traité avant lui
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            fail = self._fail[node]
+            own = self._terminal[node]
+            self._longest[node] = own if own is not None else self._longest[fail]
+            self._outputs[node] = ((own,) if own is not None else ()) + self._outputs[fail]
+
+            for char, child in self._goto[node].items():
+                state = fail
+                while char not in self._goto[state] and state:
+                    state = self._fail[state]
+                self._fail[child] = self._goto[state].get(char, 0)
+                queue.append(child)
+
+    def _build_suffix_trie(self):
+        for pattern in self.patterns:
+            for start in range(len(pattern)):
+                node = 0
+                for char in pattern[start:]:
+                    next_node = self._suffix_goto[node].get(char)
+                    if next_node is None:
+                        next_node = len(self._suffix_goto)
+                        self._suffix_goto[node][char] = next_node
+                        self._suffix_goto.append({})
+                        self._suffix_best.append(None)
+                    node = next_node
+                    best = self._suffix_best[node]
+                    if best is None or len(pattern) < len(best):
+                        self._suffix_best[node] = pattern
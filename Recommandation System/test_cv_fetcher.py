@@ -0,0 +1,371 @@
+"""
+Tests de CVFetcher contre un serveur http.server local (thread) : nouvelles tentatives, limites de
+parallélisme, taille maximale, ordre d'arrivée de fetch_many, cache disque (revalidation ETag, LRU).
+
+    python -m pytest -q test_cv_fetcher.py
+"""
+import os
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from cv_cache import CVCache
+from cv_fetcher import CVFetcher
+
+
+class StandInServer:
+    """
+    Serveur de CVs factice. Paramètres de requête :
+      delay=0.2          durée de la réponse (secondes)
+      size=100           taille du contenu
+      statuses=503,200   code renvoyé à chaque appel successif du même chemin (dernier répété)
+      retry_after=1      en-tête Retry-After des réponses 429/503
+      etag=v1            ETag des réponses 200 ; 304 si la requête envoie If-None-Match identique
+    Concurrence observée par hôte (en-tête Host) et au total, en-têtes de la dernière requête par chemin.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.request_headers = {}
+        self.active = {}
+        self.max_active = {}
+        self.total_active = 0
+        self.max_total_active = 0
+        self.server = ThreadingHTTPServer(('0.0.0.0', 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_port
+
+    def url(self, path, host='127.0.0.1'):
+        return f"http://{host}:{self.port}{path}"
+
+    def reset(self):
+        with self.lock:
+            self.calls.clear()
+            self.request_headers.clear()
+            self.max_active.clear()
+            self.max_total_active = 0
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                host = self.headers.get('Host', '').split(':')[0]
+
+                with stand_in.lock:
+                    call = stand_in.calls[self.path] = stand_in.calls.get(self.path, 0) + 1
+                    stand_in.request_headers[self.path] = dict(self.headers)
+                    stand_in.active[host] = stand_in.active.get(host, 0) + 1
+                    stand_in.max_active[host] = max(stand_in.max_active.get(host, 0), stand_in.active[host])
+                    stand_in.total_active += 1
+                    stand_in.max_total_active = max(stand_in.max_total_active, stand_in.total_active)
+                try:
+                    time.sleep(float(params.get('delay', 0)))
+                    statuses = [int(code) for code in params.get('statuses', '200').split(',')]
+                    status = statuses[min(call, len(statuses)) - 1]
+                    etag = f'"{params["etag"]}"' if 'etag' in params else None
+                    if etag and status == 200 and self.headers.get('If-None-Match') == etag:
+                        status = 304
+
+                    body = b'%PDF' + b'x' * max(0, int(params.get('size', 100)) - 4) if status == 200 else b''
+                    self.send_response(status)
+                    if status in (429, 503) and 'retry_after' in params:
+                        self.send_header('Retry-After', params['retry_after'])
+                    if etag and status in (200, 304):
+                        self.send_header('ETag', etag)
+                    if status != 304:
+                        self.send_header('Content-Type', 'application/pdf')
+                        self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with stand_in.lock:
+                        stand_in.active[host] -= 1
+                        stand_in.total_active -= 1
+
+        return Handler
+
+
+@pytest.fixture(scope='module')
+def server():
+    stand_in = StandInServer()
+    stand_in.thread.start()
+    yield stand_in
+    stand_in.server.shutdown()
+    stand_in.server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def reset_server(server):
+    server.reset()
+
+
+@pytest.fixture
+def make_fetcher():
+    fetchers = []
+
+    def make(**kwargs):
+        kwargs.setdefault('timeout', 5)
+        fetcher = CVFetcher(**kwargs)
+        fetchers.append(fetcher)
+        return fetcher
+
+    yield make
+    for fetcher in fetchers:
+        fetcher.close()
+
+
+def test_download_ok(server, make_fetcher):
+    download = make_fetcher().fetch(server.url('/cv.pdf?size=500'))
+
+    assert download.ok
+    assert download.status_code == 200
+    assert len(download.content) == 500
+    assert download.content_type == 'application/pdf'
+    assert download.attempts == 1
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_retry_after_header_is_honoured(server, make_fetcher, status):
+    # Backoff propre très long : seul Retry-After (1 s) explique une nouvelle tentative rapide
+    fetcher = make_fetcher(retries=2, backoff=30)
+    started = time.monotonic()
+    download = fetcher.fetch(server.url(f'/cv-{status}.pdf?statuses={status},200&retry_after=1'))
+    elapsed = time.monotonic() - started
+
+    assert download.ok
+    assert download.attempts == 2
+    assert 1.0 <= elapsed < 5
+    assert fetcher.stats()['retries'] == 1
+
+
+def test_exponential_backoff_without_retry_after(server, make_fetcher):
+    fetcher = make_fetcher(retries=2, backoff=0.2)
+    started = time.monotonic()
+    download = fetcher.fetch(server.url('/cv-backoff.pdf?statuses=503,500,200'))
+    elapsed = time.monotonic() - started
+
+    # Attentes 0.2 puis 0.4 s, chacune réduite au plus de moitié par la gigue
+    assert download.ok
+    assert download.attempts == 3
+    assert elapsed >= 0.1 + 0.2
+
+
+def test_retries_exhausted(server, make_fetcher):
+    fetcher = make_fetcher(retries=2, backoff=0.01)
+    download = fetcher.fetch(server.url('/cv-down.pdf?statuses=503&retry_after=0'))
+
+    assert not download.ok
+    assert download.attempts == 3
+    assert '503' in download.error
+    assert server.calls['/cv-down.pdf?statuses=503&retry_after=0'] == 3
+    assert fetcher.stats()['failures'] == 1
+
+
+def test_client_error_is_not_retried(server, make_fetcher):
+    download = make_fetcher(retries=3, backoff=0.01).fetch(server.url('/missing.pdf?statuses=404'))
+
+    assert not download.ok
+    assert download.attempts == 1
+    assert '404' in download.error
+
+
+def test_unconditional_304_is_an_error(server, make_fetcher):
+    # Aucun validateur envoyé (pas de cache) : un 304 n'a aucun contenu à servir
+    download = make_fetcher(retries=2, backoff=0.01).fetch(server.url('/cv-304.pdf?statuses=304'))
+
+    assert not download.ok
+    assert download.content is None
+    assert download.attempts == 1
+    assert '304' in download.error
+
+
+def test_max_bytes_rejected(server, make_fetcher):
+    download = make_fetcher(max_bytes=1000, retries=2, backoff=0.01).fetch(server.url('/big.pdf?size=5000'))
+
+    assert not download.ok
+    assert download.attempts == 1
+    assert 'volumineux' in download.error
+
+
+def test_per_host_limit(server, make_fetcher):
+    fetcher = make_fetcher(max_workers=8, per_host=2)
+    urls = [server.url(f'/cv{i}.pdf?delay=0.2') for i in range(6)]
+
+    downloads = list(fetcher.fetch_many(urls))
+
+    assert all(download.ok for download in downloads)
+    assert len(downloads) == 6
+    assert server.max_active['127.0.0.1'] == 2
+
+
+def test_per_host_limit_does_not_block_other_hosts(server, make_fetcher):
+    fetcher = make_fetcher(max_workers=8, per_host=2)
+    urls = [server.url(f'/cv{i}.pdf?delay=0.3', host) for i in range(4) for host in ('127.0.0.1', '127.0.0.2')]
+
+    started = time.monotonic()
+    downloads = list(fetcher.fetch_many(urls))
+    elapsed = time.monotonic() - started
+
+    assert all(download.ok for download in downloads)
+    assert server.max_active == {'127.0.0.1': 2, '127.0.0.2': 2}
+    assert server.max_total_active == 4
+    # Deux vagues de 0.3 s par hôte, hôtes en parallèle
+    assert elapsed < 0.3 * 4
+
+
+def test_overall_parallelism_limit(server, make_fetcher):
+    fetcher = make_fetcher(max_workers=3, per_host=8)
+    urls = [server.url(f'/cv{i}.pdf?delay=0.2', host) for i in range(4) for host in ('127.0.0.1', '127.0.0.2')]
+
+    downloads = list(fetcher.fetch_many(urls))
+
+    assert len(downloads) == 8
+    assert server.max_total_active == 3
+
+
+def test_fetch_many_yields_as_completed(server, make_fetcher):
+    fetcher = make_fetcher(max_workers=4, per_host=4)
+    slow = server.url('/slow.pdf?delay=1.5')
+    fast = [server.url(f'/fast{i}.pdf?delay=0.05') for i in range(3)]
+
+    started = time.monotonic()
+    arrivals = []
+    for download in fetcher.fetch_many([slow] + fast):
+        arrivals.append((download.url, time.monotonic() - started))
+
+    # Les CVs rapides sont rendus avant la fin du lent, même demandé en premier
+    assert [url for url, _ in arrivals][-1] == slow
+    assert arrivals[0][1] < 1.0
+    assert arrivals[-1][1] >= 1.5
+
+
+def test_fetch_many_deduplicates_urls(server, make_fetcher):
+    url = server.url('/same.pdf')
+    downloads = list(make_fetcher().fetch_many([url, url, ' ' + url + ' ', None, '']))
+
+    assert len(downloads) == 1
+    assert server.calls['/same.pdf'] == 1
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    def make(max_bytes=100000):
+        return CVCache(path=str(tmp_path / 'cv_cache'), max_bytes=max_bytes)
+
+    return make
+
+
+def test_cache_etag_round_trip(server, make_fetcher, make_cache):
+    cache = make_cache()
+    fetcher = make_fetcher(cache=cache)
+    url = server.url('/cached.pdf?etag=v1&size=300')
+
+    first = fetcher.fetch(url)
+    second = fetcher.fetch(url)
+
+    assert first.ok and not first.from_cache
+    assert second.ok and second.from_cache
+    assert second.content == first.content
+    assert second.content_type == 'application/pdf'
+    assert server.request_headers['/cached.pdf?etag=v1&size=300']['If-None-Match'] == '"v1"'
+    assert fetcher.stats()['not_modified'] == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_response_without_validators_is_not_stored(server, make_fetcher, make_cache):
+    cache = make_cache()
+    fetcher = make_fetcher(cache=cache)
+    url = server.url('/no-etag.pdf')
+
+    fetcher.fetch(url)
+    fetcher.fetch(url)
+
+    assert 'If-None-Match' not in server.request_headers['/no-etag.pdf']
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['uncacheable'] == 2
+
+
+def test_cache_lru_eviction_under_max_bytes(server, make_fetcher, make_cache):
+    # Tailles distinctes : contenus différents, pas de fichier partagé entre URLs
+    cache = make_cache(max_bytes=1000)
+    fetcher = make_fetcher(cache=cache)
+    first, second, third = (server.url(f'/lru-{name}.pdf?etag={name}&size={size}')
+                            for name, size in (('a', 400), ('b', 401), ('c', 402)))
+
+    fetcher.fetch(first)
+    fetcher.fetch(second)
+    assert fetcher.fetch(first).from_cache        # a redevient le plus récemment utilisé
+    fetcher.fetch(third)                          # 1203 octets > 1000 : b, le moins récent, est évincé
+
+    assert cache.validators(first)
+    assert cache.validators(second) == {}
+    assert cache.validators(third)
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['bytes'] == 400 + 402
+    assert not fetcher.fetch(second).from_cache
+
+
+def test_cache_index_reloaded_from_disk(server, make_fetcher, make_cache):
+    url = server.url('/reload.pdf?etag=v1&size=200')
+    cache = make_cache()
+    original = make_fetcher(cache=cache).fetch(url)
+    cache.save()
+
+    reloaded = make_cache()
+    download = make_fetcher(cache=reloaded).fetch(url)
+
+    assert reloaded.stats()['entries'] == 1
+    assert download.from_cache
+    assert download.content == original.content
+
+
+def test_cache_hit_rate_counts_failed_downloads(server, make_fetcher, make_cache):
+    cache = make_cache()
+    fetcher = make_fetcher(cache=cache, retries=0)
+    url = server.url('/hit-rate.pdf?etag=v1')
+
+    fetcher.fetch(server.url('/hit-rate-missing.pdf?statuses=404'))
+    assert cache.stats()['hit_rate'] == 0.0
+
+    fetcher.fetch(url)
+    fetcher.fetch(url)
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 2)
+    assert stats['hit_rate'] == round(1 / 3, 3)
+
+
+def test_cache_missing_blob_is_downloaded_after_304(server, make_fetcher, make_cache):
+    cache = make_cache()
+    fetcher = make_fetcher(cache=cache)
+    path = '/lost-blob.pdf?etag=v1&size=250'
+    original = fetcher.fetch(server.url(path))
+
+    # Fichier retiré du disque, entrée encore indexée : le serveur répond 304 sans contenu
+    os.remove(cache._blob_path(cache._entries[server.url(path)]['sha256']))
+    download = fetcher.fetch(server.url(path))
+
+    assert download.ok and not download.from_cache
+    assert download.status_code == 200
+    assert download.content == original.content
+    assert server.calls[path] == 3
+    assert 'If-None-Match' not in server.request_headers[path]
+    assert fetcher.fetch(server.url(path)).from_cache
@@ -0,0 +1,142 @@
+import logging
+from collections import ChainMap
+
+import numpy as np
+from scipy import sparse
+from sklearn.base import clone
+
+logger = logging.getLogger(__name__)
+
+# Similarité appliquée quand le texte de l'offre ou du candidat est vide (comportement historique)
+DEFAULT_TEXT_SIMILARITY = 0.1
+
+
+class CandidateTfidfIndex:
+    """
+    Index TF-IDF persistant des profils candidats (matrice CSR normalisée L2).
+    Comme les index de compétences, jamais modifié : updated() retourne un nouvel index.
+    """
+
+    def __init__(self, vectorizer, matrix, row_by_id, empty_rows, version=None, appended=()):
+        self.vectorizer = vectorizer
+        self.row_by_id = row_by_id
+        self.version = version
+        self._base = matrix
+        self._base_empty = empty_rows
+        self._appended = list(appended)   # (vecteur TF-IDF, texte vide) des lignes ajoutées après _base
+        self._stacked = None if self._appended else (matrix, empty_rows)
+
+    @property
+    def matrix(self):
+        return self._stack()[0]
+
+    @property
+    def empty_rows(self):
+        return self._stack()[1]
+
+    @property
+    def appended_rows(self):
+        return len(self._appended)
+
+    @classmethod
+    def build(cls, base_vectorizer, stagiaire_ids, texts, preprocess, version=None):
+        """Ajuste le vocabulaire sur tout le corpus candidats et vectorise chaque profil"""
+        vectorizer = clone(base_vectorizer)
+        cleaned = [preprocess(text) for text in texts]
+        empty_rows = np.array([not text for text in cleaned], dtype=bool)
+
+        try:
+            matrix = vectorizer.fit_transform(cleaned).tocsr()
+        except ValueError as e:
+            # Vocabulaire vide (aucun profil exploitable)
+            logger.warning(f"Index TF-IDF vide: {e}")
+            vectorizer, matrix = None, None
+
+        row_by_id = {int(stagiaire_id): row for row, stagiaire_id in enumerate(stagiaire_ids)}
+        logger.info(f"Index TF-IDF construit: {len(row_by_id)} candidats, "
+                    f"{0 if vectorizer is None else len(vectorizer.vocabulary_)} termes (version {version})")
+
+        return cls(vectorizer, matrix, row_by_id, empty_rows, version)
+
+    def updated(self, stagiaire_ids, texts, preprocess, version=None):
+        """
+        Index avec ces profils revectorisés dans le vocabulaire et les IDF existants (nouvelles lignes
+        en fin de matrice). None si l'index est vide : seule une reconstruction peut ajuster un vocabulaire.
+        """
+        if self.vectorizer is None:
+            return None
+
+        cleaned = [preprocess(text) for text in texts]
+        vectors = self.vectorizer.transform(cleaned).tocsr()
+        appended = list(self._appended)
+
+        rows = {}
+        for position, stagiaire_id in enumerate(stagiaire_ids):
+            appended.append((vectors[position], not cleaned[position]))
+            rows[int(stagiaire_id)] = self._base.shape[0] + len(appended) - 1
+
+        replaced, built = (self.row_by_id.maps if isinstance(self.row_by_id, ChainMap) else ({}, self.row_by_id))
+        row_by_id = ChainMap({**replaced, **rows}, built)
+        return type(self)(self.vectorizer, self._base, row_by_id, self._base_empty, version, appended)
+
+    def similarities(self, job_clean, stagiaire_ids):
+        """Cosinus entre l'offre (transformée une seule fois) et chaque candidat demandé"""
+        return self.similarity_matrix([job_clean], stagiaire_ids)[0]
+
+    def similarity_matrix(self, job_cleans, stagiaire_ids):
+        """Cosinus offres x candidats : toutes les offres transformées ensemble, un seul produit creux"""
+        stagiaire_ids = [int(i) for i in stagiaire_ids]
+        result = np.full((len(job_cleans), len(stagiaire_ids)), DEFAULT_TEXT_SIMILARITY, dtype=float)
+
+        offers = np.array([bool(job_clean) for job_clean in job_cleans], dtype=bool)
+        if not offers.any() or self.vectorizer is None:
+            return result
+
+        rows = np.array([self.row_by_id.get(i, -1) for i in stagiaire_ids], dtype=np.int64)
+        known = rows >= 0
+        if not known.any():
+            return result
+
+        # Les lignes sont déjà normalisées L2 : le produit scalaire est le cosinus
+        job_vectors = self.vectorizer.transform([job_cleans[i] for i in np.flatnonzero(offers)])
+        scores = np.asarray((self.matrix @ job_vectors.T).todense()).T
+
+        known_rows = rows[known]
+        empty = self.empty_rows[known_rows]
+        for offer_row, offer in enumerate(np.flatnonzero(offers)):
+            result[offer, known] = np.where(empty, DEFAULT_TEXT_SIMILARITY, scores[offer_row, known_rows])
+        return result
+
+    def transform_offers(self, job_cleans):
+        """Vecteurs TF-IDF des offres dans le vocabulaire de l'index (None si l'index est vide)"""
+        if self.vectorizer is None:
+            return None
+        return self.vectorizer.transform([job_clean or '' for job_clean in job_cleans]).tocsr()
+
+    def offer_similarities(self, stagiaire_id, offer_vectors, offer_empty):
+        """Cosinus entre un candidat et des offres déjà transformées (un seul produit creux)"""
+        result = np.full(len(offer_empty), DEFAULT_TEXT_SIMILARITY, dtype=float)
+
+        row = self.row_by_id.get(int(stagiaire_id))
+        if row is None or offer_vectors is None or self.empty_rows[row]:
+            return result
+
+        # Ligne candidat x offres : même ordre de sommation que similarity_matrix
+        scores = np.asarray((self.matrix[row] @ offer_vectors.T).todense()).ravel()
+        return np.where(np.asarray(offer_empty, dtype=bool), DEFAULT_TEXT_SIMILARITY, scores)
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'candidates': len(self.row_by_id),
+            'vocabulary': 0 if self.vectorizer is None else len(self.vectorizer.vocabulary_),
+            'appended_rows': self.appended_rows
+        }
+
+    def _stack(self):
+        # Lignes ajoutées empilées au premier usage de cette version de l'index
+        if self._stacked is None:
+            matrix = sparse.vstack([self._base] + [vector for vector, _ in self._appended], format='csr')
+            empty_rows = np.concatenate([self._base_empty, np.array([empty for _, empty in self._appended], dtype=bool)])
+            self._stacked = (matrix, empty_rows)
+        return self._stacked